@@ -0,0 +1,89 @@
+"""
+Recall@k and latency of the IVF index against the exact brute-force scan.
+
+Builds a synthetic clustered corpus (news embeddings are far from uniform, so
+a Gaussian mixture is a fairer stand-in than uniform noise), loads it into a
+VectorIndex, trains the IVF index and sweeps nprobe. Queries are perturbed
+corpus points. 1M x 256 float32 needs about 1 GB for the matrix.
+
+usage: python -m benchmarks.ann_recall [--n 1000000] [--dim 256] [--queries 200] [--k 10] [--nprobe 4,8,16,32,64]
+"""
+import argparse
+import tempfile
+import os
+import time
+
+import numpy as np
+
+def synthetic_corpus(n: int, dim: int, clusters: int, rng: np.random.Generator, chunk: int = 100000) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        labels = rng.integers(0, clusters, end - start)
+        vectors[start:end] = centers[labels] + 1.6 * rng.normal(size=(end - start, dim)).astype(np.float32)
+    return vectors
+
+def recall(approx, exact, k):
+    hits = sum(len({i for i, _ in a[:k]} & {i for i, _ in e[:k]}) for a, e in zip(approx, exact))
+    return hits / (k * len(exact))
+
+def timed_search(index, queries, k, nprobe):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(index.search(query, k, nprobe=nprobe))
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000, help="mixture components in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 = about 4 * sqrt(n)")
+    parser.add_argument("--nprobe", default="4,8,16,32,64", help="comma-separated values to sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    # utils.db opens DB_FILE at import time; the index itself never reads it here
+    os.environ["DB_FILE"] = os.path.join(workdir, "bench.db")
+    from utils.vector_index import VectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    print(f"generating {args.n} x {args.dim} corpus...")
+    corpus = synthetic_corpus(args.n, args.dim, args.clusters, rng)
+    picks = rng.choice(args.n, args.queries, replace=False)
+    queries = corpus[picks] + 0.5 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    index = VectorIndex(ann_mode="flat", ann_file=os.path.join(workdir, "ann.npz"), snapshot_dir=None)
+    index.add(np.arange(1, args.n + 1), corpus)
+    del corpus
+
+    start = time.perf_counter()
+    index.build_ann(nlist=args.nlist or None)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.save_ann()
+    save_seconds = time.perf_counter() - start
+    # searches below run on the reloaded copy
+    index.ann = None
+    start = time.perf_counter()
+    index.load_ann()
+    load_seconds = time.perf_counter() - start
+
+    exact, exact_ms = timed_search(index, queries, args.k, nprobe=0)
+    print(f"\nbuild {build_seconds:.1f}s ({index.ann.nlist} lists), save {save_seconds:.2f}s, load {load_seconds:.2f}s "
+          f"({os.path.getsize(index.ann_file) / 1e6:.1f} MB)")
+    print(f"{'mode':<14} {'ms/query':>9} {'qps':>8} {f'recall@{args.k}':>10}")
+    print(f"{'exact':<14} {exact_ms:>9.2f} {1000 / exact_ms:>8.1f} {1.0:>10.3f}")
+    for nprobe in [int(value) for value in args.nprobe.split(",")]:
+        approx, ms = timed_search(index, queries, args.k, nprobe=nprobe)
+        print(f"{f'ivf nprobe={nprobe}':<14} {ms:>9.2f} {1000 / ms:>8.1f} {recall(approx, exact, args.k):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare JSON text vs packed blob embedding storage.
+
+Builds a synthetic corpus in the legacy schema (embeddings as JSON text),
+measures file size and full-scan decode time, then runs the schema migration
+and blob backfill on the same file and measures again.
+
+usage: python -m benchmarks.embedding_storage [--n 100000] [--dim 1024] [--dtype float32]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+def build_legacy_db(path, n, dim, batch_size=1000):
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            url TEXT UNIQUE,
+            content TEXT,
+            embedding TEXT,
+            source TEXT,
+            bias TEXT
+        )
+    ''')
+    for start in range(0, n, batch_size):
+        count = min(batch_size, n - start)
+        vectors = rng.normal(size=(count, dim)).astype(np.float32)
+        conn.executemany(
+            'INSERT INTO records (title, url, content, embedding, source, bias) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (f"article {start + i}", f"https://example.com/{start + i}", "lorem ipsum " * 50,
+                 json.dumps(vectors[i].tolist()), "Synthetic", "0")
+                for i in range(count)
+            ]
+        )
+    conn.commit()
+    conn.close()
+
+def scan_json(path):
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    rows = 0
+    for (embedding_str,) in conn.execute('SELECT embedding FROM records'):
+        np.array(json.loads(embedding_str))
+        rows += 1
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows, elapsed
+
+def scan_blob(path):
+    from utils.embedding_codec import decode_embedding, load_embedding_dtype
+
+    conn = sqlite3.connect(path)
+    dtype = load_embedding_dtype(conn)
+    start = time.perf_counter()
+    rows = 0
+    for (blob,) in conn.execute('SELECT embedding_blob FROM records'):
+        decode_embedding(blob, dtype)
+        rows += 1
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return rows, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="number of synthetic articles")
+    parser.add_argument("--dim", type=int, default=1024, help="embedding dimension")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    path = os.path.join(workdir, "bench.db")
+
+    print(f"building {args.n} x {args.dim} legacy corpus in {path}")
+    build_legacy_db(path, args.n, args.dim)
+    before_size = os.path.getsize(path)
+    rows, before_scan = scan_json(path)
+
+    # utils.db reads DB_FILE / EMBEDDING_DTYPE at import time
+    os.environ["DB_FILE"] = path
+    os.environ["EMBEDDING_DTYPE"] = args.dtype
+    from utils import db
+
+    start = time.perf_counter()
+    db.backfill_embedding_blobs(batch_size=1000)
+    backfill_time = time.perf_counter() - start
+
+    with sqlite3.connect(path) as conn:
+        conn.execute('VACUUM')
+    after_size = os.path.getsize(path)
+    _, after_scan = scan_blob(path)
+
+    print(f"rows:            {rows}")
+    print(f"db size:         {before_size / 1e6:10.1f} MB (json) -> {after_size / 1e6:10.1f} MB ({args.dtype} blob)")
+    print(f"full-scan decode:{before_scan:10.2f} s  (json) -> {after_scan:10.2f} s  ({args.dtype} blob)")
+    print(f"backfill time:   {backfill_time:10.2f} s")
+
+if __name__ == "__main__":
+    main()
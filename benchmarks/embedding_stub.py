@@ -0,0 +1,86 @@
+"""
+Local stand-in for the feature-extraction inference API.
+
+Answers POSTed {"inputs": str | [str, ...]} with deterministic pseudo-random
+unit vectors, after a configurable latency, so embedding throughput can be
+measured offline. Point utils.models at it with EMBEDDING_BASE_URL.
+
+usage: python -m benchmarks.embedding_stub [--port 8090] [--dim 1024]
+                                           [--latency-ms 80] [--per-item-ms 2] [--max-batch 64]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+    vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def make_handler(dim: int, latency_ms: float, per_item_ms: float, max_batch: int, counters: dict):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            inputs = body.get('inputs', body.get('input'))
+            single = isinstance(inputs, str)
+            texts = [inputs] if single else list(inputs)
+
+            counters['requests'] += 1
+            if len(texts) > max_batch:
+                counters['rejected'] += 1
+                self._reply(413, {"error": f"batch of {len(texts)} exceeds max of {max_batch}"})
+                return
+
+            time.sleep((latency_ms + per_item_ms * len(texts)) / 1000)
+            counters['texts'] += len(texts)
+            vectors = [fake_embedding(text, dim).tolist() for text in texts]
+            self._reply(200, vectors[0] if single else vectors)
+
+        def _reply(self, status: int, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_stub(port: int = 0, dim: int = 1024, latency_ms: float = 80, per_item_ms: float = 2, max_batch: int = 64):
+    """
+    Start the stub on a background thread.
+
+    Returns:
+        (server, counters) - server.server_address has the bound port
+    """
+    counters = {'requests': 0, 'texts': 0, 'rejected': 0}
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(dim, latency_ms, per_item_ms, max_batch, counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=80, help="fixed cost per request")
+    parser.add_argument("--per-item-ms", type=float, default=2, help="extra cost per text in a request")
+    parser.add_argument("--max-batch", type=int, default=64, help="larger batches get HTTP 413")
+    args = parser.parse_args()
+
+    server, _ = start_stub(args.port, args.dim, args.latency_ms, args.per_item_ms, args.max_batch)
+    print(f"embedding stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Embedding throughput: one request per text vs batched embed_texts.
+
+Runs against the local stub in benchmarks/embedding_stub.py, so no API
+token or network is needed.
+
+usage: python -m benchmarks.embedding_throughput [--n 256] [--latency-ms 80] [--per-item-ms 2] [--max-batch 64]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.embedding_stub import start_stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=256, help="texts per run")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--per-item-ms", type=float, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--batch-sizes", default="8,32,128", help="comma-separated embed_texts batch sizes")
+    args = parser.parse_args()
+
+    server, counters = start_stub(0, args.dim, args.latency_ms, args.per_item_ms, args.max_batch)
+
+    # utils.models reads these at import time
+    os.environ["EMBEDDING_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["MODEL_CACHE_FILE"] = os.path.join(tempfile.mkdtemp(prefix="uplink-bench-"), "model_cache.db")
+    os.environ.setdefault("NEBIUS_API_KEY", "unused")
+    from utils import models
+
+    def run(label, fn, run_id):
+        texts = [f"{run_id} synthetic article {i} " * 20 for i in range(args.n)]
+        requests_before = counters['requests']
+        start = time.perf_counter()
+        matrix = fn(texts)
+        elapsed = time.perf_counter() - start
+        assert len(matrix) == args.n
+        print(f"{label:<24} {args.n / elapsed:10.1f} texts/s  {counters['requests'] - requests_before:6} requests")
+
+    print(f"stub: {args.latency_ms}ms/request + {args.per_item_ms}ms/text, max batch {args.max_batch}")
+    run("embed_text (1 per call)", lambda texts: [models.embed_text(text) for text in texts], "single")
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        run(f"embed_texts batch={batch_size}", lambda texts: models.embed_texts(texts, batch_size=batch_size), f"batch{batch_size}")
+    run("embed_texts (cached)", lambda texts: models.embed_texts(texts), f"batch{args.batch_sizes.split(',')[0]}")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
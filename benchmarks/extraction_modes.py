@@ -0,0 +1,105 @@
+"""
+Compare two-call (extract + bias) and combined single-call extraction.
+
+Runs both modes over a directory of recorded pages (*.html or *.txt) and
+reports llm calls, tokens, latency, fallbacks and bias agreement. Uses the
+real extraction provider, so NEBIUS_API_KEY / EXTRACTION_MODEL must be set;
+the model cache is pointed at a temporary file so nothing is served from cache.
+
+usage: python -m benchmarks.extraction_modes PAGES_DIR [--limit 20]
+       python -m benchmarks.extraction_modes PAGES_DIR --record 20   # save pages from the configured feeds first
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+def record_pages(pages_dir: Path, count: int):
+    import requests
+    from utils.mappings import mappings
+    from utils.rss_parse import get_rss, entry_url
+
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    saved = 0
+    for feeds in mappings.values():
+        for feed_url in feeds:
+            rss = get_rss(feed_url)
+            for entry in (rss.channel.items if rss else []):
+                url = entry_url(entry)
+                if not url:
+                    continue
+                try:
+                    response = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+                    response.raise_for_status()
+                except Exception as e:
+                    print(f"skipping {url}: {e}")
+                    continue
+                (pages_dir / f"page_{saved:04d}.html").write_text(response.text, encoding="utf-8")
+                saved += 1
+                if saved >= count:
+                    return
+            break  # one feed per source keeps the sample varied
+
+def usage_delta(before, after):
+    totals = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    for purpose, stats in after.items():
+        if purpose == "combined_fallback":
+            continue
+        for field in totals:
+            totals[field] += stats.get(field, 0) - before.get(purpose, {}).get(field, 0)
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir", type=Path)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--record", type=int, default=0, help="fetch and save this many pages first")
+    args = parser.parse_args()
+
+    os.environ["MODEL_CACHE_FILE"] = os.path.join(tempfile.mkdtemp(prefix="uplink-bench-"), "model_cache.db")
+    from utils import models
+    from utils.news_content_strip import extract_main_content
+
+    if args.record:
+        record_pages(args.pages_dir, args.record)
+
+    pages = sorted(p for p in args.pages_dir.iterdir() if p.suffix in (".html", ".txt"))[:args.limit]
+    texts = []
+    for page in pages:
+        raw = page.read_text(encoding="utf-8", errors="ignore")
+        texts.append(extract_main_content(raw) if page.suffix == ".html" else raw)
+
+    results = {}
+    for mode, combined in (("two-call", False), ("combined", True)):
+        before = models.get_llm_stats()
+        fallbacks_before = before.get("combined_fallback", {}).get("count", 0)
+        start = time.perf_counter()
+        labels = []
+        chars = 0
+        for text in texts:
+            content, bias_value = models.extract_and_bias(text, combined=combined)
+            labels.append(bias_value)
+            chars += len(content)
+        elapsed = time.perf_counter() - start
+        after = models.get_llm_stats()
+        results[mode] = {
+            **usage_delta(before, after),
+            "seconds": elapsed,
+            "chars": chars,
+            "labels": labels,
+            "fallbacks": after.get("combined_fallback", {}).get("count", 0) - fallbacks_before,
+        }
+
+    print(f"{len(texts)} pages")
+    print(f"{'mode':<10} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'seconds':>8} {'s/page':>7} {'out chars':>10} {'fallbacks':>9}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10} {r['calls']:>6} {r['prompt_tokens']:>11} {r['completion_tokens']:>10} "
+            f"{r['seconds']:>8.1f} {r['seconds'] / max(len(texts), 1):>7.2f} {r['chars']:>10} {r['fallbacks']:>9}"
+        )
+    agree = sum(a == b for a, b in zip(results["two-call"]["labels"], results["combined"]["labels"]))
+    print(f"bias agreement: {agree}/{len(texts)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Cold-start time and per-worker memory of the news index: rebuilt from SQLite
+vs mapped from an on-disk snapshot.
+
+Writes a synthetic corpus to a temporary SQLite database, snapshots the index,
+adds --new rows after the snapshot (which the mapped workers must catch up on),
+then starts --workers processes per mode that each load the index and answer a
+query. Memory is the growth of each worker's RSS and PSS while loading; PSS
+splits shared pages between the processes mapping them, so it is the real
+per-worker cost. Linux only (reads /proc/self/smaps_rollup).
+
+usage: python -m benchmarks.index_snapshot [--n 100000] [--dim 1024] [--new 1000] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.ann_recall import synthetic_corpus
+from benchmarks.quantization import build_db
+
+def memory_mb():
+    """(rss, pss) of this process in MB."""
+    values = {}
+    with open('/proc/self/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1]) / 1024
+    return values['Rss:'], values['Pss:']
+
+def worker(snapshot_dir, query, barrier, results):
+    from utils.vector_index import VectorIndex
+
+    rss_before, pss_before = memory_mb()
+    start = time.perf_counter()
+    index = VectorIndex(ann_mode="flat", ann_file=None, snapshot_dir=snapshot_dir)
+    index.refresh()
+    index.search(query, 10)
+    seconds = time.perf_counter() - start
+    # measure once every worker has its index, so shared pages are split between all of them
+    barrier.wait()
+    rss, pss = memory_mb()
+    results.put((seconds, rss - rss_before, pss - pss_before, len(index)))
+    barrier.wait()
+
+def run_workers(snapshot_dir, query, count):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(count)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(snapshot_dir, query, barrier, results)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--new", type=int, default=1000, help="rows written after the snapshot")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    path = os.path.join(workdir, "bench.db")
+    snapshot_dir = os.path.join(workdir, "snapshot")
+    # utils.db reads DB_FILE at import time; spawned workers inherit it
+    os.environ["DB_FILE"] = path
+    os.environ["EMBEDDING_DTYPE"] = "float32"
+    from utils.vector_index import VectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    print(f"building {args.n} x {args.dim} corpus in {path}")
+    corpus = synthetic_corpus(args.n + args.new, args.dim, 1000, rng)
+    query = corpus[0]
+    build_db(path, corpus[:args.n])
+
+    index = VectorIndex(ann_mode="flat", ann_file=None, snapshot_dir=snapshot_dir)
+    index.refresh()
+    start = time.perf_counter()
+    index.save_snapshot()
+    save_seconds = time.perf_counter() - start
+    del index
+
+    # rows the snapshot does not have yet
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO records (title, url, content, embedding_blob, source, bias) VALUES (?, ?, ?, ?, ?, ?)',
+        [(f"new {i}", f"https://example.com/new/{i}", "lorem ipsum", vector.tobytes(), "Synthetic", "0")
+         for i, vector in enumerate(corpus[args.n:])]
+    )
+    conn.commit()
+    conn.close()
+    del corpus
+
+    print(f"snapshot written in {save_seconds:.2f}s, {args.new} rows added since\n")
+    print(f"{'mode':<10} {'workers':>7} {'rows':>8} {'start s':>8} {'rss MB':>8} {'pss MB':>8}")
+    for label, directory in (("sqlite", None), ("snapshot", snapshot_dir)):
+        rows = run_workers(directory, query, args.workers)
+        seconds, rss, pss, size = (np.mean([row[i] for row in rows]) for i in range(4))
+        print(f"{label:<10} {args.workers:>7} {int(size):>8} {seconds:>8.2f} {rss:>8.1f} {pss:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Retrieval quality and response size of passage-level news search against
+whole-article embeddings.
+
+Builds a synthetic corpus in a temporary SQLite database: each article is a
+run of sections, each section a few sentences about one topic. A stand-in
+embedding model maps text to the normalized sum of the topic vectors it
+mentions, but like a real model only reads the first --context characters.
+Articles are written through the write queue exactly as the ingest pipeline
+writes them, with passages from utils.passages and the record embedding of
+the whole (truncated) text, so the article index is the old behaviour and the
+passage index the new one. Article results carry full content as before;
+passage results are filled with the default NEWS_SEARCH_FIELDS, snippets
+included (queries are bare vectors, so snippets are passage leads). Each query is a noisy topic vector for one section
+of one article; any article containing that topic is relevant. Results are
+split by whether the section starts inside the model's context.
+
+usage: python -m benchmarks.passages [--articles 3000] [--dim 256] [--queries 500] [--k 5] [--context 2000]
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+TOPIC = re.compile(r"topic-(\d+)")
+WORDS = ("markets", "officials", "the report", "analysts", "residents", "the agency", "critics", "the company")
+
+def make_article(rng, topics, sections):
+    """Article text plus (topic, start offset) of each section."""
+    parts = []
+    layout = []
+    offset = 0
+    for topic in rng.choice(topics, size=sections, replace=False):
+        layout.append((int(topic), offset))
+        for _ in range(rng.integers(4, 9)):
+            sentence = f"On topic-{topic}, {rng.choice(WORDS)} said {rng.choice(WORDS)} expect {rng.integers(2, 99)} more changes this year. "
+            parts.append(sentence)
+            offset += len(sentence)
+    return "".join(parts), layout
+
+class StandInModel:
+    """Embeds text as the normalized sum of the topic vectors in its first `context` characters."""
+
+    def __init__(self, topic_vectors, context, noise, rng):
+        self.topic_vectors = topic_vectors
+        self.context = context
+        self.noise = noise
+        self.rng = rng
+
+    def embed(self, text):
+        ids = [int(match) for match in TOPIC.findall(text[:self.context])]
+        vector = self.topic_vectors[ids].sum(axis=0) if ids else np.zeros(self.topic_vectors.shape[1], dtype=np.float32)
+        vector = vector + self.rng.normal(scale=self.noise, size=len(vector))
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+def score(ranked, relevant, k):
+    """(hit@k, reciprocal rank) of one result list."""
+    for rank, record_id in enumerate(ranked[:k], start=1):
+        if record_id in relevant:
+            return 1.0, 1.0 / rank
+    return 0.0, 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=20000)
+    parser.add_argument("--sections", default="1,12", help="min,max sections per article")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--context", type=int, default=2000, help="characters the stand-in model reads")
+    parser.add_argument("--passage-chars", type=int, default=1200)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    path = os.path.join(workdir, "bench.db")
+    # utils.db, utils.passages and the index singletons read these at import time
+    os.environ["DB_FILE"] = path
+    os.environ["EMBEDDING_DTYPE"] = "float32"
+    os.environ["PASSAGE_CHARS"] = str(args.passage_chars)
+    os.environ["INDEX_SNAPSHOT_DIR"] = ""
+    os.environ["ANN_INDEX"] = "flat"
+    os.environ["MODEL_CACHE_FILE"] = os.path.join(workdir, "model_cache.db")
+    from utils.db import write_records
+    from utils.passages import split_passages, passage_texts, attach_passages
+    from utils.search import _search_index, _search_passages, _fill, check_fields
+
+    rng = np.random.default_rng(args.seed)
+    topic_vectors = rng.normal(size=(args.topics, args.dim)).astype(np.float32)
+    topic_vectors /= np.linalg.norm(topic_vectors, axis=1, keepdims=True)
+    model = StandInModel(topic_vectors, args.context, args.noise, rng)
+
+    min_sections, max_sections = (int(value) for value in args.sections.split(","))
+    print(f"writing {args.articles} articles to {path}")
+    layouts = []
+    lengths = []
+    passage_count = 0
+    batch = []
+    for i in range(args.articles):
+        text, layout = make_article(rng, args.topics, int(rng.integers(min_sections, max_sections + 1)))
+        spans = split_passages(text)
+        article = attach_passages(
+            {"title": f"article {i}", "url": f"https://example.com/{i}", "content": text, "source": "Synthetic", "bias": "0"},
+            spans, np.vstack([model.embed(passage) for passage in passage_texts(text, spans)])
+        )
+        # the record keeps the whole-article embedding, as ingest did before passages
+        article["embedding"] = model.embed(text)
+        batch.append(article)
+        layouts.append(layout)
+        lengths.append(len(text))
+        passage_count += len(spans)
+        if len(batch) == 500 or i == args.articles - 1:
+            write_records(batch)
+            batch = []
+
+    # ids follow write order in a fresh database
+    topic_articles = {}
+    for record_id, layout in enumerate(layouts, start=1):
+        for topic, _ in layout:
+            topic_articles.setdefault(topic, set()).add(record_id)
+
+    queries = []
+    for _ in range(args.queries):
+        record_id = int(rng.integers(1, args.articles + 1))
+        topic, offset = layouts[record_id - 1][rng.integers(len(layouts[record_id - 1]))]
+        query = topic_vectors[topic] + rng.normal(scale=args.noise, size=args.dim)
+        queries.append(((query / np.linalg.norm(query)).astype(np.float32), topic_articles[topic], offset < args.context))
+
+    # warm both indexes so load time is not counted against the first query
+    _search_index(queries[0][0], args.k)
+    _search_passages(queries[0][0], args.k)
+
+    fields = check_fields(None)
+    print(f"{args.articles} articles, mean {np.mean(lengths):.0f} chars, {passage_count} passages; "
+          f"model context {args.context} chars, k={args.k}\n")
+    print(f"{'approach':<10} {'queries':<14} {'n':>5} {'hit@k':>7} {'mrr':>7} {'ms/query':>9} {'bytes/resp':>11}")
+    for label, run in (
+        ("article", lambda query: _search_index(query, args.k)[0]),
+        ("passage", lambda query: _fill(_search_passages(query, args.k), "", fields)),
+    ):
+        rows = []
+        for query, relevant, in_context in queries:
+            start = time.perf_counter()
+            results = run(query)
+            seconds = time.perf_counter() - start
+            hit, reciprocal = score([result["id"] for result in results], relevant, args.k)
+            rows.append((in_context, hit, reciprocal, seconds, len(json.dumps(results).encode("utf-8"))))
+
+        for group, keep in (("all", lambda row: True), ("in context", lambda row: row[0]), ("past context", lambda row: not row[0])):
+            selected = [row for row in rows if keep(row)]
+            if not selected:
+                continue
+            hits, reciprocals, seconds, sizes = (np.mean([row[i] for row in selected]) for i in range(1, 5))
+            print(f"{label:<10} {group:<14} {len(selected):>5} {hits:>7.3f} {reciprocals:>7.3f} {seconds * 1000:>9.2f} {sizes:>11.0f}")
+
+if __name__ == "__main__":
+    main()
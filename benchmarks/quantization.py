@@ -0,0 +1,85 @@
+"""
+Memory, QPS and recall@k of int8 / binary quantized vector indexes against float32.
+
+Writes a synthetic clustered corpus to a temporary SQLite database (the
+quantized modes re-score their shortlist against the stored float vectors),
+loads it into one VectorIndex per quantization mode with refresh(), and
+compares each against the exact float32 scan for a sweep of re-rank depths.
+rerank=0 shows the codes on their own.
+
+usage: python -m benchmarks.quantization [--n 100000] [--dim 1024] [--queries 200] [--k 10] [--rerank 0,100,200,500]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.ann_recall import synthetic_corpus, recall, timed_search
+
+def build_db(path, corpus, batch_size=1000):
+    from utils import db
+    from utils.embedding_codec import encode_embedding
+
+    db.init_db()
+    conn = sqlite3.connect(path)
+    for start in range(0, len(corpus), batch_size):
+        conn.executemany(
+            'INSERT INTO records (title, url, content, embedding_blob, source, bias) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (f"article {start + i}", f"https://example.com/{start + i}", "lorem ipsum",
+                 encode_embedding(vector, 'float32'), "Synthetic", "0")
+                for i, vector in enumerate(corpus[start:start + batch_size])
+            ]
+        )
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--clusters", type=int, default=1000, help="mixture components in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", default="0,100,200,500", help="comma-separated re-rank depths to sweep")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    path = os.path.join(workdir, "bench.db")
+    # utils.db reads DB_FILE at import time
+    os.environ["DB_FILE"] = path
+    os.environ["EMBEDDING_DTYPE"] = "float32"
+    from utils.vector_index import VectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    print(f"building {args.n} x {args.dim} corpus in {path}")
+    corpus = synthetic_corpus(args.n, args.dim, args.clusters, rng)
+    picks = rng.choice(args.n, args.queries, replace=False)
+    queries = corpus[picks] + 0.5 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    build_db(path, corpus)
+    del corpus
+
+    print(f"\n{'mode':<22} {'index MB':>9} {'load s':>7} {'ms/query':>9} {'qps':>8} {f'recall@{args.k}':>10}")
+    exact = None
+    for mode in ("none", "int8", "binary"):
+        index = VectorIndex(ann_mode="flat", ann_file=None, quantization=mode, snapshot_dir=None)
+        start = time.perf_counter()
+        index.refresh()
+        load_seconds = time.perf_counter() - start
+        megabytes = index.memory_bytes() / 1e6
+
+        for rerank in ([0] if mode == "none" else [int(value) for value in args.rerank.split(",")]):
+            index.rerank = rerank
+            results, ms = timed_search(index, queries, args.k, nprobe=0)
+            if exact is None:
+                exact = results
+            label = "float32" if mode == "none" else f"{mode} rerank={rerank}"
+            print(f"{label:<22} {megabytes:>9.1f} {load_seconds:>7.1f} {ms:>9.2f} {1000 / ms:>8.1f} {recall(results, exact, args.k):>10.3f}")
+        del index
+
+if __name__ == "__main__":
+    main()
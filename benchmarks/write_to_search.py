@@ -0,0 +1,122 @@
+"""
+Write-to-searchable latency of the news vector index.
+
+Seeds a temporary SQLite database, then writes articles one at a time through
+the write queue and times how long until each is the top hit for its own
+embedding. Two indexes follow the same database: one woken by the write
+queue's commit listener (a writer in the same process) and one that only polls
+the change log every --poll seconds (a writer in another process). Every
+--replace-every'th write overwrites an earlier URL, timing how long until the
+old row stops being returned. Also reports the cost of a refresh() that finds
+nothing new.
+
+usage: python -m benchmarks.write_to_search [--n 20000] [--dim 1024] [--writes 100] [--rate 10] [--poll 1.0]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.ann_recall import synthetic_corpus
+from benchmarks.quantization import build_db
+
+def wait_until(checks, start, timeout=30.0):
+    """Poll each check until it passes; seconds since start each took (None on timeout)."""
+    latencies = [None] * len(checks)
+    while any(latency is None for latency in latencies) and time.perf_counter() - start < timeout:
+        for i, check in enumerate(checks):
+            if latencies[i] is None and check():
+                latencies[i] = time.perf_counter() - start
+        time.sleep(0.0005)
+    return latencies
+
+def summarize(label, latencies):
+    done = np.array([latency for latency in latencies if latency is not None]) * 1000
+    missed = len(latencies) - len(done)
+    if not len(done):
+        print(f"{label:<18} {'-':>8} {'-':>8} {'-':>8} {missed:>7}")
+        return
+    print(f"{label:<18} {np.percentile(done, 50):>8.1f} {np.percentile(done, 95):>8.1f} {done.max():>8.1f} {missed:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20_000, help="rows in the database before the test")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--writes", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="writes per second")
+    parser.add_argument("--poll", type=float, default=1.0, help="change log poll interval of the polling index")
+    parser.add_argument("--replace-every", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="uplink-bench-")
+    path = os.path.join(workdir, "bench.db")
+    # utils.db reads DB_FILE at import time
+    os.environ["DB_FILE"] = path
+    os.environ["EMBEDDING_DTYPE"] = "float32"
+    from utils.db import get_connection
+    from utils.vector_index import VectorIndex
+    from utils.write_queue import write_record_queued
+
+    rng = np.random.default_rng(args.seed)
+    print(f"building {args.n} x {args.dim} corpus in {path}")
+    corpus = synthetic_corpus(args.n + args.writes, args.dim, 1000, rng)
+    build_db(path, corpus[:args.n])
+
+    notified = VectorIndex(ann_mode="flat", ann_file=None, snapshot_dir=None)
+    polling = VectorIndex(ann_mode="flat", ann_file=None, snapshot_dir=None)
+    for index, listen in ((notified, True), (polling, False)):
+        index.refresh()
+        index.start_watcher(interval=args.poll, listen=listen)
+
+    start = time.perf_counter()
+    for _ in range(100):
+        notified.refresh()
+    idle_ms = (time.perf_counter() - start) * 10
+
+    def top_id(index, vector):
+        hits = index.search(vector, 1)
+        return hits[0][0] if hits else None
+
+    def max_id():
+        with get_connection() as conn:
+            return conn.execute('SELECT MAX(id) FROM records').fetchone()[0]
+
+    inserted = {'notify': [], 'poll': []}
+    replaced = {'notify': [], 'poll': []}
+    previous = None  # (vector, id) of the last write, overwritten by the next replacing write
+    for i in range(args.writes):
+        started = time.perf_counter()
+        vector = corpus[args.n + i]
+        replacing = previous is not None and (i + 1) % args.replace_every == 0
+        url = f"https://example.com/new/{i - 1 if replacing else i}"
+        known = max_id()
+
+        written = time.perf_counter()
+        write_record_queued(f"new {i}", url, "lorem ipsum", vector.tolist(), "Synthetic", "0", wait=False)
+        # ids only grow, and the new row is the exact match for its own vector
+        checks = [lambda: (top_id(notified, vector) or 0) > known, lambda: (top_id(polling, vector) or 0) > known]
+        if replacing:
+            old_vector, old_id = previous
+            checks += [lambda: top_id(notified, old_vector) != old_id, lambda: top_id(polling, old_vector) != old_id]
+        latencies = wait_until(checks, written)
+        inserted['notify'].append(latencies[0])
+        inserted['poll'].append(latencies[1])
+        if replacing:
+            replaced['notify'].append(latencies[2])
+            replaced['poll'].append(latencies[3])
+        previous = None if replacing else (vector, max_id())
+
+        time.sleep(max(0.0, 1.0 / args.rate - (time.perf_counter() - started)))
+
+    print(f"\nidle refresh (nothing written): {idle_ms:.3f} ms")
+    print(f"\n{'ms until':<18} {'p50':>8} {'p95':>8} {'max':>8} {'missed':>7}")
+    summarize("insert, notified", inserted['notify'])
+    summarize(f"insert, poll {args.poll:g}s", inserted['poll'])
+    summarize("replace, notified", replaced['notify'])
+    summarize(f"replace, poll {args.poll:g}s", replaced['poll'])
+
+if __name__ == "__main__":
+    main()
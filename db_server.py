@@ -1,5 +1,9 @@
-from utils.db import write_record, read_records, find_record_by_url, get_write_queue_stats
-from fastapi import FastAPI, HTTPException, Depends, Header
+from utils.db import (
+    write_record, write_records, read_records, find_record_by_url, find_unknown_urls,
+    get_known_url_set, get_url_set_version, get_write_queue_stats, start_embedding_backfill, get_embedding_dim
+)
+from utils.embedding_codec import embedding_from_b64
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
@@ -11,6 +15,17 @@ app = FastAPI()
 
 API_KEY = os.getenv("DB_API_KEY")
 
+MAX_BULK_RECORDS = 500
+MAX_EXISTS_URLS = 2000
+
+# last serialized url hash set, keyed by get_url_set_version()
+_url_set_cache = {"version": None, "data": b""}
+
+@app.on_event("startup")
+def backfill_embeddings():
+    """Convert any legacy JSON embeddings to packed blobs without blocking requests."""
+    start_embedding_backfill()
+
 def verify_api_key(x_api_key: Optional[str] = Header(None)):
     if x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -38,6 +53,102 @@ def write_record_endpoint(
     )
     return {"message": "Record written successfully"}
 
+class BulkPassage(BaseModel):
+    start: int  # character offsets into content
+    end: int
+    embedding_b64: str
+
+class BulkNewsRecord(BaseModel):
+    title: str
+    url: str
+    content: str
+    embedding_b64: str  # base64 of the little-endian float32 embedding
+    source: str
+    bias: str
+    passages: Optional[List[BulkPassage]] = None  # none = the whole article is one passage
+
+class BulkWriteRequest(BaseModel):
+    records: List[BulkNewsRecord]
+
+def _bulk_record_error(record: BulkNewsRecord, embedding, passages, dim: Optional[int]) -> Optional[str]:
+    """
+    Why a decoded bulk record would be stored but never found by search, or None if it is fine.
+
+    Args:
+        record: The request record
+        embedding: Its decoded embedding
+        passages: Its decoded passages
+        dim: Embedding dimension of the index (None if nothing is stored yet)
+    """
+    if embedding.ndim != 1 or len(embedding) == 0:
+        return "Invalid embedding: expected a non-empty vector"
+    if dim is not None and len(embedding) != dim:
+        return f"Invalid embedding: expected {dim} dimensions, got {len(embedding)}"
+    for n, passage in enumerate(passages):
+        if not 0 <= passage["start"] < passage["end"] <= len(record.content):
+            return f"Invalid passage {n}: need 0 <= start < end <= {len(record.content)}, got {passage['start']}..{passage['end']}"
+        if passage["embedding"].shape != embedding.shape:
+            return f"Invalid passage {n} embedding: expected {len(embedding)} dimensions, got {passage['embedding'].size}"
+    return None
+
+@app.post("/news/write/bulk")
+def write_records_bulk_endpoint(
+    request: BulkWriteRequest,
+    _: None = Depends(verify_api_key)
+) -> Dict[str, Any]:
+    """
+    Write many records in one request. They are queued together so the write
+    queue commits them in as few transactions as possible. Records whose
+    embeddings do not match the stored dimension, or whose passage offsets
+    fall outside their content, are rejected with a per-record error.
+    
+    Returns:
+        Counts plus a per-record status, in request order
+    """
+    if len(request.records) > MAX_BULK_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_RECORDS} records per request")
+    
+    results = [None] * len(request.records)
+    records = []
+    positions = []
+    dim = get_embedding_dim()
+    for i, record in enumerate(request.records):
+        try:
+            embedding = embedding_from_b64(record.embedding_b64)
+            passages = [
+                {"start": passage.start, "end": passage.end, "embedding": embedding_from_b64(passage.embedding_b64)}
+                for passage in record.passages or []
+            ]
+        except ValueError as e:
+            results[i] = {"url": record.url, "status": "error", "error": f"Invalid embedding: {e}"}
+            continue
+        error = _bulk_record_error(record, embedding, passages, dim)
+        if error:
+            results[i] = {"url": record.url, "status": "error", "error": error}
+            continue
+        # an empty database takes its dimension from the first valid record
+        dim = dim or len(embedding)
+        records.append({
+            "title": record.title,
+            "url": record.url,
+            "content": record.content,
+            "embedding": embedding,
+            "source": record.source,
+            "bias": record.bias,
+            "passages": passages
+        })
+        positions.append(i)
+    
+    for i, status in zip(positions, write_records(records)):
+        results[i] = status
+    
+    written = sum(1 for result in results if result["status"] == "ok")
+    return {
+        "written": written,
+        "failed": len(results) - written,
+        "results": results
+    }
+
 @app.get("/news/read")
 def read_records_endpoint(
     _: None = Depends(verify_api_key)
@@ -54,6 +165,38 @@ def find_record_by_url_endpoint(
         raise HTTPException(status_code=404, detail="Record not found")
     return record
 
+class ExistsRequest(BaseModel):
+    urls: List[str]
+
+@app.post("/news/exists")
+def exists_endpoint(
+    request: ExistsRequest,
+    _: None = Depends(verify_api_key)
+) -> Dict[str, Any]:
+    """
+    Check many URLs at once.
+    
+    Returns:
+        The URLs that are not in the database yet
+    """
+    if len(request.urls) > MAX_EXISTS_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_EXISTS_URLS} urls per request")
+    return {"unknown": find_unknown_urls(request.urls)}
+
+@app.get("/news/urls/hashes")
+def url_hashes_endpoint(
+    _: None = Depends(verify_api_key)
+) -> Response:
+    """
+    Export the set of known URLs as sorted little-endian uint64 hashes
+    (see utils.url_set), so scanners can skip already-stored articles locally.
+    """
+    version = get_url_set_version()
+    if _url_set_cache["version"] != version:
+        _url_set_cache["data"] = get_known_url_set().to_bytes()
+        _url_set_cache["version"] = version
+    return Response(content=_url_set_cache["data"], media_type="application/octet-stream")
+
 @app.get("/queue/stats")
 def get_queue_stats_endpoint(
     _: None = Depends(verify_api_key)
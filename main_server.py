@@ -1,17 +1,28 @@
 from fastapi import FastAPI, HTTPException, Query, Depends, Header
+from fastapi.responses import JSONResponse
 from typing import Dict, Any, Optional
-from search_server.google_search import google_search
+from search_server.google_search import google_search, google_search_api
 from search_server.news_search import news_search
 from search_server.cache import search_cache
+from search_server.single_flight import search_flight, scrape_flight
 from search_server.globals import get_request_count
 import os
 import requests
 from utils.news_content_strip import extract_main_content
 from utils.models import extract
+from utils.model_cache import model_cache
+from utils.query_cache import query_cache
+from utils.search import get_search_stats, record_response_size
 
 app = FastAPI(title="uplink", version="1.0.0")
 
 API_KEY = os.getenv("API_KEY", "hackathon-2025")
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", API_KEY)
+
+@app.on_event("shutdown")
+async def close_search_client():
+    """Close the pooled Google search connections."""
+    await google_search_api.close()
 
 def verify_api_key(x_api_key: str = Header(None)):
     """Simple API key verification"""
@@ -22,11 +33,23 @@ def verify_api_key(x_api_key: str = Header(None)):
         )
     return True
 
+def verify_admin_key(x_api_key: str = Header(None)):
+    """API key verification for admin endpoints"""
+    if x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid admin API key.")
+    return True
+
 @app.get("/")
 def root():
     """Health check endpoint."""
     return {"message": "uplink is alive and well -- mikus"}
 
+def scrape_and_summarize(url: str) -> str:
+    """Download a page and summarize its main content."""
+    resp = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
+    main_content = extract_main_content(resp.text)
+    return extract(main_content, mode="random")
+
 @app.get("/scrape")
 def scrape_endpoint(
     url: str = Query(..., description="URL to scrape"),
@@ -42,15 +65,13 @@ def scrape_endpoint(
     try:
         if not url.startswith(("http://", "https://")):
             raise HTTPException(status_code=400, detail="Invalid URL format. Must start with http:// or https://")
-        resp = requests.get(url, timeout=10, headers={"User-Agent": "Mozilla/5.0"})
-        main_content = extract_main_content(resp.text)
-        summary = extract(main_content, mode="random")
+        summary = scrape_flight.do(search_cache._get_cache_key("scrape", url=url), scrape_and_summarize, url)
         return {"url": url, "summary": summary}
     except Exception as e:
         raise HTTPException(status_code=500, detail="An error occured. We dont know what happened!")
 
 @app.get("/search")
-def search_endpoint(
+async def search_endpoint(
     q: str = Query(..., description="Search query"),
     num: int = Query(5, ge=1, le=5, description="Number of results (1-5)"),
     start: int = Query(1, ge=1, description="Starting index for results"),
@@ -72,7 +93,7 @@ def search_endpoint(
         Search results with metadata
     """
     try:
-        results = google_search(
+        results = await google_search(
             query=q,
             num_results=num,
             start=start,
@@ -86,6 +107,9 @@ def search_endpoint(
             "count": len(results),
             "start": start
         }
+
+    except HTTPException:
+        raise
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -94,6 +118,12 @@ def search_endpoint(
 def search_news_endpoint(
     q: str = Query(..., description="News search query"),
     num: int = Query(10, ge=1, le=10, description="Number of results (1-10)"),
+    sources: Optional[str] = Query(None, description="Comma-separated sources to restrict to"),
+    bias_min: Optional[int] = Query(None, ge=-2, le=2, description="Minimum bias (-2 left to 2 right)"),
+    bias_max: Optional[int] = Query(None, ge=-2, le=2, description="Maximum bias (-2 left to 2 right)"),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0, description="Minimum similarity (0-1)"),
+    mode: Optional[str] = Query(None, description="vector, lexical (keyword / BM25) or hybrid (both, rank-fused)"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields: id, title, url, content, snippet, source, bias (default: all but content)"),
     authenticated: bool = Depends(verify_api_key)
 ) -> Dict[str, Any]:
     """
@@ -101,18 +131,45 @@ def search_news_endpoint(
     Args:
         q: Search query
         num: Number of results to return (1-10)
+        sources: Comma-separated sources to restrict to (optional)
+        bias_min, bias_max: Bias range to restrict to (optional)
+        min_similarity: Minimum similarity
+        mode: Retrieval mode (optional, server default otherwise)
+        fields: Result fields (optional); add content for full article bodies
     Returns:
         Search results with metadata
     """
     try:
-        results = news_search(query=q, top_k=num)
+        source_list = [source.strip() for source in sources.split(",") if source.strip()] if sources else None
+        bias_range = None
+        if bias_min is not None or bias_max is not None:
+            bias_range = (-2 if bias_min is None else bias_min, 2 if bias_max is None else bias_max)
+            if bias_range == (-2, 2):
+                bias_range = None  # the full scale is no filter
+
+        results, info = news_search(
+            query=q,
+            top_k=num,
+            sources=source_list,
+            bias_range=bias_range,
+            min_similarity=min_similarity,
+            mode=mode,
+            fields=fields.split(",") if fields else None
+        )
         
-        return {
+        # serialized here rather than by fastapi so the response size can be recorded
+        response = JSONResponse({
             "query": q,
             "results": results,
-            "count": len(results) if results else 0
-        }
+            "count": len(results) if results else 0,
+            "mode": info["mode"],
+            "degraded": info["degraded"]
+        })
+        record_response_size(info["fields"], len(response.body))
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -120,18 +177,37 @@ def search_news_endpoint(
 def cache_stats(authenticated: bool = Depends(verify_api_key)) -> Dict[str, Any]:
     """cache stats"""
     try:
-        cache_dir = search_cache.cache_dir
-        cache_files = list(cache_dir.glob("*.json"))
-        
+        search_stats = search_cache.get_stats()
+
         return {
-            "cache_directory": str(cache_dir),
-            "cached_queries": len(cache_files),
-            "ttl_seconds": search_cache.ttl_seconds
+            "cache_file": search_stats["db_path"],
+            "cached_queries": search_stats["entries"],
+            "ttl_seconds": search_cache.ttl_seconds,
+            "search_cache": search_stats,
+            "background_refresh": google_search_api.get_refresh_stats(),
+            "google_pages": google_search_api.get_page_stats(),
+            "single_flight": {
+                "search": search_flight.get_stats(),
+                "scrape": scrape_flight.get_stats()
+            },
+            "model_cache": model_cache.get_stats(),
+            "query_cache": query_cache.get_stats(),
+            "news_search": get_search_stats()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/admin/keys")
+def admin_keys(authenticated: bool = Depends(verify_admin_key)) -> Dict[str, Any]:
+    """google api key health (keys redacted)"""
+    scheduler = google_search_api.key_scheduler
+    return {
+        "daily_quota": scheduler.daily_quota,
+        "retry_after_seconds": round(scheduler.retry_after(), 1),
+        "keys": scheduler.snapshot()
+    }
+
 @app.get("/status")
 def status():
     """status endpoint that literally just returns operational and the total number of requests made to the server"""
@@ -149,4 +225,5 @@ def status():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # workers map the same news index snapshot (INDEX_SNAPSHOT_DIR) rather than each decoding it from sqlite
+    uvicorn.run("main_server:app", host="0.0.0.0", port=8001, workers=int(os.getenv("SERVER_WORKERS", 1)))
@@ -49,6 +49,11 @@ def search_endpoint(
 def search_news_endpoint(
         q: str,
         num: int = 5,
+        sources: str = None,
+        bias_min: int = None,
+        bias_max: int = None,
+        mode: str = None,
+        fields: str = None,
 ) -> dict:
     """
     Search news articles, similar to Google News.
@@ -56,6 +61,12 @@ def search_news_endpoint(
     Args:
         q: Search query
         num: Number of results to return (default 5) [maximum of 5]
+        sources: Comma-separated news sources to restrict to (optional)
+        bias_min: Minimum political bias, -2 (left) to 2 (right) (optional)
+        bias_max: Maximum political bias, -2 (left) to 2 (right) (optional)
+        mode: "vector" (meaning), "lexical" (exact keywords: names, places, tickers) or "hybrid" (both) (optional)
+        fields: Comma-separated fields to return out of id, title, url, content, snippet, source, bias (optional).
+            The default leaves out content and returns a short snippet around the query; add content only if you need full article text
 
     Returns:
         News search results as a dictionary
@@ -63,6 +74,11 @@ def search_news_endpoint(
     params = {
         "q": q,
         "num": num,
+        "sources": sources or None,
+        "bias_min": bias_min,
+        "bias_max": bias_max,
+        "mode": mode or None,
+        "fields": fields or None,
     }
     
     try:
@@ -140,13 +156,18 @@ with gr.Blocks(title="Uplink") as demo:
             with gr.Column():
                 news_query = gr.Textbox(label="News Search Query", placeholder="Type your news topic...")
                 news_num_results = gr.Slider(minimum=1, maximum=5, value=5, step=1, label="Number of Results")
+                news_sources = gr.Textbox(label="Sources (optional)", placeholder="comma-separated, e.g. bbc,guardian")
+                news_bias_min = gr.Slider(minimum=-2, maximum=2, value=-2, step=1, label="Minimum Bias (left to right)")
+                news_bias_max = gr.Slider(minimum=-2, maximum=2, value=2, step=1, label="Maximum Bias (left to right)")
+                news_mode = gr.Radio(choices=["vector", "lexical", "hybrid"], value=None, label="Retrieval Mode (optional)")
+                news_fields = gr.Textbox(label="Fields (optional)", placeholder="comma-separated, e.g. title,url,snippet")
                 news_search_btn = gr.Button("📰 Search News")
             with gr.Column():
                 news_output = gr.JSON(label="News Results")
 
         news_search_btn.click(
             fn=search_news_endpoint,
-            inputs=[news_query, news_num_results],
+            inputs=[news_query, news_num_results, news_sources, news_bias_min, news_bias_max, news_mode, news_fields],
             outputs=news_output
         )
 
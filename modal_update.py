@@ -1,8 +1,9 @@
 import modal
-from utils.rss_parse import get_rss
+from utils.url_set import UrlHashSet
 from utils.mappings import mappings
-from utils.news_content_strip import extract_main_content
-from utils.models import embed_text, extract, bias
+from utils.ingest import ingest, feed_list
+from utils.embedding_codec import embedding_to_b64
+import asyncio
 import requests
 import time
 import os
@@ -22,101 +23,115 @@ image = modal.Image.debian_slim().pip_install([
     "rss-parser",
     "huggingface_hub",
     "python-dotenv",
-    "numpy"
+    "numpy",
+    "openai",
+    "aiohttp"
 ]).copy_local_dir("./utils", "/root/utils")
 
-def fetch_content(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
-        print(f"Error fetching content from {url}: {e}")
-        return ""
+def load_known_urls_api():
+    """Download the set of known URL hashes once per scan, with retry logic"""
+    API_BASE_URL = os.getenv('DB_URL', '')
+    headers = {"x-api-key": os.getenv('DB_API_KEY', '')}
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = requests.get(f"{API_BASE_URL}/news/urls/hashes", headers=headers, timeout=60)
+            response.raise_for_status()
+            known = UrlHashSet.from_bytes(response.content)
+            print(f"Loaded {len(known)} known url hashes")
+            return known
+        except requests.RequestException as e:
+            if attempt == MAX_RETRIES - 1:
+                print(f"Failed to load known urls after {MAX_RETRIES} attempts: {e}")
+                return UrlHashSet()
+            time.sleep(RETRY_DELAY * (attempt + 1))
 
-def find_record_by_url_api(url):
-    """Check if a record exists using the API with retry logic"""
+def find_unknown_urls_api(urls):
+    """Ask the API which of the given URLs are new, in one request, with retry logic"""
+    if not urls:
+        return []
     API_BASE_URL = os.getenv('DB_URL', '')
     headers = {"x-api-key": os.getenv('DB_API_KEY', '')}
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(f"{API_BASE_URL}/news/find", params={"url": url}, headers=headers, timeout=30)
-            return response.status_code == 200
+            response = requests.post(f"{API_BASE_URL}/news/exists", json={"urls": urls}, headers=headers, timeout=30)
+            response.raise_for_status()
+            return response.json()["unknown"]
         except requests.RequestException as e:
             if attempt == MAX_RETRIES - 1:
+                # assume everything is new; a duplicate write just replaces the row
                 print(f"Failed to check record existence after {MAX_RETRIES} attempts: {e}")
-                return False
+                return urls
             time.sleep(RETRY_DELAY * (attempt + 1))
         except Exception as e:
-            print(f"Unexpected error checking record: {e}")
-            return False
+            print(f"Unexpected error checking records: {e}")
+            return urls
 
-def write_record_api(title, url, content, embedding, source, bias):
-    """Write a record using the API with retry logic"""
+def write_records_bulk_api(records):
+    """
+    Write a batch of records in one request using the bulk endpoint, with retry logic.
+    
+    Returns:
+        The records that were written
+    """
+    if not records:
+        return []
+    
     API_BASE_URL = os.getenv('DB_URL', '')
     headers = {"x-api-key": os.getenv('DB_API_KEY', '')}
     data = {
-        "title": title,
-        "url": url,
-        "content": content,
-        "embedding": embedding,
-        "source": source,
-        "bias": bias
+        "records": [
+            {
+                "title": record["title"],
+                "url": record["url"],
+                "content": record["content"],
+                "embedding_b64": embedding_to_b64(record["embedding"]),
+                "source": record["source"],
+                "bias": record["bias"],
+                "passages": [
+                    {"start": passage["start"], "end": passage["end"], "embedding_b64": embedding_to_b64(passage["embedding"])}
+                    for passage in record.get("passages") or []
+                ] or None
+            }
+            for record in records
+        ]
     }
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(f"{API_BASE_URL}/news/write", json=data, headers=headers, timeout=30)
-            if response.status_code == 200:
-                return True
-            else:
+            response = requests.post(f"{API_BASE_URL}/news/write/bulk", json=data, headers=headers, timeout=60)
+            if response.status_code != 200:
                 print(f"API returned status {response.status_code}: {response.text}")
-                return False
+                return []
+            
+            written = []
+            for record, status in zip(records, response.json()["results"]):
+                if status["status"] == "ok":
+                    written.append(record)
+                else:
+                    print(f"Failed to write article {status['url']}: {status['error']}")
+            return written
         except requests.RequestException as e:
             if attempt == MAX_RETRIES - 1:
-                print(f"Failed to write record after {MAX_RETRIES} attempts: {e}")
-                return False
+                print(f"Failed to write {len(records)} records after {MAX_RETRIES} attempts: {e}")
+                return []
             print(f"Attempt {attempt + 1} failed, retrying in {RETRY_DELAY * (attempt + 1)}s: {e}")
             time.sleep(RETRY_DELAY * (attempt + 1))
         except Exception as e:
             print(f"Unexpected error writing to API: {e}")
-            return False
+            return []
 
-def process_entry(entry, feed_name):
-    try:
-        url = str(entry.links[0].content if hasattr(entry.links[0], "content") else entry.links[0])
-        if find_record_by_url_api(url):
-            return
-        content = fetch_content(url) if entry.links else ""
-        if not content:
-            print(f"No content found for {entry.title.content} in {feed_name}")
-            return
-        content = extract_main_content(content)
-        content = extract(content)
-        
-        success = write_record_api(
-            title=str(entry.title.content),
-            url=url,
-            content=str(content),
-            embedding=embed_text(content),
-            source=str(feed_name),
-            bias=str(bias(content))
-        )
-        
-        if success:
-            print(f"Added new article: {entry.title.content} ({url})")
-        else:
-            print(f"Failed to write article: {entry.title.content} ({url})")
-    except Exception as e:
-        print(f"Error processing entry {entry.title.content} from {feed_name}: {e}")
+async def remote_sink(records):
+    return await asyncio.to_thread(write_records_bulk_api, records)
 
-def process_feed(feed_name, feeds):
-    for feed_url in feeds:
-        print(f"Processing feed: {feed_url}")
-        rss = get_rss(feed_url)
-        entries = rss.channel.items if rss else []
-        for entry in entries:
-            process_entry(entry, feed_name)
+def run_scan():
+    known = load_known_urls_api()
+    
+    async def known_filter(urls):
+        # definite hits in the downloaded hash set never leave the container
+        candidates = [url for url in urls if url not in known]
+        return await asyncio.to_thread(find_unknown_urls_api, candidates)
+    
+    asyncio.run(ingest(feed_list(mappings), remote_sink, known_filter))
 
 @app.function(
     image=image,
@@ -128,8 +143,7 @@ def scheduled_rss_scan():
     """Scheduled RSS scanning function"""
     print("Starting scheduled RSS scan...")
     
-    for feed_name, feeds in mappings.items():
-        process_feed(feed_name, feeds)
+    run_scan()
     
     print("Scheduled RSS scan complete.")
 
@@ -138,8 +152,7 @@ def manual_rss_scan():
     """Manually triggered RSS scanning function"""
     print("Starting manual RSS scan...")
     
-    for feed_name, feeds in mappings.items():
-        process_feed(feed_name, feeds)
+    run_scan()
     
     print("Manual RSS scan complete.")
 
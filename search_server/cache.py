@@ -1,131 +1,341 @@
 import json
+import os
 import time
+import zlib
+import sqlite3
 import hashlib
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
-import os
+
+SEARCH_CACHE_FILE = os.environ.get("SEARCH_CACHE_FILE", "search_cache.db")
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 60 * 60 * 24))
+SEARCH_CACHE_SOFT_TTL = int(os.environ.get("SEARCH_CACHE_SOFT_TTL", 60 * 60 * 6))
+SEARCH_CACHE_REFRESH_AHEAD_HITS = int(os.environ.get("SEARCH_CACHE_REFRESH_AHEAD_HITS", 5))
+
+# lookup states
+FRESH = "fresh"
+STALE = "stale"  # past the soft ttl - serve it, but refresh in the background
+REFRESH_AHEAD = "refresh_ahead"  # still fresh, but popular and close to going stale
+MISS = "miss"
 
 class SearchCache:
-    def __init__(self, cache_dir: str = "search_cache", ttl_seconds: int = 60 * 60 * 24):
+    def __init__(
+        self,
+        db_path: str = SEARCH_CACHE_FILE,
+        ttl_seconds: int = SEARCH_CACHE_TTL,
+        soft_ttl_seconds: int = SEARCH_CACHE_SOFT_TTL,
+        refresh_ahead_hits: int = SEARCH_CACHE_REFRESH_AHEAD_HITS,
+        memory_entries: int = 1024,
+        legacy_dir: Optional[str] = "search_cache"
+    ):
         """
         Initialize the search cache.
-        
+
+        Lookups go through a bounded in-process LRU (hot tier) and fall back to a
+        single SQLite database (cold tier) indexed by key and expiry. Entries
+        older than the soft ttl are still served but reported as stale so the
+        caller can refresh them; past the hard ttl they are gone.
+
         Args:
-            cache_dir: Directory to store cache files
-            ttl_seconds: Time to live for cache entries in seconds (default: 1 day)
+            db_path: SQLite file backing the cold tier
+            ttl_seconds: Hard time to live for cache entries in seconds (default: 1 day)
+            soft_ttl_seconds: Age after which entries are served stale (default: 6 hours)
+            refresh_ahead_hits: Hits after which a fresh entry is refreshed early, from 80% of the soft ttl
+            memory_entries: Max entries held in the in-memory hot tier
+            legacy_dir: Directory of old one-file-per-query JSON entries to import on startup
         """
-        self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
+        self.db_path = db_path
         self.ttl_seconds = ttl_seconds
-    
+        self.soft_ttl_seconds = min(soft_ttl_seconds, ttl_seconds)
+        self.refresh_ahead_hits = refresh_ahead_hits
+        self.memory_entries = memory_entries
+        self._hot = OrderedDict()  # key -> [created, results, hits]
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                query TEXT,
+                params TEXT,
+                results BLOB,
+                created REAL,
+                expires REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS search_cache_expires ON search_cache (expires)')
+        self._conn.commit()
+
+        self.stats = {
+            'entries': self._conn.execute('SELECT COUNT(*) FROM search_cache').fetchone()[0],
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'expired': 0,
+            'stale_hits': 0,
+            'refresh_ahead_hits': 0
+        }
+
+        if legacy_dir and Path(legacy_dir).is_dir():
+            imported = self.import_legacy_json(legacy_dir)
+            if imported:
+                print(f"Imported {imported} legacy cache entries from {legacy_dir}")
+
     def _get_cache_key(self, query: str, **kwargs) -> str:
         """Generate a cache key based on the query and parameters."""
         cache_data = {"query": query, **kwargs}
         cache_str = json.dumps(cache_data, sort_keys=True)
         return hashlib.md5(cache_str.encode()).hexdigest()
-    
-    def _get_cache_file_path(self, cache_key: str) -> Path:
-        """Get the full path to a cache file."""
-        return self.cache_dir / f"{cache_key}.json"
-    
+
+    @staticmethod
+    def _encode(data: Any) -> bytes:
+        return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+    def _remember(self, key: str, created: float, results: Dict[str, Any], hits: int = 0):
+        """Put an entry in the hot tier, evicting the least recently used one if full."""
+        self._hot[key] = [created, results, hits]
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.memory_entries:
+            self._hot.popitem(last=False)
+
+    def _delete(self, key: str):
+        self._hot.pop(key, None)
+        cursor = self._conn.execute('DELETE FROM search_cache WHERE key = ?', (key,))
+        self._conn.commit()
+        self.stats['entries'] -= cursor.rowcount
+
     def get(self, query: str, **kwargs) -> Optional[Dict[str, Any]]:
         """
         Retrieve cached search results.
-        
+
+        Args:
+            query: Search query
+            **kwargs: Additional parameters to include in cache key
+
+        Returns:
+            Cached results if found and not past the hard ttl, None otherwise
+        """
+        return self.lookup(query, **kwargs)[0]
+
+    def lookup(self, query: str, **kwargs) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Retrieve cached search results along with their freshness.
+
         Args:
             query: Search query
             **kwargs: Additional parameters to include in cache key
-            
+
         Returns:
-            Cached results if found and not expired, None otherwise
+            (results, state) where state is FRESH, REFRESH_AHEAD, STALE or MISS
         """
-        cache_key = self._get_cache_key(query, **kwargs)
-        cache_file = self._get_cache_file_path(cache_key)
-        
-        if not cache_file.exists():
+        return self._lookup(self._get_cache_key(query, **kwargs), record=True)
+
+    def peek(self, query: str, **kwargs) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Like lookup, but without counting a hit or miss - for re-checks inside a fetch."""
+        return self._lookup(self._get_cache_key(query, **kwargs), record=False)
+
+    def _lookup(self, cache_key: str, record: bool) -> Tuple[Optional[Dict[str, Any]], str]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._hot.get(cache_key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._hot.move_to_end(cache_key)
+                tier = 'memory_hits'
+            else:
+                entry = self._load(cache_key, now)
+                tier = 'disk_hits'
+            if entry is None:
+                if record:
+                    self.stats['misses'] += 1
+                return None, MISS
+
+            created, results, hits = entry
+            state = self._state(now - created, hits + record)
+            if record:
+                entry[2] += 1
+                self.stats[tier] += 1
+                if state != FRESH:
+                    self.stats[state + '_hits'] += 1
+            return results, state
+
+    def _state(self, age: float, hits: int) -> str:
+        if age > self.soft_ttl_seconds:
+            return STALE
+        if hits >= self.refresh_ahead_hits and age > 0.8 * self.soft_ttl_seconds:
+            return REFRESH_AHEAD
+        return FRESH
+
+    def _load(self, cache_key: str, now: float) -> Optional[list]:
+        """Read an entry from the cold tier into the hot tier, dropping it if expired or unreadable."""
+        row = self._conn.execute(
+            'SELECT results, created, expires FROM search_cache WHERE key = ?', (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        blob, created, expires = row
+        if expires < now:
+            self._delete(cache_key)
+            self.stats['expired'] += 1
             return None
-        
+
         try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-            
-            if time.time() - cached_data.get('timestamp', 0) > self.ttl_seconds:
-                cache_file.unlink(missing_ok=True)
-                return None
-            
-            return cached_data.get('results')
-        
-        except (json.JSONDecodeError, KeyError, OSError) as e:
-            print(f"Error reading cache file {cache_file}: {e}")
-            cache_file.unlink(missing_ok=True)
+            results = self._decode(blob)
+        except (zlib.error, json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Error reading cache entry {cache_key}: {e}")
+            self._delete(cache_key)
             return None
-    
+
+        self._remember(cache_key, created, results)
+        return self._hot[cache_key]
+
     def set(self, query: str, results: Dict[str, Any], **kwargs) -> None:
         """
         Store search results in cache.
-        
+
         Args:
             query: Search query
             results: Search results to cache
             **kwargs: Additional parameters to include in cache key
         """
         cache_key = self._get_cache_key(query, **kwargs)
-        cache_file = self._get_cache_file_path(cache_key)
-        
-        cache_data = {
-            'timestamp': time.time(),
-            'query': query,
-            'results': results,
-            'params': kwargs
-        }
-        
+        self._store(cache_key, query, kwargs, results, time.time())
+
+    def _store(self, cache_key: str, query: str, params: Dict[str, Any], results: Dict[str, Any], created: float):
+        expires = created + self.ttl_seconds
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
-        except OSError as e:
-            print(f"Error writing to cache file {cache_file}: {e}")
-    
+            blob = self._encode(results)
+            params_str = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        except (TypeError, ValueError) as e:
+            print(f"Error serializing cache entry for '{query}': {e}")
+            return
+
+        with self._lock:
+            try:
+                exists = self._conn.execute(
+                    'SELECT 1 FROM search_cache WHERE key = ?', (cache_key,)
+                ).fetchone()
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO search_cache (key, query, params, results, created, expires)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (cache_key, query, params_str, blob, created, expires))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing cache entry for '{query}': {e}")
+                return
+
+            if not exists:
+                self.stats['entries'] += 1
+            self.stats['sets'] += 1
+            self._remember(cache_key, created, results)
+
     def clear_expired(self) -> int:
         """
         Remove expired cache entries.
-        
+
         Returns:
             Number of expired entries removed
         """
-        removed_count = 0
-        current_time = time.time()
-        
-        for cache_file in self.cache_dir.glob("*.json"):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                
-                if current_time - cached_data.get('timestamp', 0) > self.ttl_seconds:
-                    cache_file.unlink()
-                    removed_count += 1
-            
-            except (json.JSONDecodeError, KeyError, OSError):
-                # Remove corrupted files
-                cache_file.unlink(missing_ok=True)
-                removed_count += 1
-        
-        return removed_count
-    
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (created, _, _) in self._hot.items() if now - created > self.ttl_seconds]:
+                del self._hot[key]
+            cursor = self._conn.execute('DELETE FROM search_cache WHERE expires < ?', (now,))
+            self._conn.commit()
+            self.stats['entries'] -= cursor.rowcount
+            self.stats['expired'] += cursor.rowcount
+            return cursor.rowcount
+
     def clear_all(self) -> int:
         """
         Clear all cache entries.
-        
+
         Returns:
             Number of entries removed
         """
-        removed_count = 0
-        for cache_file in self.cache_dir.glob("*.json"):
+        with self._lock:
+            self._hot.clear()
+            cursor = self._conn.execute('DELETE FROM search_cache')
+            self._conn.commit()
+            self.stats['entries'] = 0
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache counters, kept in memory so this never touches the disk."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._hot)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['ttl_seconds'] = self.ttl_seconds
+        stats['soft_ttl_seconds'] = self.soft_ttl_seconds
+        stats['db_path'] = self.db_path
+        return stats
+
+    def import_legacy_json(self, cache_dir: str) -> int:
+        """
+        Import entries written by the old one-JSON-file-per-query cache.
+
+        Unexpired entries keep their original key and timestamp. A file is
+        removed once it has been imported or found expired; files that could
+        not be read are left in place, and the directory is only removed if it
+        ends up empty.
+
+        Returns:
+            Number of entries imported
+        """
+        imported = 0
+        now = time.time()
+        directory = Path(cache_dir)
+
+        for cache_file in directory.glob("*.json"):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached_data = json.load(f)
+                created = cached_data.get('timestamp', 0)
+                if now - created <= self.ttl_seconds:
+                    self._store(
+                        cache_file.stem,
+                        cached_data.get('query', ''),
+                        cached_data.get('params', {}),
+                        cached_data.get('results'),
+                        created
+                    )
+                    imported += 1
+            except (json.JSONDecodeError, KeyError, AttributeError, OSError) as e:
+                # keep it: a permission or transient read error must not lose the entry
+                print(f"Skipping unreadable cache file {cache_file}, leaving it in place: {e}")
+                continue
             try:
-                cache_file.unlink()
-                removed_count += 1
-            except OSError:
-                pass
-        
-        return removed_count
-
-search_cache = SearchCache()
\ No newline at end of file
+                cache_file.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Could not remove imported cache file {cache_file}: {e}")
+
+        try:
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
+        except OSError:
+            pass
+
+        return imported
+
+search_cache = SearchCache()
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        # search_cache already imported the default directory on startup
+        source = sys.argv[2] if len(sys.argv) > 2 else "search_cache"
+        print(f"Imported {search_cache.import_legacy_json(source)} entries from {source}")
+    else:
+        print("usage: python -m search_server.cache migrate [legacy_cache_dir]")
@@ -1,15 +1,37 @@
 import os
+import json
 import time
 import random
-import requests
-from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import threading
+import aiohttp
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Iterable
 from fastapi import HTTPException
 from dotenv import load_dotenv
-from .cache import search_cache
+from .cache import search_cache, FRESH
+from .single_flight import search_flight
+from .key_health import KeyScheduler, redact_key
 from search_server.globals import increment_request_count
+from utils.pipeline import RateLimiter
 
 load_dotenv()
 
+SEARCH_REFRESH_WORKERS = int(os.environ.get("SEARCH_REFRESH_WORKERS", 2))
+GOOGLE_POOL_SIZE = int(os.environ.get("GOOGLE_POOL_SIZE", 20))
+GOOGLE_KEY_RATE = float(os.environ.get("GOOGLE_KEY_RATE", 10))
+GOOGLE_KEY_BURST = int(os.environ.get("GOOGLE_KEY_BURST", 2))
+
+SEARCH_PREFETCH_NEXT_PAGE = os.environ.get("SEARCH_PREFETCH_NEXT_PAGE", "0") == "1"
+
+# google returns at most 10 items per request and 100 per query
+GOOGLE_PAGE_SIZE = 10
+GOOGLE_MAX_START = 91
+SEEN_KEYS_LIMIT = 10000
+
+QUOTA_REASONS = {'dailyLimitExceeded', 'quotaExceeded'}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
 class GoogleSearchAPI:
     def __init__(self):
         """Initialize Google Search API with multiple API keys and CSE IDs."""
@@ -23,44 +45,83 @@ class GoogleSearchAPI:
             )
         
         self.base_url = "https://www.googleapis.com/customsearch/v1"
-        self.current_api_index = 0
         self.current_cse_index = 0
-        self.last_request_time = 0
-        self.min_request_interval = 0.1
+        self._credentials_lock = threading.Lock()
+        self.key_scheduler = KeyScheduler(self.api_keys)
+
+        # one token bucket per api key; google meters requests per key
+        self._limiters = {api_key: RateLimiter(GOOGLE_KEY_RATE, GOOGLE_KEY_BURST) for api_key in self.api_keys}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self._refresh_tasks = set()
+        self._refresh_semaphore: Optional[asyncio.Semaphore] = None
+        self._refreshing = set()
+        self.refresh_stats = {'scheduled': 0, 'completed': 0, 'failed': 0}
+
+        self.page_stats = {'searches': 0, 'page_hits': 0, 'page_misses': 0, 'upstream_calls': 0, 'prefetches': 0, 'per_request_misses': 0}
+        # (num_results, start)-specific keys seen recently, to estimate what per-request caching would have cost
+        self._seen_request_keys = OrderedDict()
     
     def _load_env_list(self, env_var: str) -> List[str]:
         """Load a comma-separated list from environment variable."""
         value = os.getenv(env_var, "")
         return [item.strip() for item in value.split(",") if item.strip()]
     
-    def _get_next_credentials(self) -> Tuple[str, str]:
-        """Get the next API key and CSE ID pair, rotating through available options."""
-        api_key = self.api_keys[self.current_api_index]
-        cse_id = self.cse_ids[self.current_cse_index]
-        
-        self.current_cse_index = (self.current_cse_index + 1) % len(self.cse_ids)
-        if self.current_cse_index == 0:
-            self.current_api_index = (self.current_api_index + 1) % len(self.api_keys)
+    def _get_next_credentials(self, exclude: Iterable[str] = ()) -> Optional[Tuple[str, str]]:
+        """Get the healthiest usable API key and the next CSE ID, or None if no key is usable."""
+        api_key = self.key_scheduler.pick(exclude)
+        if api_key is None:
+            return None
+
+        with self._credentials_lock:
+            cse_id = self.cse_ids[self.current_cse_index]
+            self.current_cse_index = (self.current_cse_index + 1) % len(self.cse_ids)
         
         return api_key, cse_id
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Shared keep-alive session, created on first use inside the event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=GOOGLE_POOL_SIZE, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+
+    async def close(self):
+        """Close the connection pool and wait for background refreshes."""
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        await asyncio.to_thread(self.key_scheduler.save)
     
-    def _rate_limit_delay(self):
-        """Add delay to prevent rate limiting."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.min_request_interval:
-            delay = self.min_request_interval - time_since_last
-            time.sleep(delay)
-        
-        self.last_request_time = time.time()
-    
-    def _make_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _error_reason(body: str) -> str:
+        """Pull the reason code out of a Google API error response."""
+        try:
+            errors = json.loads(body).get('error', {}).get('errors', [])
+            return errors[0].get('reason', '') if errors else ''
+        except (ValueError, AttributeError):
+            return ''
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        try:
+            return float(response.headers.get('Retry-After', ''))
+        except ValueError:
+            return None
+
+    async def _make_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Make a request to Google Custom Search API with error handling."""
         max_retries = len(self.api_keys) * len(self.cse_ids)
+        session = self._get_session()
+        scheduler = self.key_scheduler
+        failed_keys = set()
         
         for attempt in range(max_retries):
-            api_key, cse_id = self._get_next_credentials()
+            credentials = self._get_next_credentials(exclude=failed_keys)
+            if credentials is None:
+                break
+            api_key, cse_id = credentials
             
             request_params = {
                 **params,
@@ -68,38 +129,55 @@ class GoogleSearchAPI:
                 'cx': cse_id
             }
             
-            self._rate_limit_delay()
+            await self._limiters[api_key].acquire()
+            start = time.perf_counter()
             
             try:
-                response = requests.get(self.base_url, params=request_params, timeout=10)
-                
-                if response.status_code == 200:
-                    increment_request_count()
-                    return response.json()
-                
-                elif response.status_code == 429:
-                    print(f"Rate limit exceeded for API key {api_key[:10]}... (attempt {attempt + 1})")
-                    time.sleep(min(2 ** attempt, 60))
-                    continue
-                
-                elif response.status_code == 403:  # quota exceeded or invalid key
-                    print(f"Quota exceeded or invalid API key {api_key[:10]}... (attempt {attempt + 1})")
-                    continue
-                
-                else:
-                    print(f"API request failed with status {response.status_code}: {response.text}")
-                    continue
+                async with session.get(self.base_url, params=request_params) as response:
+                    if response.status == 200:
+                        data = await response.json(content_type=None)
+                        scheduler.record_success(api_key, (time.perf_counter() - start) * 1000)
+                        increment_request_count()
+                        return data
+
+                    body = await response.text()
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    reason = self._error_reason(body)
+                    
+                    if response.status == 429 or reason in RATE_LIMIT_REASONS:
+                        print(f"Rate limit exceeded for API key {redact_key(api_key)} (attempt {attempt + 1})")
+                        scheduler.record_rate_limited(api_key, latency_ms, self._retry_after(response))
+                    
+                    elif response.status == 403 and reason in QUOTA_REASONS:
+                        print(f"Daily quota exhausted for API key {redact_key(api_key)}")
+                        scheduler.record_quota_exhausted(api_key, latency_ms)
+                    
+                    elif response.status == 400 and reason != 'keyInvalid':
+                        # a bad query parameter, not a bad key - no other key will do better
+                        scheduler.record_success(api_key, latency_ms)
+                        raise HTTPException(status_code=400, detail=f"Google rejected the search parameters ({reason or 'badRequest'})")
+                    
+                    elif 400 <= response.status < 500:  # invalid key, api not enabled, ...
+                        print(f"API key {redact_key(api_key)} rejected with status {response.status} ({reason or body[:200]})")
+                        scheduler.record_invalid(api_key, response.status, latency_ms)
+                    
+                    else:
+                        print(f"API request failed with status {response.status}: {body[:200]}")
+                        scheduler.record_error(api_key, response.status, latency_ms)
             
-            except requests.exceptions.RequestException as e:
-                print(f"Request failed for API key {api_key[:10]}...: {e}")
-                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Request failed for API key {redact_key(api_key)}: {e}")
+                scheduler.record_error(api_key, None, None)
+
+            failed_keys.add(api_key)
         
         raise HTTPException(
             status_code=503,
-            detail="Google Search API temporarily unavailable. All API keys exhausted or rate limited."
+            detail="Google Search API temporarily unavailable. All API keys exhausted or rate limited.",
+            headers={"Retry-After": str(int(scheduler.retry_after()) + 1)}
         )
 
-    def search(
+    async def search(
         self,
         query: str,
         num_results: int = 10,
@@ -110,6 +188,10 @@ class GoogleSearchAPI:
     ) -> Dict[str, Any]:
         """
         Search Google with caching support.
+
+        Google is always asked for whole 10-item pages, cached per (query,
+        site_search, date_restrict, page), so any num_results/start that falls
+        inside cached pages is served by slicing them.
         
         Args:
             query: Search query
@@ -122,23 +204,47 @@ class GoogleSearchAPI:
         Returns:
             Search results dictionary
         """
+        num_results = min(num_results, GOOGLE_PAGE_SIZE)
+        first_page = self._page_start(start)
+        last_page = min(self._page_start(start + num_results - 1), GOOGLE_MAX_START)
+        self.page_stats['searches'] += 1
+        self._note_request_key(query, num_results, start, site_search, date_restrict, **kwargs)
+
+        if first_page > GOOGLE_MAX_START:
+            return self._process_results({})
+
+        pages = []
+        for page_start in range(first_page, last_page + 1, GOOGLE_PAGE_SIZE):
+            pages.append(await self._get_page(query, page_start, site_search, date_restrict, **kwargs))
+
+        items = [item for page in pages for item in page.get('items', [])]
+        offset = start - first_page
+        results = {**pages[0], 'items': items[offset:offset + num_results]}
+
+        if SEARCH_PREFETCH_NEXT_PAGE and start > 1:
+            # someone paging through results will most likely want the next page too
+            await self._prefetch_page(query, last_page + GOOGLE_PAGE_SIZE, pages[-1], site_search, date_restrict, **kwargs)
+
+        return results
+
+    @staticmethod
+    def _page_start(start: int) -> int:
+        """First result index of the 10-item page containing start."""
+        return (max(start, 1) - 1) // GOOGLE_PAGE_SIZE * GOOGLE_PAGE_SIZE + 1
+
+    def _page_request(self, query: str, page_start: int, site_search: Optional[str], date_restrict: Optional[str], **kwargs) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """Cache key, google request parameters and cache parameters for one results page."""
         cache_params = {
-            'num_results': num_results,
-            'start': start,
+            'page_start': page_start,
             'site_search': site_search,
             'date_restrict': date_restrict,
             **kwargs
         }
-        
-        cached_results = search_cache.get(query, **cache_params)
-        if cached_results:
-            print(f"Cache hit for query: '{query}'")
-            return cached_results
-        
+
         search_params = {
             'q': query,
-            'num': min(num_results, 10),
-            'start': start
+            'num': GOOGLE_PAGE_SIZE,
+            'start': page_start
         }
         
         if site_search:
@@ -148,15 +254,103 @@ class GoogleSearchAPI:
             search_params['dateRestrict'] = date_restrict
         
         search_params.update(kwargs)
-        
-        print(f"Making API request for query: '{query}'")
-        results = self._make_request(search_params)
+
+        return search_cache._get_cache_key(query, **cache_params), search_params, cache_params
+
+    async def _get_page(self, query: str, page_start: int, site_search: Optional[str], date_restrict: Optional[str], **kwargs) -> Dict[str, Any]:
+        """One 10-item results page, from the cache when possible."""
+        cache_key, search_params, cache_params = self._page_request(query, page_start, site_search, date_restrict, **kwargs)
+
+        # the cache may go to sqlite, which must not block the event loop
+        cached_results, state = await asyncio.to_thread(search_cache.lookup, query, **cache_params)
+        if cached_results:
+            self.page_stats['page_hits'] += 1
+            if state == FRESH:
+                print(f"Cache hit for query: '{query}' (page at {page_start})")
+            else:
+                print(f"Cache hit for query: '{query}' (page at {page_start}, {state}, refreshing in background)")
+                self._schedule_refresh(cache_key, query, search_params, cache_params)
+            return cached_results
+
+        self.page_stats['page_misses'] += 1
+        # concurrent misses for the same page share one upstream request
+        return await search_flight.do_async(cache_key, self._fetch, query, search_params, cache_params)
+
+    async def _prefetch_page(self, query: str, page_start: int, previous_page: Dict[str, Any], site_search: Optional[str], date_restrict: Optional[str], **kwargs):
+        if page_start > GOOGLE_MAX_START or len(previous_page.get('items', [])) < GOOGLE_PAGE_SIZE:
+            return
+        cache_key, search_params, cache_params = self._page_request(query, page_start, site_search, date_restrict, **kwargs)
+        if cache_key in self._refreshing:
+            return
+        cached_results, _ = await asyncio.to_thread(search_cache.peek, query, **cache_params)
+        if cached_results is None and cache_key not in self._refreshing:
+            self.page_stats['prefetches'] += 1
+            self._schedule_refresh(cache_key, query, search_params, cache_params)
+
+    def _note_request_key(self, query: str, num_results: int, start: int, site_search: Optional[str], date_restrict: Optional[str], **kwargs):
+        """Count requests that a cache keyed on (num_results, start) would have missed."""
+        key = search_cache._get_cache_key(
+            query, num_results=num_results, start=start, site_search=site_search, date_restrict=date_restrict, **kwargs
+        )
+        if key in self._seen_request_keys:
+            self._seen_request_keys.move_to_end(key)
+            return
+        self.page_stats['per_request_misses'] += 1
+        self._seen_request_keys[key] = True
+        if len(self._seen_request_keys) > SEEN_KEYS_LIMIT:
+            self._seen_request_keys.popitem(last=False)
+
+    async def _fetch(self, query: str, search_params: Dict[str, Any], cache_params: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+        """Fetch and cache results for a query that missed the cache (or is being refreshed)."""
+        cached_results, state = await asyncio.to_thread(search_cache.peek, query, **cache_params)
+        if cached_results and (not refresh or state == FRESH):
+            # another request filled the cache between our miss and taking the flight
+            return cached_results
+
+        print(f"Making API request for query: '{query}' (page at {search_params['start']})")
+        results = await self._make_request(search_params)
+        self.page_stats['upstream_calls'] += 1
         
         processed_results = self._process_results(results)
-        search_cache.set(query, processed_results, **cache_params)
+        await asyncio.to_thread(search_cache.set, query, processed_results, **cache_params)
         
         return processed_results
     
+    def _schedule_refresh(self, cache_key: str, query: str, search_params: Dict[str, Any], cache_params: Dict[str, Any]):
+        """Refresh a stale or soon-to-be-stale entry in the background, once per key."""
+        if cache_key in self._refreshing:
+            return
+        self._refreshing.add(cache_key)
+        self.refresh_stats['scheduled'] += 1
+        task = asyncio.create_task(self._refresh(cache_key, query, search_params, cache_params))
+        # the loop only keeps weak references to tasks
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, cache_key: str, query: str, search_params: Dict[str, Any], cache_params: Dict[str, Any]):
+        if self._refresh_semaphore is None:
+            # a couple of concurrent refreshes is enough and keeps them from bursting the quota
+            self._refresh_semaphore = asyncio.Semaphore(SEARCH_REFRESH_WORKERS)
+        try:
+            async with self._refresh_semaphore:
+                await search_flight.do_async(cache_key, self._fetch, query, search_params, cache_params, True)
+            outcome = 'completed'
+        except Exception as e:
+            # the stale entry stays in place until its hard ttl
+            print(f"Background refresh failed for query '{query}': {e}")
+            outcome = 'failed'
+        self._refreshing.discard(cache_key)
+        self.refresh_stats[outcome] += 1
+
+    def get_refresh_stats(self) -> Dict[str, Any]:
+        return {**self.refresh_stats, 'in_progress': len(self._refreshing)}
+
+    def get_page_stats(self) -> Dict[str, Any]:
+        """Upstream calls made, next to an estimate of what per-(num, start) caching would have made."""
+        stats = dict(self.page_stats)
+        stats['upstream_calls_saved'] = stats['per_request_misses'] - stats['upstream_calls']
+        return stats
+
     def _process_results(self, raw_results: Dict[str, Any]) -> Dict[str, Any]:
         """Process raw Google API results into a cleaner format."""
         items = raw_results.get('items', [])
@@ -189,7 +383,7 @@ class GoogleSearchAPI:
 
 google_search_api = GoogleSearchAPI()
 
-def google_search(
+async def google_search(
     query: str,
     num_results: int = 5,
     start: int = 1,
@@ -217,7 +411,7 @@ def google_search(
         raise HTTPException(status_code=400, detail="num_results must be between 1 and 5")
 
     try:
-        results = google_search_api.search(
+        results = await google_search_api.search(
             query=query,
             num_results=num_results,
             start=start,
@@ -226,6 +420,10 @@ def google_search(
             **kwargs
         )
         return results.get('items', [])
+
+    except HTTPException:
+        # keep the 503 (and its Retry-After) when every key is exhausted
+        raise
     
     except Exception as e:
         print(f"Google search error: {e}")
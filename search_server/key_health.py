@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+from zoneinfo import ZoneInfo
+
+KEY_HEALTH_FILE = os.environ.get("KEY_HEALTH_FILE", "key_health.json")
+GOOGLE_DAILY_QUOTA = int(os.environ.get("GOOGLE_DAILY_QUOTA", 100))
+
+# custom search quotas reset at midnight pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+EWMA_ALPHA = 0.2
+SAVE_INTERVAL = 10.0
+INVALID_KEY_COOLDOWN = 60 * 60
+
+def redact_key(api_key: str) -> str:
+    """Show just enough of a key to tell keys apart."""
+    return f"{api_key[:4]}...{api_key[-4:]}" if len(api_key) > 8 else "***"
+
+def _key_id(api_key: str) -> str:
+    # the state file never contains the keys themselves
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+def _quota_day(now: float) -> str:
+    return datetime.fromtimestamp(now, QUOTA_TIMEZONE).date().isoformat()
+
+def _next_quota_reset(now: float) -> float:
+    today = datetime.fromtimestamp(now, QUOTA_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (today + timedelta(days=1)).timestamp()
+
+class KeyScheduler:
+    """
+    Health-aware API key selection for the Google Custom Search client.
+
+    Tracks, per key, an estimate of the remaining daily quota, a cooldown after
+    429s / errors, a recent error rate and a latency EWMA, and always hands out
+    the healthiest key that is currently usable. Exhausted keys are skipped until
+    the quota resets. State is persisted to a JSON file (keyed by a hash of each
+    key) so it survives restarts; a background thread writes it, so recording
+    an outcome from a coroutine never touches the disk.
+    """
+
+    def __init__(self, api_keys: Iterable[str], path: str = KEY_HEALTH_FILE, daily_quota: int = GOOGLE_DAILY_QUOTA):
+        self.path = path
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._wake = threading.Event()
+        self.keys: Dict[str, Dict[str, Any]] = {api_key: self._new_state() for api_key in api_keys}
+        self._load()
+        threading.Thread(target=self._writer, name="key-health-writer", daemon=True).start()
+
+    def _new_state(self) -> Dict[str, Any]:
+        return {
+            'quota_day': _quota_day(time.time()),
+            'quota_remaining': self.daily_quota,
+            'cooldown_until': 0.0,
+            'error_rate': 0.0,
+            'latency_ms': None,
+            'consecutive_failures': 0,
+            'requests': 0,
+            'failures': 0,
+            'last_status': None
+        }
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable key health file {self.path}: {e}")
+            return
+
+        for api_key, state in self.keys.items():
+            state.update({k: v for k, v in saved.get(_key_id(api_key), {}).items() if k in state})
+
+    def _changed(self, urgent: bool = False):
+        """
+        Mark the state as needing a save. The writer thread saves it within
+        SAVE_INTERVAL seconds, or right away if urgent. Call with the lock held.
+        """
+        self._dirty = True
+        if urgent:
+            self._wake.set()
+
+    def _writer(self):
+        while True:
+            self._wake.wait(SAVE_INTERVAL)
+            self._wake.clear()
+            self._write()
+
+    def _write(self, force: bool = False):
+        """Write the state file if anything changed since the last write (or if forced)."""
+        with self._lock:
+            if not (self._dirty or force):
+                return
+            self._dirty = False
+            data = json.dumps({_key_id(api_key): state for api_key, state in self.keys.items()})
+
+        tmp_path = f"{self.path}.tmp"
+        with self._write_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Error saving key health file {self.path}: {e}")
+
+    def save(self):
+        """Write the state file now (blocking), e.g. on shutdown."""
+        self._write(force=True)
+
+    def _roll_quota(self, state: Dict[str, Any], now: float):
+        day = _quota_day(now)
+        if state['quota_day'] != day:
+            state['quota_day'] = day
+            state['quota_remaining'] = self.daily_quota
+
+    def _available_at(self, state: Dict[str, Any], now: float) -> float:
+        """When a key can next be used (now or earlier if it is usable right away)."""
+        self._roll_quota(state, now)
+        if state['quota_remaining'] <= 0:
+            return max(_next_quota_reset(now), state['cooldown_until'])
+        return state['cooldown_until']
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """
+        Choose the healthiest usable key.
+
+        Args:
+            exclude: Keys that already failed for the current request
+
+        Returns:
+            An API key, or None if every key is exhausted or cooling down
+        """
+        now = time.time()
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [
+                (api_key, state) for api_key, state in self.keys.items()
+                if api_key not in exclude and self._available_at(state, now) <= now
+            ]
+            if not candidates:
+                return None
+            # fewest recent errors first, then most quota left, then fastest
+            best, _ = min(candidates, key=lambda item: (
+                round(item[1]['error_rate'], 2),
+                -item[1]['quota_remaining'],
+                item[1]['latency_ms'] if item[1]['latency_ms'] is not None else 0.0
+            ))
+            return best
+
+    def retry_after(self) -> float:
+        """Seconds until some key becomes usable again."""
+        now = time.time()
+        with self._lock:
+            return max(0.0, min(self._available_at(state, now) for state in self.keys.values()) - now)
+
+    def _record(self, api_key: str, status: Optional[int], latency_ms: Optional[float], failed: bool, spent_quota: bool = True):
+        state = self.keys[api_key]
+        self._roll_quota(state, time.time())
+        state['requests'] += 1
+        state['last_status'] = status
+        if spent_quota:
+            state['quota_remaining'] = max(0, state['quota_remaining'] - 1)
+        state['error_rate'] = (1 - EWMA_ALPHA) * state['error_rate'] + EWMA_ALPHA * (1.0 if failed else 0.0)
+        if latency_ms is not None:
+            previous = state['latency_ms']
+            state['latency_ms'] = latency_ms if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * latency_ms
+        if failed:
+            state['failures'] += 1
+            state['consecutive_failures'] += 1
+        else:
+            state['consecutive_failures'] = 0
+        return state
+
+    def record_success(self, api_key: str, latency_ms: float):
+        with self._lock:
+            self._record(api_key, 200, latency_ms, failed=False)
+            self._changed()
+
+    def record_rate_limited(self, api_key: str, latency_ms: float, retry_after: Optional[float] = None):
+        """A 429: back off this key only, doubling the cooldown on repeats."""
+        with self._lock:
+            state = self._record(api_key, 429, latency_ms, failed=True, spent_quota=False)
+            cooldown = retry_after if retry_after else min(2 ** state['consecutive_failures'], 60)
+            state['cooldown_until'] = time.time() + cooldown
+            self._changed()
+
+    def record_quota_exhausted(self, api_key: str, latency_ms: float):
+        """A 403 for daily quota: skip the key until the quota resets."""
+        with self._lock:
+            state = self._record(api_key, 403, latency_ms, failed=True, spent_quota=False)
+            state['quota_remaining'] = 0
+            self._changed(urgent=True)
+
+    def record_invalid(self, api_key: str, status: int, latency_ms: float):
+        """A 4xx that is not about quota (bad key, api disabled): park the key for a while."""
+        with self._lock:
+            state = self._record(api_key, status, latency_ms, failed=True)
+            state['cooldown_until'] = time.time() + INVALID_KEY_COOLDOWN
+            self._changed(urgent=True)
+
+    def record_error(self, api_key: str, status: Optional[int], latency_ms: Optional[float]):
+        """A 5xx or network error: short cooldown once errors repeat."""
+        with self._lock:
+            state = self._record(api_key, status, latency_ms, failed=True, spent_quota=status is not None)
+            if state['consecutive_failures'] >= 2:
+                state['cooldown_until'] = time.time() + min(2 ** state['consecutive_failures'], 60)
+            self._changed()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Key table for the admin endpoint, with keys redacted."""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for api_key, state in self.keys.items():
+                available_at = self._available_at(state, now)
+                rows.append({
+                    'key': redact_key(api_key),
+                    **state,
+                    'available': available_at <= now,
+                    'available_in_seconds': max(0.0, round(available_at - now, 1)),
+                    'error_rate': round(state['error_rate'], 3),
+                    'latency_ms': round(state['latency_ms'], 1) if state['latency_ms'] is not None else None
+                })
+            return rows
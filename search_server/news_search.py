@@ -1,17 +1,30 @@
-from utils.search import search
-from typing import List, Dict, Any
+from utils.search import hybrid_search, check_fields, SEARCH_MODES
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 
-def news_search(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+def news_search(
+    query: str,
+    top_k: int = 10,
+    sources: Optional[List[str]] = None,
+    bias_range: Optional[Tuple[int, int]] = None,
+    min_similarity: float = 0.0,
+    mode: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Search for articles matching the query.
     
     Args:
         query (str): The search query
         top_k (int): Number of top results to return
+        sources (List[str]): Only return articles from these sources (optional)
+        bias_range (Tuple[int, int]): Only return articles with bias in this range, -2 (left) to 2 (right) (optional)
+        min_similarity (float): Minimum similarity threshold
+        mode (str): 'vector', 'lexical' or 'hybrid' (optional, server default otherwise)
+        fields (List[str]): Result fields to return (optional, compact server default otherwise)
     
     Returns:
-        List[Dict[str, Any]]: List of articles matching the query
+        Tuple of the articles matching the query and {'mode', 'degraded', 'fields'}
     """
     try:
         if top_k > 5:
@@ -19,8 +32,20 @@ def news_search(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
 
         if not query.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+        if mode is not None and mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
+
+        if bias_range is not None and bias_range[0] > bias_range[1]:
+            raise HTTPException(status_code=400, detail=f"bias_min ({bias_range[0]}) must not be greater than bias_max ({bias_range[1]})")
+
+        try:
+            fields = check_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        results = search(query, top_k)
-        return results
+        return hybrid_search(query, top_k, mode, sources, bias_range, min_similarity, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="An error occurred on our end. Please try again later.")
\ No newline at end of file
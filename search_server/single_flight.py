@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+class _Call:
+    """One upstream call that other callers can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical requests into one upstream call.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and get the same result, or the same exception.
+    Nothing is remembered once the call finishes - caching is search_cache's job.
+
+    do() coalesces blocking calls across threads, do_async() coalesces
+    coroutines on an event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'coalesced': 0, 'errors': 0}
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call for key is already in flight.
+
+        Args:
+            key: Request key, e.g. from SearchCache._get_cache_key
+            fn: Function performing the upstream request
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['calls'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Await fn(*args, **kwargs) unless a call for key is already in flight.
+
+        The call runs as its own task, so a caller that is cancelled (e.g. the
+        client disconnected) does not cancel it for everyone else waiting.
+
+        Args:
+            key: Request key, e.g. from SearchCache._get_cache_key
+            fn: Coroutine function performing the upstream request
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn(*args, **kwargs))
+                self._tasks[key] = task
+                self.stats['calls'] += 1
+                task.add_done_callback(lambda done, key=key: self._finish_task(key, done))
+            else:
+                self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finish_task(self, key: str, task: asyncio.Task):
+        with self._lock:
+            self._tasks.pop(key, None)
+            # retrieving the exception here also keeps asyncio from warning about
+            # it when every waiter has gone away
+            if not task.cancelled() and task.exception() is not None:
+                self.stats['errors'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._calls) + len(self._tasks)
+        requests = stats['calls'] + stats['coalesced']
+        stats['coalesced_rate'] = stats['coalesced'] / requests if requests else 0.0
+        return stats
+
+search_flight = SingleFlight("search")
+scrape_flight = SingleFlight("scrape")
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import threading
+
+# utils.db opens DB_FILE on import; keep it out of the working tree
+os.environ.setdefault("DB_FILE", os.path.join(tempfile.mkdtemp(prefix="uplink-test-"), "test.db"))
+
+import numpy as np
+
+from utils.vector_index import VectorIndex
+
+def test_ivf_search_while_rows_are_added():
+    """Rows appended mid-search land in the posting lists but past the search's alive mask."""
+    rng = np.random.default_rng(0)
+    dim = 32
+    index = VectorIndex(ann_mode='ivf', ann_file='', quantization='none', snapshot_dir=None)
+    index.add(range(1, 5001), rng.normal(size=(5000, dim)))
+    index.build_ann(nlist=16, nprobe=16)
+
+    errors = []
+    appended = threading.Event()
+
+    def append():
+        for start in range(5001, 15001, 50):
+            index.add(range(start, start + 50), rng.normal(size=(50, dim)))
+        appended.set()
+
+    def search():
+        queries = np.random.default_rng(1).normal(size=(8, dim))
+        try:
+            while not appended.is_set():
+                index.search_vectors(queries, 10)
+        except Exception as e:
+            errors.append(e)
+            appended.set()
+
+    threads = [threading.Thread(target=append), threading.Thread(target=search)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    assert index.size == 15000
@@ -0,0 +1,185 @@
+import os
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+ANN_INDEX = os.environ.get("ANN_INDEX", "flat")  # flat | ivf
+ANN_NLIST = int(os.environ.get("ANN_NLIST", 0))  # 0 = about 4 * sqrt(n)
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", 16))
+ANN_MIN_SIZE = int(os.environ.get("ANN_MIN_SIZE", 50000))
+ANN_INDEX_FILE = os.environ.get("ANN_INDEX_FILE", "ann_index.npz")
+
+ASSIGN_CHUNK = 65536
+
+def default_nlist(n: int) -> int:
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+def assign_nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each (normalized) vector, in chunks to bound memory."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK):
+        chunk = vectors[start:start + ASSIGN_CHUNK]
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = None, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on (a sample of) normalized vectors.
+
+    Args:
+        vectors: 2D array of unit vectors
+        nlist: Number of centroids
+        iterations: Lloyd iterations
+        sample_size: Train on at most this many vectors (default 64 per centroid)
+
+    Returns:
+        (nlist, dim) float32 array of unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = sample_size or nlist * 64
+    if len(vectors) > sample_size:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    nlist = min(nlist, len(vectors))
+
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_nearest(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=nlist)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # re-seed empty clusters with random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids /= norms
+    return centroids
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a VectorIndex matrix.
+
+    Vectors are bucketed by their nearest k-means centroid; a query only scores
+    the rows in its `nprobe` closest buckets. Posting lists hold row positions
+    into the caller's matrix rather than copies of the vectors, so the index
+    costs 8 bytes per row plus the centroids, and candidates are scored by a
+    callback so the matrix can hold quantized codes. More probes = better
+    recall, slower queries.
+    """
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = ANN_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nlist = len(self.centroids)
+        self.nprobe = nprobe
+        self.size = 0
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+
+    def add(self, positions: np.ndarray, vectors: np.ndarray):
+        """Assign rows (normalized vectors at the given matrix positions) to their buckets."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return
+        assignments = assign_nearest(np.asarray(vectors, dtype=np.float32), self.centroids)
+        order = np.argsort(assignments, kind='stable')
+        buckets, starts = np.unique(assignments[order], return_index=True)
+        for bucket, group in zip(buckets, np.split(positions[order], starts[1:])):
+            # replace rather than grow in place so concurrent searches see a consistent list
+            self._lists[bucket] = np.concatenate((self._lists[bucket], group))
+        self.size += len(positions)
+
+    def search(
+        self,
+        score: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        alive: np.ndarray,
+        queries: np.ndarray,
+        top_k: int,
+        nprobe: int = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Approximate top-k for normalized queries.
+
+        Args:
+            score: score(positions, queries) -> (num_queries, len(positions))
+                similarities for the rows the posting lists point into
+            alive: Boolean mask of rows that may be returned; rows added after
+                it was taken (positions past its end) are skipped
+            queries: 2D array of unit query vectors
+            top_k: Results per query
+            nprobe: Buckets to scan per query (defaults to self.nprobe)
+
+        Returns:
+            (positions, scores) per query, best first
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, buckets in zip(queries, probes):
+            candidates = np.concatenate([self._lists[bucket] for bucket in buckets])
+            # add() may have appended rows since the caller sized alive and its matrix
+            candidates = candidates[candidates < len(alive)]
+            candidates = candidates[alive[candidates]]
+            if len(candidates) == 0:
+                results.append((candidates, np.empty(0, dtype=np.float32)))
+                continue
+
+            scores = score(candidates, query[None, :])[0]
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results.append((candidates[top], scores[top]))
+        return results
+
+    def save(self, path: str, ids: np.ndarray):
+        """
+        Persist centroids and posting lists. Lists are stored as record ids so
+        they can be mapped back onto whatever matrix is loaded next time.
+        """
+        lists = list(self._lists)
+        offsets = np.cumsum([0] + [len(bucket) for bucket in lists])
+        members = np.concatenate(lists)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, offsets=offsets, ids=ids[members])
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, ids: np.ndarray, dim: int, nprobe: int = ANN_NPROBE) -> Optional[Tuple['IVFIndex', np.ndarray]]:
+        """
+        Load a saved index onto a matrix whose row ids are `ids` (ascending).
+
+        Returns:
+            (index, covered) where covered marks the rows already in a posting list,
+            or None if there is no usable file
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                centroids, offsets, saved_ids = data['centroids'], data['offsets'], data['ids']
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Not loading ANN index from {path}: {e}")
+            return None
+        if centroids.shape[1] != dim:
+            print(f"Not loading ANN index from {path}: dimension {centroids.shape[1]} != {dim}")
+            return None
+
+        index = cls(centroids, nprobe)
+        covered = np.zeros(len(ids), dtype=bool)
+        for bucket in range(index.nlist):
+            bucket_ids = saved_ids[offsets[bucket]:offsets[bucket + 1]]
+            # records deleted since the save simply drop out
+            positions = np.searchsorted(ids, bucket_ids)
+            found = positions < len(ids)
+            found[found] = ids[positions[found]] == bucket_ids[found]
+            positions = positions[found]
+            index._lists[bucket] = positions
+            covered[positions] = True
+            index.size += len(positions)
+        return index, covered
@@ -1,16 +1,178 @@
+import os
+import asyncio
 import sqlite3
-import json
-from .write_queue import write_record_queued
+import threading
+import time
+import logging
+from .write_queue import write_record_queued, write_records_queued
+from .url_set import UrlHashSet
+from .embedding_codec import META_TABLE, EMBEDDING_DTYPE, encode_embedding, load_embedding_dtype, row_embedding
 
-DB_FILE = 'data.db'
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.environ.get('DB_FILE', 'data.db')
 TABLE_NAME = 'records'
+CHANGES_TABLE = 'record_changes'
+FTS_TABLE = 'records_fts'
+PASSAGES_TABLE = 'record_passages'
+# change log entries kept; readers further behind than this only miss tombstones
+CHANGE_LOG_KEEP = 100000
 
 def get_connection():
     conn = sqlite3.connect(DB_FILE)
+    # so rows removed by INSERT OR REPLACE fire the change log's delete trigger
+    conn.execute('PRAGMA recursive_triggers = ON')
     return conn
 
+def _migrate_v1(conn):
+    """Add the packed embedding blob column and record the blob dtype."""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({TABLE_NAME})')]
+    if 'embedding_blob' not in columns:
+        conn.execute(f'ALTER TABLE {TABLE_NAME} ADD COLUMN embedding_blob BLOB')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {META_TABLE} (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    conn.execute(
+        f"INSERT OR IGNORE INTO {META_TABLE} (key, value) VALUES ('embedding_dtype', ?)",
+        (EMBEDDING_DTYPE,)
+    )
+
+def _migrate_v2(conn):
+    """
+    Add the change log: every insert and delete on records (including the
+    delete half of an INSERT OR REPLACE) appends a row with a monotonically
+    increasing seq, so readers can pick up exactly what changed since the seq
+    they last saw.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_log_insert AFTER INSERT ON {TABLE_NAME}
+        BEGIN
+            INSERT INTO {CHANGES_TABLE} (record_id, op) VALUES (new.id, 'insert');
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_log_delete AFTER DELETE ON {TABLE_NAME}
+        BEGIN
+            INSERT INTO {CHANGES_TABLE} (record_id, op) VALUES (old.id, 'delete');
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {CHANGES_TABLE}_prune AFTER INSERT ON {CHANGES_TABLE}
+        WHEN new.seq % 1000 = 0
+        BEGIN
+            DELETE FROM {CHANGES_TABLE} WHERE seq <= new.seq - {CHANGE_LOG_KEEP};
+        END
+    ''')
+
+def _migrate_v3(conn):
+    """
+    Add an FTS5 full-text index over title and content for lexical (BM25)
+    search. It is an external-content table, so the text is not stored twice,
+    kept in sync by triggers and built from the existing rows once here.
+    """
+    try:
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                title, content,
+                content='{TABLE_NAME}', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"SQLite has no FTS5 support, lexical news search is disabled: {e}")
+        return
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_fts_insert AFTER INSERT ON {TABLE_NAME}
+        BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_fts_delete AFTER DELETE ON {TABLE_NAME}
+        BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_fts_update AFTER UPDATE OF title, content ON {TABLE_NAME}
+        BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+    ''')
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+def _migrate_v4(conn):
+    """
+    Add passages: overlapping chunks of each article, stored as character
+    offsets into records.content with their own embedding. A NULL
+    embedding_blob means the passage is the whole article and shares the
+    record's embedding, which is how every existing row is backfilled here.
+    Passages go with their record on delete (and on INSERT OR REPLACE), and
+    their deletes are written to the change log as 'passage_delete' so the
+    passage index can drop them like the article index drops records.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {PASSAGES_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            char_start INTEGER NOT NULL,
+            char_end INTEGER NOT NULL,
+            embedding_blob BLOB
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {PASSAGES_TABLE}_record ON {PASSAGES_TABLE} (record_id)')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {TABLE_NAME}_passages_delete AFTER DELETE ON {TABLE_NAME}
+        BEGIN
+            DELETE FROM {PASSAGES_TABLE} WHERE record_id = old.id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {PASSAGES_TABLE}_log_delete AFTER DELETE ON {PASSAGES_TABLE}
+        BEGIN
+            INSERT INTO {CHANGES_TABLE} (record_id, op) VALUES (old.id, 'passage_delete');
+        END
+    ''')
+    conn.execute(f'''
+        INSERT INTO {PASSAGES_TABLE} (record_id, char_start, char_end)
+        SELECT id, 0, COALESCE(LENGTH(content), 0) FROM {TABLE_NAME}
+        WHERE id NOT IN (SELECT record_id FROM {PASSAGES_TABLE})
+    ''')
+
+# schema migrations, applied in order. the database's PRAGMA user_version
+# records how many of them have already run.
+MIGRATIONS = [
+    _migrate_v1,
+    _migrate_v2,
+    _migrate_v3,
+    _migrate_v4,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate_db(conn):
+    """Apply any schema migrations the database has not seen yet."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Migrating database schema to version {target}")
+        migration(conn)
+        conn.execute(f'PRAGMA user_version = {target}')
+        conn.commit()
+
 def init_db():
     with get_connection() as conn:
+        # set once here, before the write worker needs it; the mode persists in the file
+        conn.execute('PRAGMA journal_mode=WAL')
         conn.execute(f'''
             CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -23,6 +185,103 @@ def init_db():
             )
         ''')
         conn.commit()
+        migrate_db(conn)
+
+def latest_change_seq(conn) -> int:
+    """Sequence number of the last insert or delete on records (0 if none)."""
+    row = conn.execute(f'SELECT MAX(seq) FROM {CHANGES_TABLE}').fetchone()
+    return row[0] or 0
+
+def get_embedding_dtype():
+    """Get the dtype embedding blobs are packed with in this database."""
+    with get_connection() as conn:
+        return load_embedding_dtype(conn)
+
+# dimension of the stored embeddings, found once (it does not change)
+_embedding_dim = None
+
+def get_embedding_dim():
+    """
+    Dimension of the embeddings already stored, which new records must match
+    to be searchable. None while the database has no embeddings.
+    """
+    global _embedding_dim
+    if _embedding_dim is None:
+        with get_connection() as conn:
+            dtype = load_embedding_dtype(conn)
+            row = conn.execute(f'''
+                SELECT embedding_blob, embedding FROM {TABLE_NAME}
+                WHERE embedding_blob IS NOT NULL OR (embedding IS NOT NULL AND embedding != '')
+                LIMIT 1
+            ''').fetchone()
+        if row is not None:
+            vector = row_embedding(row[0], row[1], dtype)
+            if vector is not None and vector.ndim == 1:
+                _embedding_dim = len(vector)
+    return _embedding_dim
+
+def backfill_embedding_blobs(batch_size=500, pause=0.0):
+    """
+    Convert legacy JSON text embeddings into packed blobs.
+
+    Works through the table in small id-ordered batches, each in its own short
+    transaction, so readers and the write queue keep working while it runs.
+    The JSON text is cleared once a row's blob has been written.
+
+    Args:
+        batch_size: Rows converted per transaction
+        pause: Seconds to sleep between batches
+
+    Returns:
+        Number of rows converted
+    """
+    dtype = get_embedding_dtype()
+    converted = 0
+    last_id = 0
+
+    while True:
+        with get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, embedding FROM {TABLE_NAME}
+                WHERE id > ? AND embedding_blob IS NULL
+                AND embedding IS NOT NULL AND embedding != ''
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+
+            if not rows:
+                break
+
+            updates = []
+            for row_id, embedding_str in rows:
+                embedding = row_embedding(None, embedding_str)
+                if embedding is not None:
+                    updates.append((encode_embedding(embedding, dtype), row_id))
+
+            conn.executemany(f'''
+                UPDATE {TABLE_NAME} SET embedding_blob = ?, embedding = NULL
+                WHERE id = ? AND embedding_blob IS NULL
+            ''', updates)
+            conn.commit()
+
+        converted += len(updates)
+        last_id = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+    if converted:
+        logger.info(f"Backfilled {converted} embedding blobs")
+    return converted
+
+def start_embedding_backfill(batch_size=500, pause=0.05):
+    """Run backfill_embedding_blobs on a background thread."""
+    thread = threading.Thread(
+        target=backfill_embedding_blobs,
+        kwargs={'batch_size': batch_size, 'pause': pause},
+        daemon=True
+    )
+    thread.start()
+    return thread
 
 def write_record(title, url, content, embedding, source, bias):
     """
@@ -36,20 +295,65 @@ def write_record(title, url, content, embedding, source, bias):
     
     return task.result
 
+async def write_record_async(title, url, content, embedding, source, bias):
+    """
+    Write a record through the write queue without blocking the event loop.
+    Resolves once the write queue has committed the record.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def on_done(result, error):
+        def resolve():
+            if future.done():
+                return
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        loop.call_soon_threadsafe(resolve)
+    
+    write_record_queued(title, url, content, embedding, source, bias, wait=False, callback=on_done)
+    return await future
+
+def write_records(records, timeout=60.0):
+    """
+    Write many records through the write queue as one batch.
+    
+    Args:
+        records: List of dicts with title, url, content, embedding, source and bias,
+            and optionally passages (see utils.write_queue.write_records_queued)
+        timeout: Maximum time to wait for the whole batch
+    
+    Returns:
+        A status dict per record: {'url', 'status': 'ok' | 'error' | 'timeout', 'error'}
+    """
+    tasks = write_records_queued(records)
+    deadline = time.monotonic() + timeout
+    
+    statuses = []
+    for record, task in zip(records, tasks):
+        if not task.wait(max(0.0, deadline - time.monotonic())):
+            statuses.append({'url': record['url'], 'status': 'timeout', 'error': 'Write did not complete in time'})
+        elif task.error:
+            statuses.append({'url': record['url'], 'status': 'error', 'error': str(task.error)})
+        else:
+            statuses.append({'url': record['url'], 'status': 'ok', 'error': None})
+    return statuses
+
 def read_records():
     """
     Read all records from the database.
     Returns a list of dicts.
     """
     with get_connection() as conn:
-        cursor = conn.execute(f'SELECT title, url, content, embedding, source, bias FROM {TABLE_NAME}')
+        dtype = load_embedding_dtype(conn)
+        cursor = conn.execute(f'SELECT title, url, content, embedding_blob, embedding, source, bias FROM {TABLE_NAME}')
         records = []
         for row in cursor:
-            title, url, content, embedding_str, source, bias = row
-            try:
-                embedding = json.loads(embedding_str)
-            except Exception:
-                embedding = []
+            title, url, content, embedding_blob, embedding_str, source, bias = row
+            embedding = row_embedding(embedding_blob, embedding_str, dtype)
+            embedding = embedding.tolist() if embedding is not None else []
             records.append({
                 'title': title,
                 'url': url,
@@ -67,15 +371,13 @@ def find_record_by_url(url):
     """
     with get_connection() as conn:
         cursor = conn.execute(f'''
-            SELECT title, url, content, embedding, source, bias FROM {TABLE_NAME} WHERE url=?
+            SELECT title, url, content, embedding_blob, embedding, source, bias FROM {TABLE_NAME} WHERE url=?
         ''', (url,))
         row = cursor.fetchone()
         if row:
-            title, url, content, embedding_str, source, bias = row
-            try:
-                embedding = json.loads(embedding_str)
-            except Exception:
-                embedding = []
+            title, url, content, embedding_blob, embedding_str, source, bias = row
+            embedding = row_embedding(embedding_blob, embedding_str, load_embedding_dtype(conn))
+            embedding = embedding.tolist() if embedding is not None else []
             return {
                 'title': title,
                 'url': url,
@@ -86,6 +388,35 @@ def find_record_by_url(url):
             }
     return None
 
+def find_unknown_urls(urls, chunk_size=500):
+    """
+    Return the URLs that are not in the database yet, in their original order.
+    
+    Only touches the url index, never the row data.
+    """
+    urls = list(dict.fromkeys(urls))
+    known = set()
+    with get_connection() as conn:
+        for start in range(0, len(urls), chunk_size):
+            chunk = urls[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = conn.execute(
+                f'SELECT url FROM {TABLE_NAME} WHERE url IN ({placeholders})', chunk
+            )
+            known.update(row[0] for row in cursor)
+    return [url for url in urls if url not in known]
+
+def get_known_url_set():
+    """Build a UrlHashSet of every URL in the database."""
+    with get_connection() as conn:
+        cursor = conn.execute(f'SELECT url FROM {TABLE_NAME} WHERE url IS NOT NULL')
+        return UrlHashSet.from_urls(row[0] for row in cursor)
+
+def get_url_set_version():
+    """Cheap fingerprint of the url column, changes whenever rows are added or replaced."""
+    with get_connection() as conn:
+        return conn.execute(f'SELECT MAX(id), COUNT(*) FROM {TABLE_NAME}').fetchone()
+
 count_total_records = 0
 def count_total_records():
     """
@@ -0,0 +1,87 @@
+import os
+import json
+import base64
+import sqlite3
+from typing import Optional
+
+import numpy as np
+
+# dtype used for packed embedding blobs when a database is first migrated.
+# once recorded in the database it is read back from there, so changing this
+# later never corrupts existing rows.
+EMBEDDING_DTYPE = os.environ.get("EMBEDDING_DTYPE", "float32")
+
+META_TABLE = 'schema_meta'
+
+_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+
+def get_dtype(name: str) -> np.dtype:
+    """Map a dtype name ('float32' or 'float16') to a little-endian numpy dtype."""
+    try:
+        return _DTYPES[name]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding dtype: {name} (expected one of {', '.join(_DTYPES)})")
+
+def load_embedding_dtype(conn: sqlite3.Connection) -> str:
+    """Read the embedding dtype recorded in the database, falling back to EMBEDDING_DTYPE."""
+    try:
+        row = conn.execute(
+            f"SELECT value FROM {META_TABLE} WHERE key = 'embedding_dtype'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    return row[0] if row else EMBEDDING_DTYPE
+
+def encode_embedding(embedding, dtype: str = EMBEDDING_DTYPE) -> bytes:
+    """
+    Pack an embedding into little-endian bytes.
+
+    Args:
+        embedding: List of floats or numpy array
+        dtype: 'float32' or 'float16'
+
+    Returns:
+        bytes: Raw packed vector
+    """
+    return np.asarray(embedding, dtype=get_dtype(dtype)).ravel().tobytes()
+
+def decode_embedding(blob: bytes, dtype: str = EMBEDDING_DTYPE) -> np.ndarray:
+    """
+    Unpack an embedding blob without copying.
+
+    The returned array is a read-only view over `blob`.
+    """
+    return np.frombuffer(blob, dtype=get_dtype(dtype))
+
+def row_embedding(blob: Optional[bytes], embedding_str: Optional[str], dtype: str = EMBEDDING_DTYPE) -> Optional[np.ndarray]:
+    """
+    Decode the embedding of a `records` row.
+
+    Prefers the packed blob column and falls back to the legacy JSON text column
+    for rows that have not been backfilled yet.
+
+    Returns:
+        np.ndarray or None if the row has no usable embedding
+    """
+    if blob:
+        return decode_embedding(blob, dtype)
+    if embedding_str:
+        try:
+            return np.asarray(json.loads(embedding_str), dtype=np.float32)
+        except (json.JSONDecodeError, ValueError, TypeError):
+            return None
+    return None
+
+def embedding_to_b64(embedding) -> str:
+    """Encode an embedding as base64 little-endian float32 for transport over HTTP."""
+    return base64.b64encode(encode_embedding(embedding, 'float32')).decode('ascii')
+
+def embedding_from_b64(data: str) -> np.ndarray:
+    """Decode a base64 little-endian float32 embedding produced by embedding_to_b64."""
+    raw = base64.b64decode(data, validate=True)
+    if len(raw) % 4:
+        raise ValueError(f"Embedding payload of {len(raw)} bytes is not a whole number of float32 values")
+    return decode_embedding(raw, 'float32')
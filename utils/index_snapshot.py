@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+INDEX_SNAPSHOT_DIR = os.environ.get("INDEX_SNAPSHOT_DIR", "index_snapshot")  # empty = disabled
+INDEX_SNAPSHOT_EVERY = int(os.environ.get("INDEX_SNAPSHOT_EVERY", 5000))  # new rows before a new snapshot is written
+INDEX_SNAPSHOT_HEADROOM = float(os.environ.get("INDEX_SNAPSHOT_HEADROOM", 0.1))  # spare rows, as a fraction of the size
+
+SNAPSHOT_FORMAT = 1
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+# arrays stored per snapshot, one .npy file each
+ARRAYS = ('matrix', 'scales', 'ids', 'alive', 'source_codes', 'bias')
+MIN_HEADROOM_ROWS = 1024
+
+def current_version(directory: str) -> Optional[int]:
+    """Version of the published snapshot, or None if there is none."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def _version_dir(directory: str, version: int) -> str:
+    return os.path.join(directory, f"v{version:08d}")
+
+def write_snapshot(directory: str, arrays: Dict[str, np.ndarray], manifest: Dict[str, Any]) -> Optional[int]:
+    """
+    Write the index arrays as a new snapshot version and publish it.
+
+    Every array is written with spare zero rows at the end (sparse on disk), so
+    a process that maps the snapshot copy-on-write can append rows in place
+    without copying the matrix out of the shared mapping. The version directory
+    is written under a temporary name and renamed into place, and CURRENT is
+    replaced atomically, so readers never see a partial snapshot. Only the
+    current and previous versions are kept.
+
+    Args:
+        directory: Snapshot directory
+        arrays: The ARRAYS, each holding exactly the rows in use
+        manifest: Extra manifest fields (last_id, dim, quantization, ...)
+
+    Returns:
+        The published version, or None if another process published the same one first
+    """
+    os.makedirs(directory, exist_ok=True)
+    size = len(arrays['ids'])
+    capacity = size + max(MIN_HEADROOM_ROWS, int(size * INDEX_SNAPSHOT_HEADROOM))
+    version = (current_version(directory) or 0) + 1
+
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=directory)
+    try:
+        for name in ARRAYS:
+            array = arrays[name]
+            mapped = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, f"{name}.npy"), mode='w+', dtype=array.dtype, shape=(capacity,) + array.shape[1:]
+            )
+            mapped[:size] = array
+            mapped.flush()
+            del mapped
+
+        manifest = dict(manifest, format=SNAPSHOT_FORMAT, version=version, size=size, capacity=capacity, created=time.time())
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        try:
+            os.rename(tmp_dir, _version_dir(directory, version))
+        except OSError:
+            return None
+
+        tmp_current = os.path.join(directory, f"{CURRENT_FILE}.tmp{os.getpid()}")
+        with open(tmp_current, 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        os.replace(tmp_current, os.path.join(directory, CURRENT_FILE))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # mapped files stay readable for processes that still have them open
+    for entry in os.listdir(directory):
+        if entry.startswith('v') and entry not in (f"v{version:08d}", f"v{version - 1:08d}"):
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return version
+
+def read_snapshot(directory: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """
+    Open the published snapshot.
+
+    Arrays are memory-mapped copy-on-write: pages are shared through the page
+    cache by every process mapping the same version, and only pages a process
+    writes to (appended rows, deletions) become private to it.
+
+    Returns:
+        (arrays, manifest), arrays having `capacity` rows of which `size` are in
+        use, or None if there is no readable snapshot
+    """
+    version = current_version(directory)
+    if version is None:
+        return None
+    path = _version_dir(directory, version)
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != SNAPSHOT_FORMAT:
+            print(f"Not loading index snapshot {path}: format {manifest.get('format')} != {SNAPSHOT_FORMAT}")
+            return None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='c') for name in ARRAYS}
+    except (OSError, ValueError, json.JSONDecodeError) as e:
+        # e.g. pruned by a newer writer between reading CURRENT and opening the files
+        print(f"Not loading index snapshot {path}: {e}")
+        return None
+    return arrays, manifest
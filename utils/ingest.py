@@ -0,0 +1,187 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from utils.pipeline import Pipeline, Stage, format_metrics
+from utils.rss_parse import get_rss_async, entry_url
+from utils.news_content_strip import extract_main_content
+from utils.model_cache import model_cache
+from utils.passages import split_passages, passage_texts, attach_passages
+from utils.models import (
+    extract_async, extract_and_bias_async, embed_texts_async, bias_async,
+    get_llm_stats, LLM_CONCURRENCY, EMBED_CONCURRENCY, EMBED_BATCH_SIZE, COMBINED_EXTRACTION
+)
+
+# per-stage pool sizes
+FETCH_WORKERS = int(os.environ.get("INGEST_FETCH_WORKERS", 16))
+PARSE_WORKERS = int(os.environ.get("INGEST_PARSE_WORKERS", os.cpu_count() or 2))
+# requests per second to the llm / embedding providers (0 = unlimited)
+LLM_RATE_LIMIT = float(os.environ.get("LLM_RATE_LIMIT", 0))
+EMBED_RATE_LIMIT = float(os.environ.get("EMBED_RATE_LIMIT", 0))
+WRITE_BATCH_SIZE = 50
+
+# takes new records, writes them somewhere, returns the ones that were written
+Sink = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+# takes candidate urls, returns the ones not stored yet
+KnownFilter = Callable[[List[str]], Awaitable[List[str]]]
+
+def strip_article(article: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip fetched html down to text. Runs in a worker process."""
+    article['content'] = extract_main_content(article.pop('html'))
+    return article
+
+def build_pipeline(session: aiohttp.ClientSession, sink: Sink, known_filter: Optional[KnownFilter] = None) -> Pipeline:
+    """
+    Build the ingestion pipeline:
+
+        rss -> dedupe -> fetch -> strip -> extract -> embed -> bias -> write
+
+    Inputs are (feed_name, feed_url) pairs; articles travel as record dicts
+    (title, url, source, content, embedding, bias) that end up in `sink`.
+    """
+    seen = set()
+
+    async def read_feed(feed):
+        feed_name, feed_url = feed
+        rss = await get_rss_async(session, feed_url)
+        articles = []
+        for entry in (rss.channel.items if rss else []):
+            url = entry_url(entry)
+            if url:
+                articles.append({'title': str(entry.title.content), 'url': url, 'source': str(feed_name)})
+        return articles
+
+    async def dedupe(articles):
+        # the same story is often listed in several feeds of one outlet
+        fresh = {}
+        for article in articles:
+            if article['url'] not in seen:
+                seen.add(article['url'])
+                fresh[article['url']] = article
+        unknown = await known_filter(list(fresh)) if known_filter else list(fresh)
+        return [fresh[url] for url in unknown]
+
+    async def fetch(article):
+        try:
+            async with session.get(article['url']) as resp:
+                resp.raise_for_status()
+                html = await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error fetching {article['url']}: {e!r}")
+            return None
+        if not html:
+            print(f"No content found for {article['title']} in {article['source']}")
+            return None
+        article['html'] = html
+        return article
+
+    async def extract_stage(article):
+        if COMBINED_EXTRACTION:
+            content, bias_result = await extract_and_bias_async(article['content'])
+            article['bias'] = str(bias_result)
+        else:
+            content = await extract_async(article['content'])
+        article['content'] = str(content)
+        return article
+
+    async def embed(articles):
+        # every passage of the batch goes out together; short articles are one passage
+        spans = [split_passages(article['content']) for article in articles]
+        try:
+            embeddings = await embed_texts_async([
+                text for article, article_spans in zip(articles, spans)
+                for text in passage_texts(article['content'], article_spans)
+            ])
+        except Exception as e:
+            # keep one bad article from sinking the whole batch
+            print(f"Batch embedding of {len(articles)} articles failed, embedding one by one: {e}")
+            return [article for article in [await embed_one(article, article_spans) for article, article_spans in zip(articles, spans)] if article]
+        offset = 0
+        for article, article_spans in zip(articles, spans):
+            attach_passages(article, article_spans, embeddings[offset:offset + len(article_spans)])
+            offset += len(article_spans)
+        return articles
+
+    async def embed_one(article, spans):
+        try:
+            return attach_passages(article, spans, await embed_texts_async(passage_texts(article['content'], spans)))
+        except Exception as e:
+            print(f"Error embedding {article['url']}: {e}")
+            return None
+
+    async def bias_stage(article):
+        if 'bias' not in article:  # already set by a combined extraction
+            article['bias'] = str(await bias_async(article['content']))
+        return article
+
+    async def write(articles):
+        return await sink(articles)
+
+    return Pipeline([
+        Stage('rss', read_feed, workers=8, fan_out=True),
+        Stage('dedupe', dedupe, batch_size=200, batch_interval=0.2),
+        Stage('fetch', fetch, workers=FETCH_WORKERS),
+        Stage('strip', strip_article, workers=PARSE_WORKERS, pool='process'),
+        Stage('extract', extract_stage, workers=LLM_CONCURRENCY, rate_limit=LLM_RATE_LIMIT or None),
+        Stage('embed', embed, workers=EMBED_CONCURRENCY, batch_size=EMBED_BATCH_SIZE, batch_interval=1.0, rate_limit=EMBED_RATE_LIMIT or None),
+        Stage('bias', bias_stage, workers=LLM_CONCURRENCY, rate_limit=LLM_RATE_LIMIT or None),
+        Stage('write', write, batch_size=WRITE_BATCH_SIZE, batch_interval=2.0),
+    ])
+
+async def ingest(
+    feeds: List[Tuple[str, str]],
+    sink: Sink,
+    known_filter: Optional[KnownFilter] = None,
+    report_interval: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Scrape, process and store every new article from a list of feeds.
+
+    Args:
+        feeds: (feed_name, feed_url) pairs
+        sink: Async callable writing a batch of finished records
+        known_filter: Async callable returning which urls are new (None treats all as new)
+        report_interval: Print metrics every this many seconds while running
+
+    Returns:
+        Dict[str, Any]: Pipeline metrics
+    """
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        pipeline = build_pipeline(session, sink, known_filter)
+        metrics = await pipeline.run(feeds, report_interval=report_interval)
+
+    written = metrics['stages']['write']['out']
+    minutes = metrics['elapsed_seconds'] / 60
+    print(format_metrics(metrics))
+    print(f"{written} new articles ({written / minutes if minutes else 0.0:.1f} articles/min)")
+    print(f"model cache: {model_cache.get_stats()}")
+    print(f"llm usage: {get_llm_stats()}")
+    return metrics
+
+def feed_list(mappings: Dict[str, List[str]]) -> List[Tuple[str, str]]:
+    """Flatten utils.mappings into (feed_name, feed_url) pairs."""
+    return [(feed_name, feed_url) for feed_name, feeds in mappings.items() for feed_url in feeds]
+
+# utils.db is imported lazily below: importing it opens data.db and starts the
+# write queue, which remote drivers (modal) must not do.
+
+async def local_sink(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Write records straight into the local database through the write queue."""
+    from utils.db import write_records
+
+    written = []
+    for record, status in zip(records, await asyncio.to_thread(write_records, records)):
+        if status['status'] == 'ok':
+            written.append(record)
+        else:
+            print(f"Failed to write {status['url']}: {status['error']}")
+    return written
+
+async def local_known_filter(urls: List[str]) -> List[str]:
+    """Check urls against the local database."""
+    from utils.db import find_unknown_urls
+
+    return await asyncio.to_thread(find_unknown_urls, urls)
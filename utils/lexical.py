@@ -0,0 +1,92 @@
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.db import get_connection, TABLE_NAME, FTS_TABLE
+
+# bm25 column weights: a match in the title counts for more than one in the body
+TITLE_WEIGHT = 2.0
+CONTENT_WEIGHT = 1.0
+# reciprocal rank fusion constant; 60 is the usual choice and dampens the top ranks
+RRF_K = 60
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(text: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted term so operators (AND, NOT, NEAR, column:)
+    in user input are matched literally, and terms are OR-ed so BM25 can rank
+    partial matches instead of requiring every word.
+
+    Returns:
+        The expression, or None if the text has no searchable words
+    """
+    terms = dict.fromkeys(token.lower() for token in _TOKEN.findall(text))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+def lexical_search(
+    query: str,
+    top_k: int = 10,
+    sources: Optional[Iterable[str]] = None,
+    bias_range: Optional[Tuple[int, int]] = None
+) -> List[Tuple[int, float]]:
+    """
+    BM25 search over article titles and content.
+
+    Args:
+        query: Search query
+        top_k: Number of results
+        sources: Only return records from these sources
+        bias_range: Only return records with min <= bias <= max
+
+    Returns:
+        List[Tuple[int, float]]: (record id, bm25 score) best first, higher is better
+    """
+    match = fts_query(query)
+    if match is None or top_k <= 0:
+        return []
+
+    conditions = [f"{FTS_TABLE} MATCH ?"]
+    params: list = [match]
+    if sources is not None:
+        sources = list(sources)
+        conditions.append(f"r.source IN ({','.join('?' * len(sources))})" if sources else "0")
+        params.extend(sources)
+    if bias_range is not None:
+        # bias is stored as text; rows without a numeric bias never match, as in the vector index
+        values = [str(value) for value in range(int(bias_range[0]), int(bias_range[1]) + 1)]
+        conditions.append(f"r.bias IN ({','.join('?' * len(values))})" if values else "0")
+        params.extend(values)
+    params.append(top_k)
+
+    try:
+        with get_connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT r.id, -bm25({FTS_TABLE}, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS score
+                FROM {FTS_TABLE} JOIN {TABLE_NAME} r ON r.id = {FTS_TABLE}.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY score DESC
+                LIMIT ?
+            ''', params)
+            return [(row_id, float(score)) for row_id, score in cursor]
+    except sqlite3.OperationalError as e:
+        # no fts5 in this sqlite build (see utils.db._migrate_v3)
+        print(f"Lexical search unavailable: {e}")
+        return []
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Merge ranked id lists: each id scores sum(1 / (k + rank)) over the lists it is in.
+
+    Returns:
+        List[Tuple[int, float]]: (record id, fused score) best first
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, record_id in enumerate(ranking, start=1):
+            scores[record_id] = scores.get(record_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
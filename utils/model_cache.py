@@ -0,0 +1,145 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils.embedding_codec import encode_embedding, decode_embedding
+
+MODEL_CACHE_FILE = os.environ.get("MODEL_CACHE_FILE", "model_cache.db")
+MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES", 50000))
+# hits only update last_access in memory; they are written out by the next set() or after this many seconds
+ACCESS_FLUSH_INTERVAL = 60.0
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different copies of a page share a key."""
+    return " ".join(text.split())
+
+class ModelCache:
+    """
+    Persistent, size-bounded LRU cache for model outputs.
+
+    Entries are keyed by a hash of (model, prompt, normalized input) so a story
+    syndicated across several feeds, or re-fetched after a failed write, only
+    costs one extraction, bias call and embedding.
+    """
+
+    def __init__(self, path: str = MODEL_CACHE_FILE, max_entries: int = MODEL_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30.0, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS model_cache (
+                key TEXT PRIMARY KEY,
+                kind TEXT,
+                value BLOB,
+                last_access REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS model_cache_last_access ON model_cache (last_access)')
+        self._conn.commit()
+        self.entries = self._conn.execute('SELECT COUNT(*) FROM model_cache').fetchone()[0]
+        self.stats = {'hits': {}, 'misses': {}, 'evictions': 0}
+        self._accessed: Dict[str, float] = {}  # key -> last hit, not yet written
+        self._flushed_at = time.monotonic()
+
+    @staticmethod
+    def key(model: str, prompt: str, text: str) -> str:
+        """Cache key for a model call."""
+        digest = hashlib.sha256()
+        for part in (model or "", prompt or "", normalize_text(text)):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _count(self, outcome: str, kind: str):
+        self.stats[outcome][kind] = self.stats[outcome].get(kind, 0) + 1
+
+    def _flush_access(self):
+        """Write buffered last_access times in one statement. Call with the lock held; the caller commits."""
+        if self._accessed:
+            self._conn.executemany(
+                'UPDATE model_cache SET last_access = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed = {}
+        self._flushed_at = time.monotonic()
+
+    def get(self, key: str, kind: str) -> Optional[bytes]:
+        """
+        Look up a raw cached value, marking it as recently used.
+
+        The access time is only buffered, so a hit is a plain read; buffered
+        times reach the database with the next set() (before it evicts) or
+        once ACCESS_FLUSH_INTERVAL has passed.
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM model_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self._count('misses', kind)
+                return None
+            self._accessed[key] = time.time()
+            if time.monotonic() - self._flushed_at >= ACCESS_FLUSH_INTERVAL:
+                self._flush_access()
+                self._conn.commit()
+            self._count('hits', kind)
+            return row[0]
+
+    def set(self, key: str, kind: str, value: bytes):
+        """Store a raw value, evicting the least recently used entries when full."""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO model_cache (key, kind, value, last_access) VALUES (?, ?, ?, ?)',
+                (key, kind, value, time.time())
+            )
+            self.entries += cursor.rowcount
+            # so eviction sees recent hits
+            self._flush_access()
+            if self.entries > self.max_entries:
+                # evict a slice at a time so we are not deleting on every insert
+                excess = self.entries - self.max_entries + max(1, self.max_entries // 20)
+                cursor = self._conn.execute('''
+                    DELETE FROM model_cache WHERE key IN (
+                        SELECT key FROM model_cache ORDER BY last_access LIMIT ?
+                    )
+                ''', (excess,))
+                self.entries -= cursor.rowcount
+                self.stats['evictions'] += cursor.rowcount
+            self._conn.commit()
+
+    def get_text(self, key: str, kind: str) -> Optional[str]:
+        value = self.get(key, kind)
+        return value.decode('utf-8') if value is not None else None
+
+    def set_text(self, key: str, kind: str, value: str):
+        self.set(key, kind, str(value).encode('utf-8'))
+
+    def get_embedding(self, key: str) -> Optional[np.ndarray]:
+        value = self.get(key, 'embedding')
+        return decode_embedding(value, 'float32') if value is not None else None
+
+    def set_embedding(self, key: str, embedding):
+        self.set(key, 'embedding', encode_embedding(embedding, 'float32'))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters per kind plus size information."""
+        with self._lock:
+            hits = dict(self.stats['hits'])
+            misses = dict(self.stats['misses'])
+            total_hits = sum(hits.values())
+            total = total_hits + sum(misses.values())
+            return {
+                'entries': self.entries,
+                'max_entries': self.max_entries,
+                'hits': hits,
+                'misses': misses,
+                'evictions': self.stats['evictions'],
+                'hit_rate': total_hits / total if total else 0.0
+            }
+
+model_cache = ModelCache()
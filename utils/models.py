@@ -1,10 +1,14 @@
 import os
-from huggingface_hub import InferenceClient
+import time
+import asyncio
+import threading
+from huggingface_hub import InferenceClient, AsyncInferenceClient
 from dotenv import load_dotenv
-from utils.prompts import EXTRACT_PROMPT, BIAS_PROMPT, RANDOM_EXTRACT_PROMPT
+from utils.prompts import EXTRACT_PROMPT, BIAS_PROMPT, RANDOM_EXTRACT_PROMPT, EXTRACT_WITH_BIAS_PROMPT
+from utils.model_cache import model_cache
 import numpy as np
 import re
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 load_dotenv()
 
@@ -12,29 +16,232 @@ api_key = os.environ.get("HF_TOKEN")
 embedding_model = os.environ.get("EMBEDDING_MODEL")
 extraction_model = os.environ.get("EXTRACTION_MODEL")
 
-embed_client = InferenceClient(
-    provider="auto",
-    api_key=api_key,
-)
+# optional self-hosted / stub feature-extraction endpoint (see benchmarks/embedding_stub.py)
+embedding_base_url = os.environ.get("EMBEDDING_BASE_URL")
+# texts per feature-extraction request in embed_texts
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 32))
+
+if embedding_base_url:
+    embed_client_kwargs = {"base_url": embedding_base_url, "api_key": api_key}
+else:
+    embed_client_kwargs = {"provider": "auto", "api_key": api_key}
+# a base_url endpoint serves exactly one model, so no model id is sent to it
+embed_request_model = None if embedding_base_url else embedding_model
+
+embed_client = InferenceClient(**embed_client_kwargs)
 
 client = OpenAI(
     base_url="https://api.studio.nebius.com/v1/",
     api_key=os.environ.get("NEBIUS_API_KEY")
 )
 
-def completion(messages: list) -> dict:
+async_embed_client = AsyncInferenceClient(**embed_client_kwargs)
+
+async_client = AsyncOpenAI(
+    base_url="https://api.studio.nebius.com/v1/",
+    api_key=os.environ.get("NEBIUS_API_KEY")
+)
+
+# max in-flight requests per provider for the async clients
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", 4))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", 8))
+
+_semaphores = {}
+
+def _limit(name: str, limit: int) -> asyncio.Semaphore:
+    """Get the concurrency limiter for a provider on the running event loop."""
+    key = (name, asyncio.get_running_loop())
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(limit)
+    return _semaphores[key]
+
+# when set, extract_and_bias gets the cleaned article and its bias label
+# from one chat completion instead of two
+COMBINED_EXTRACTION = os.environ.get("COMBINED_EXTRACTION", "0") == "1"
+
+# token and latency accounting per kind of llm call
+llm_stats = {}
+_llm_stats_lock = threading.Lock()
+
+def _record_usage(purpose: str, result, elapsed: float):
+    usage = getattr(result, "usage", None)
+    with _llm_stats_lock:
+        stats = llm_stats.setdefault(purpose, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "latency_seconds": 0.0
+        })
+        stats["calls"] += 1
+        stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        stats["latency_seconds"] += elapsed
+
+def get_llm_stats() -> dict:
+    """Calls, prompt/completion tokens and total latency per kind of llm call."""
+    with _llm_stats_lock:
+        return {purpose: dict(stats) for purpose, stats in llm_stats.items()}
+
+def completion(messages: list, purpose: str = "completion") -> dict:
+    start = time.perf_counter()
     result = client.chat.completions.create(
         model=extraction_model,
         messages=messages,
         temperature=0.1
     )
+    _record_usage(purpose, result, time.perf_counter() - start)
     return result.choices[0].message
 
+async def completion_async(messages: list, purpose: str = "completion") -> dict:
+    async with _limit("llm", LLM_CONCURRENCY):
+        start = time.perf_counter()
+        result = await async_client.chat.completions.create(
+            model=extraction_model,
+            messages=messages,
+            temperature=0.1
+        )
+        _record_usage(purpose, result, time.perf_counter() - start)
+    return result.choices[0].message
+
+# every function below checks utils.model_cache first, keyed on
+# (model, prompt, normalized input), and stores what the provider returns.
+
+def _embed_key(text: str) -> str:
+    return model_cache.key(embed_request_model or embedding_base_url, "feature-extraction", text)
+
 def embed_text(text: str) -> list:
+    key = _embed_key(text)
+    cached = model_cache.get_embedding(key)
+    if cached is not None:
+        return cached.tolist()
+    
     result = embed_client.feature_extraction(
         text=text,
-        model=embedding_model,
+        model=embed_request_model,
     )
+    embedding = _embedding_to_list(result)
+    model_cache.set_embedding(key, embedding)
+    return embedding
+
+async def embed_text_async(text: str) -> list:
+    key = _embed_key(text)
+    cached = model_cache.get_embedding(key)
+    if cached is not None:
+        return cached.tolist()
+    
+    async with _limit("embed", EMBED_CONCURRENCY):
+        result = await async_embed_client.feature_extraction(
+            text=text,
+            model=embed_request_model,
+        )
+    embedding = _embedding_to_list(result)
+    model_cache.set_embedding(key, embedding)
+    return embedding
+
+def _cached_embeddings(texts: list):
+    """Look every text up in the model cache; returns (keys, vectors with None for misses)."""
+    keys = [_embed_key(text) for text in texts]
+    return keys, [model_cache.get_embedding(key) for key in keys]
+
+def _stack_embeddings(vectors: list) -> np.ndarray:
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(vectors).astype(np.float32, copy=False)
+
+def _batch_result(result, count: int) -> np.ndarray:
+    matrix = np.asarray(result, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.shape[0] != count:
+        raise ValueError(f"Expected {count} embeddings, got array of shape {matrix.shape}")
+    return matrix
+
+# provider responses that mean the batch was too big, so halves may go through
+SPLIT_STATUSES = (413, 422)
+_TOO_LARGE = re.compile(
+    r"too (large|long)|too many (inputs|texts|items|tokens)|batch size|maximum (batch|input|context|sequence)|context length",
+    re.IGNORECASE
+)
+
+def _should_split(error: Exception, count: int) -> bool:
+    """
+    Retry a failed batch as two halves only when the provider rejected it for
+    its size (413 / 422, or a message saying the batch or input is too large).
+    Anything else (auth, rate limits, 5xx, timeouts, connection errors) would
+    fail the same way for every half, so it is raised for the caller's retry.
+    """
+    if count <= 1:
+        return False
+    # huggingface_hub errors carry the http response; aiohttp errors a .status
+    status = getattr(getattr(error, "response", None), "status_code", None) or getattr(error, "status", None)
+    if status in SPLIT_STATUSES:
+        return True
+    # some providers report size limits as a plain 400; other statuses never mean "too big"
+    if status is not None and status != 400:
+        return False
+    return bool(_TOO_LARGE.search(str(error)))
+
+def _embed_batch(texts: list) -> np.ndarray:
+    try:
+        result = embed_client.feature_extraction(text=texts, model=embed_request_model)
+        return _batch_result(result, len(texts))
+    except Exception as e:
+        if not _should_split(e, len(texts)):
+            raise
+        # the batch is over the provider's size limit
+        middle = len(texts) // 2
+        return np.vstack([_embed_batch(texts[:middle]), _embed_batch(texts[middle:])])
+
+async def _embed_batch_async(texts: list) -> np.ndarray:
+    try:
+        async with _limit("embed", EMBED_CONCURRENCY):
+            result = await async_embed_client.feature_extraction(text=texts, model=embed_request_model)
+        return _batch_result(result, len(texts))
+    except Exception as e:
+        if not _should_split(e, len(texts)):
+            raise
+        middle = len(texts) // 2
+        return np.vstack([await _embed_batch_async(texts[:middle]), await _embed_batch_async(texts[middle:])])
+
+def embed_texts(texts: list, batch_size: int = None) -> np.ndarray:
+    """
+    Embed many texts with as few requests as possible.
+    
+    Cached texts are skipped; the rest are sent in micro-batches of
+    batch_size (EMBED_BATCH_SIZE by default), and a batch the provider rejects
+    as too large is split in half and retried.
+    
+    Returns:
+        np.ndarray: float32 matrix with one row per input text, in input order
+    """
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    keys, vectors = _cached_embeddings(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        for i, vector in zip(chunk, _embed_batch([texts[i] for i in chunk])):
+            vectors[i] = vector
+            model_cache.set_embedding(keys[i], vector)
+    return _stack_embeddings(vectors)
+
+async def embed_texts_async(texts: list, batch_size: int = None) -> np.ndarray:
+    """Async version of embed_texts; micro-batches are sent concurrently."""
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    keys, vectors = _cached_embeddings(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    
+    chunks = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+    results = await asyncio.gather(*[
+        _embed_batch_async([texts[i] for i in chunk]) for chunk in chunks
+    ])
+    for chunk, matrix in zip(chunks, results):
+        for i, vector in zip(chunk, matrix):
+            vectors[i] = vector
+            model_cache.set_embedding(keys[i], vector)
+    return _stack_embeddings(vectors)
+
+def _embedding_to_list(result) -> list:
     if hasattr(result, 'tolist'):
         return result.tolist()
     elif isinstance(result, (list, tuple)):
@@ -45,22 +252,48 @@ def embed_text(text: str) -> list:
         else:
             return list(result)
 
-def extract(text: str, mode: str = None) -> str:
+def _extract_messages(text: str, mode: str = None) -> list:
     if mode == "random":
-        messages = [
+        return [
             {"role": "system", "content": RANDOM_EXTRACT_PROMPT},
             {"role": "user", "content": text}
         ]
-    else:
-        messages = [
-            {"role": "system", "content": EXTRACT_PROMPT},
-            {"role": "user", "content": text},
-        ]
-    result = completion(messages)
-    content = result.content
+    return [
+        {"role": "system", "content": EXTRACT_PROMPT},
+        {"role": "user", "content": text},
+    ]
+
+def _clean_extract(content: str) -> str:
     content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL)
     return content.strip()
 
+def _extract_key(messages: list) -> str:
+    return model_cache.key(extraction_model, messages[0]["content"], messages[1]["content"])
+
+def extract(text: str, mode: str = None) -> str:
+    messages = _extract_messages(text, mode)
+    key = _extract_key(messages)
+    cached = model_cache.get_text(key, "extract")
+    if cached is not None:
+        return cached
+    
+    result = completion(messages, purpose="extract")
+    content = _clean_extract(result.content)
+    model_cache.set_text(key, "extract", content)
+    return content
+
+async def extract_async(text: str, mode: str = None) -> str:
+    messages = _extract_messages(text, mode)
+    key = _extract_key(messages)
+    cached = model_cache.get_text(key, "extract")
+    if cached is not None:
+        return cached
+    
+    result = await completion_async(messages, purpose="extract")
+    content = _clean_extract(result.content)
+    model_cache.set_text(key, "extract", content)
+    return content
+
 def bias_to_number(bias: str) -> int:
     bias_map = {
         "left": -2,
@@ -71,12 +304,135 @@ def bias_to_number(bias: str) -> int:
     }
     return bias_map.get(bias, 0)
 
-def bias(text: str) -> str:
-    messages = [
+def _bias_messages(text: str) -> list:
+    return [
         {"role": "system", "content": BIAS_PROMPT},
         {"role": "user", "content": text},
     ]
-    result = completion(messages)
-    content = result.content.lower()
+
+def _clean_bias(content: str) -> int:
+    content = content.lower()
     content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL)
-    return bias_to_number(content.strip())
\ No newline at end of file
+    return bias_to_number(content.strip())
+
+def _bias_key(text: str) -> str:
+    return model_cache.key(extraction_model, BIAS_PROMPT, text)
+
+def bias(text: str) -> str:
+    key = _bias_key(text)
+    cached = model_cache.get_text(key, "bias")
+    if cached is not None:
+        return int(cached)
+    
+    result = completion(_bias_messages(text), purpose="bias")
+    value = _clean_bias(result.content)
+    model_cache.set_text(key, "bias", value)
+    return value
+
+async def bias_async(text: str) -> str:
+    key = _bias_key(text)
+    cached = model_cache.get_text(key, "bias")
+    if cached is not None:
+        return int(cached)
+    
+    result = await completion_async(_bias_messages(text), purpose="bias")
+    value = _clean_bias(result.content)
+    model_cache.set_text(key, "bias", value)
+    return value
+
+
+_BIAS_LINE = re.compile(r"^[\s*_#>-]*bias[\s*_]*[:\-]\s*(.+?)\s*$", re.IGNORECASE)
+
+def parse_extract_with_bias(content: str):
+    """
+    Split a combined extraction response into (markdown, bias number).
+    
+    Returns:
+        Tuple of content and bias, or None if the response is malformed
+    """
+    content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL).strip()
+    lines = content.splitlines()
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        return None
+    
+    match = _BIAS_LINE.match(lines[-1])
+    if not match:
+        return None
+    label = re.sub(r"[^a-z ]", "", match.group(1).lower()).strip()
+    if label not in ("left", "slightly left", "neutral", "slightly right", "right"):
+        return None
+    
+    article = "\n".join(lines[:-1]).strip()
+    if not article:
+        return None
+    return article, bias_to_number(label)
+
+def _combined_messages(text: str) -> list:
+    return [
+        {"role": "system", "content": EXTRACT_WITH_BIAS_PROMPT},
+        {"role": "user", "content": text},
+    ]
+
+def _combined_key(text: str) -> str:
+    return model_cache.key(extraction_model, EXTRACT_WITH_BIAS_PROMPT, text)
+
+def _record_fallback():
+    with _llm_stats_lock:
+        stats = llm_stats.setdefault("combined_fallback", {"count": 0})
+        stats["count"] += 1
+
+def extract_and_bias(text: str, combined: bool = None):
+    """
+    Clean an article and classify its bias.
+    
+    Args:
+        text: Raw page text
+        combined: Use one chat completion for both (defaults to COMBINED_EXTRACTION);
+            a malformed combined response falls back to the two-call path
+    
+    Returns:
+        Tuple of (cleaned content, bias number)
+    """
+    if combined is None:
+        combined = COMBINED_EXTRACTION
+    
+    if combined:
+        key = _combined_key(text)
+        cached = model_cache.get_text(key, "combined")
+        if cached is not None:
+            content, _, value = cached.rpartition("\n")
+            return content, int(value)
+        
+        result = completion(_combined_messages(text), purpose="combined")
+        parsed = parse_extract_with_bias(result.content)
+        if parsed is not None:
+            model_cache.set_text(key, "combined", f"{parsed[0]}\n{parsed[1]}")
+            return parsed
+        _record_fallback()
+    
+    content = extract(text)
+    return content, bias(content)
+
+async def extract_and_bias_async(text: str, combined: bool = None):
+    """Async version of extract_and_bias."""
+    if combined is None:
+        combined = COMBINED_EXTRACTION
+    
+    if combined:
+        key = _combined_key(text)
+        cached = model_cache.get_text(key, "combined")
+        if cached is not None:
+            content, _, value = cached.rpartition("\n")
+            return content, int(value)
+        
+        result = await completion_async(_combined_messages(text), purpose="combined")
+        parsed = parse_extract_with_bias(result.content)
+        if parsed is not None:
+            model_cache.set_text(key, "combined", f"{parsed[0]}\n{parsed[1]}")
+            return parsed
+        _record_fallback()
+    
+    content = await extract_async(text)
+    return content, await bias_async(content)
@@ -0,0 +1,91 @@
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+PASSAGE_CHARS = int(os.environ.get("PASSAGE_CHARS", 1200))  # 0 = embed whole articles, no passages
+PASSAGE_OVERLAP = int(os.environ.get("PASSAGE_OVERLAP", 200))
+
+# places a passage may end, best first
+SENTENCE_ENDS = ('\n', '. ', '! ', '? ')
+
+def split_passages(text: str, size: int = PASSAGE_CHARS, overlap: int = PASSAGE_OVERLAP) -> List[Tuple[int, int]]:
+    """
+    Split text into overlapping passages of about `size` characters.
+
+    A passage ends at the last sentence break in its second half, or failing
+    that the last space, so passages rarely cut a sentence in two. The next
+    one starts `overlap` characters before that, at a word boundary, so a
+    sentence straddling the break is whole in at least one passage. A short
+    tail is merged into the passage before it.
+
+    Args:
+        text: Article text
+        size: Target passage length in characters (0 = one passage)
+        overlap: Characters shared by consecutive passages
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) character offsets into text
+    """
+    length = len(text)
+    if size <= 0 or length <= size:
+        return [(0, length)]
+
+    overlap = min(overlap, size // 2)
+    spans = []
+    start = 0
+    while True:
+        end = start + size
+        if length - end < size // 4:
+            spans.append((start, length))
+            return spans
+
+        floor = start + size // 2
+        cut = max(text.rfind(sep, floor, end) for sep in SENTENCE_ENDS)
+        if cut != -1:
+            end = cut + 1
+        else:
+            cut = text.rfind(' ', floor, end)
+            if cut != -1:
+                end = cut
+        spans.append((start, end))
+
+        next_start = max(end - overlap, start + 1)
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+def passage_texts(text: str, spans: Sequence[Tuple[int, int]]) -> List[str]:
+    return [text[start:end] for start, end in spans]
+
+def attach_passages(article: Dict[str, Any], spans: Sequence[Tuple[int, int]], vectors: np.ndarray) -> Dict[str, Any]:
+    """
+    Set an article's embedding and passages from its passage embeddings.
+
+    A single-passage article keeps that embedding as its own and stores no
+    passage vectors (the writer records one passage sharing the article's
+    embedding). Otherwise the article embedding is the normalized mean of its
+    passages, which covers the whole text rather than only what fits in the
+    embedding model's context.
+
+    Args:
+        article: Record dict, updated in place
+        spans: (start, end) offsets from split_passages
+        vectors: One embedding per span
+
+    Returns:
+        The article
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(spans) == 1:
+        article['embedding'] = vectors[0]
+        article['passages'] = None
+        return article
+
+    normalized = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    mean = normalized.mean(axis=0)
+    article['embedding'] = mean / (np.linalg.norm(mean) or 1.0)
+    article['passages'] = [
+        {'start': start, 'end': end, 'embedding': vector}
+        for (start, end), vector in zip(spans, vectors)
+    ]
+    return article
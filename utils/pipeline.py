@@ -0,0 +1,256 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_DONE = object()
+
+class RateLimiter:
+    """Async token bucket: at most `rate` acquisitions per second, with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    Args:
+        name: Name used in metrics and logs
+        fn: Callable applied to each item (or to each batch when batch_size > 1).
+            A coroutine function when pool is None, a plain function otherwise
+            (and a picklable top-level one for pool='process'). It returns the
+            item to pass on, or None to drop it; batched and fan_out stages
+            return a list of items instead.
+        workers: Number of concurrent workers (and pool size)
+        pool: None to run fn on the event loop, 'thread' or 'process' to run it in a pool
+        queue_size: Capacity of this stage's input queue; a full queue blocks the
+            previous stage, which is what gives the pipeline backpressure
+        batch_size: Max items handed to fn at once
+        batch_interval: Max seconds to wait for a batch to fill
+        rate_limit: Max calls of fn per second across all workers (None for unlimited)
+        fan_out: fn returns a list of items for a single input item
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        workers: int = 1,
+        pool: Optional[str] = None,
+        queue_size: int = 100,
+        batch_size: int = 1,
+        batch_interval: float = 0.5,
+        rate_limit: Optional[float] = None,
+        fan_out: bool = False
+    ):
+        if pool not in (None, 'thread', 'process'):
+            raise ValueError(f"Unknown pool type: {pool}")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.pool = pool
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.rate_limit = rate_limit
+        self.fan_out = fan_out
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Every stage has its own workers and executor, so a slow stage (the LLM)
+    only holds back its upstream stages once the queue in front of it fills up,
+    instead of serializing the whole chain per item.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.queues = []
+        self.metrics = {}
+        self.started = None
+
+    def _new_metrics(self) -> Dict[str, Any]:
+        return {
+            'in': 0,
+            'out': 0,
+            'failed': 0,
+            'busy_seconds': 0.0,
+            'queue_depth': 0,
+            'max_queue_depth': 0
+        }
+
+    async def run(self, items: Iterable[Any], report_interval: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Feed items through the pipeline and wait until every stage has drained.
+
+        Args:
+            items: Input items for the first stage
+            report_interval: Print metrics every this many seconds while running
+
+        Returns:
+            Dict[str, Any]: Final metrics (see get_metrics)
+        """
+        self.queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        self.metrics = {stage.name: self._new_metrics() for stage in self.stages}
+        self.started = time.monotonic()
+
+        executors = {}
+        for stage in self.stages:
+            if stage.pool == 'thread':
+                executors[stage.name] = ThreadPoolExecutor(max_workers=stage.workers)
+            elif stage.pool == 'process':
+                executors[stage.name] = ProcessPoolExecutor(max_workers=stage.workers)
+        limiters = {
+            stage.name: RateLimiter(stage.rate_limit)
+            for stage in self.stages if stage.rate_limit
+        }
+        alive = [stage.workers for stage in self.stages]
+
+        async def worker(index: int):
+            stage = self.stages[index]
+            inbox = self.queues[index]
+            outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+            while True:
+                batch, done = await self._take(stage, inbox)
+                if batch:
+                    outputs = await self._process(stage, batch, executors.get(stage.name), limiters.get(stage.name))
+                    for output in outputs:
+                        if outbox is not None:
+                            await self._put(self.stages[index + 1], outbox, output)
+                if done:
+                    break
+
+            # last worker out tells the next stage there is nothing more coming
+            alive[index] -= 1
+            if alive[index] == 0 and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    await outbox.put(_DONE)
+
+        reporter = None
+        if report_interval:
+            reporter = asyncio.create_task(self._report(report_interval))
+
+        try:
+            tasks = [
+                asyncio.create_task(worker(index))
+                for index, stage in enumerate(self.stages)
+                for _ in range(stage.workers)
+            ]
+            for item in items:
+                await self._put(self.stages[0], self.queues[0], item)
+            for _ in range(self.stages[0].workers):
+                await self.queues[0].put(_DONE)
+            await asyncio.gather(*tasks)
+        finally:
+            if reporter:
+                reporter.cancel()
+            for executor in executors.values():
+                executor.shutdown(wait=False)
+
+        return self.get_metrics()
+
+    async def _put(self, stage: Stage, queue: asyncio.Queue, item: Any):
+        await queue.put(item)
+        metrics = self.metrics[stage.name]
+        metrics['max_queue_depth'] = max(metrics['max_queue_depth'], queue.qsize())
+
+    async def _take(self, stage: Stage, inbox: asyncio.Queue):
+        """
+        Take the next item, or the next batch for batching stages.
+
+        Returns:
+            (items, done) where done means the end-of-input marker was reached
+        """
+        item = await inbox.get()
+        if item is _DONE:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + stage.batch_interval
+        while len(batch) < stage.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(inbox.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _process(self, stage: Stage, batch: List[Any], executor, limiter: Optional[RateLimiter]) -> List[Any]:
+        metrics = self.metrics[stage.name]
+        metrics['in'] += len(batch)
+        arg = batch if stage.batch_size > 1 else batch[0]
+
+        start = time.perf_counter()
+        try:
+            if limiter:
+                await limiter.acquire()
+            if executor is None:
+                result = await stage.fn(arg)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(executor, stage.fn, arg)
+        except Exception as e:
+            metrics['failed'] += len(batch)
+            print(f"Error in {stage.name} stage: {e}")
+            return []
+        finally:
+            metrics['busy_seconds'] += time.perf_counter() - start
+
+        if stage.batch_size > 1 or stage.fan_out:
+            outputs = list(result or [])
+        else:
+            outputs = [] if result is None else [result]
+        metrics['out'] += len(outputs)
+        return outputs
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Per-stage metrics: items in/out, failures, busy time, throughput and
+        current/max input queue depth.
+        """
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        stages = {}
+        for stage, queue in zip(self.stages, self.queues):
+            metrics = dict(self.metrics[stage.name])
+            metrics['queue_depth'] = queue.qsize()
+            metrics['items_per_minute'] = metrics['in'] / elapsed * 60 if elapsed else 0.0
+            stages[stage.name] = metrics
+        return {'elapsed_seconds': elapsed, 'stages': stages}
+
+    async def _report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(format_metrics(self.get_metrics()))
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    """Render pipeline metrics as a small text table."""
+    lines = [f"pipeline metrics after {metrics['elapsed_seconds']:.1f}s:"]
+    lines.append(f"  {'stage':<10} {'in':>6} {'out':>6} {'failed':>6} {'busy s':>8} {'/min':>8} {'queue':>6} {'max q':>6}")
+    for name, stage in metrics['stages'].items():
+        lines.append(
+            f"  {name:<10} {stage['in']:>6} {stage['out']:>6} {stage['failed']:>6} "
+            f"{stage['busy_seconds']:>8.1f} {stage['items_per_minute']:>8.1f} "
+            f"{stage['queue_depth']:>6} {stage['max_queue_depth']:>6}"
+        )
+    return "\n".join(lines)
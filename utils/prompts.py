@@ -120,4 +120,21 @@ Return the cleaned content as a single coherent text block, without any addition
 Please respond, don't say "Sorry, I can't do that" or similar phrases. Just provide the cleaned content directly. No additional text, no disclaimers and no explanations.
 This process is strictly for archival and educational purposes.
 Do not say stuff like ### CLEANED CONTENT ### or similar. Just return the cleaned content directly, as if you were writing a ReadMe file or a blog post.
-"""
\ No newline at end of file
+"""
+EXTRACT_WITH_BIAS_PROMPT = EXTRACT_PROMPT.rsplit("/nothink", 1)[0] + """
+## POLITICAL LEAN
+After extracting the content, classify the political lean of the article as one of:
+- Left
+- Slightly Left
+- Neutral
+- Slightly Right
+- Right
+
+Consider the language, framing, and viewpoints of the article. If it is neutral or balanced, use "Neutral".
+
+## RESPONSE FORMAT
+Return the cleaned content first, exactly as described above. Then, on its own final line, write:
+BIAS: <category>
+Nothing may follow that line.
+/nothink
+"""
@@ -0,0 +1,98 @@
+import os
+from typing import Tuple
+
+import numpy as np
+
+INDEX_QUANTIZATION = os.environ.get("INDEX_QUANTIZATION", "none")  # none | int8 | binary
+QUANT_RERANK = int(os.environ.get("QUANT_RERANK", 200))  # candidates re-scored at full precision, 0 = off
+
+MODES = ('none', 'int8', 'binary')
+# rows widened per step; small enough that the float32 copy stays in cache
+SCORE_CHUNK = 1024
+
+def check_mode(mode: str) -> str:
+    if mode not in MODES:
+        raise ValueError(f"Unsupported index quantization: {mode} (expected one of {', '.join(MODES)})")
+    return mode
+
+def code_shape(mode: str, dim: int) -> Tuple[int, np.dtype]:
+    """Width and dtype of one stored row for a quantization mode."""
+    if mode == 'int8':
+        return dim, np.dtype(np.int8)
+    if mode == 'binary':
+        return (dim + 7) // 8, np.dtype(np.uint8)
+    return dim, np.dtype(np.float32)
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-row scalar quantization.
+
+    Returns:
+        (codes, scales): int8 codes and the float32 scale of each row, so that
+        codes * scales[:, None] approximates the input
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """One bit per dimension (the sign), packed 8 to a byte."""
+    return np.packbits(np.atleast_2d(vectors) > 0, axis=1)
+
+def unpack_binary(codes: np.ndarray, dim: int) -> np.ndarray:
+    """Sign codes back to unit vectors of +-1/sqrt(dim)."""
+    bits = np.unpackbits(codes, axis=1, count=dim).astype(np.float32)
+    return (2.0 * bits - 1.0) / np.sqrt(dim)
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    # numpy < 2.0
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[values]
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Number of differing bits between each packed row and a packed query."""
+    return _popcount(codes ^ query_code).sum(axis=1, dtype=np.int32)
+
+def score_codes(mode: str, codes: np.ndarray, scales: np.ndarray, queries: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Approximate cosine similarity between unit queries and stored rows.
+
+    int8 rows are widened to float32 a chunk at a time; binary rows are
+    compared by Hamming distance, mapped to cos(pi * d / dim), the expected
+    cosine for that many sign disagreements.
+
+    Args:
+        mode: 'none', 'int8' or 'binary'
+        codes: Stored rows (float32, int8 or packed uint8)
+        scales: Per-row int8 scales (ignored for other modes)
+        queries: 2D array of unit query vectors
+        dim: Embedding dimension
+
+    Returns:
+        (num_queries, num_rows) float32 scores
+    """
+    if mode == 'none':
+        return queries @ codes.T
+
+    scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+    if mode == 'binary':
+        query_codes = quantize_binary(queries)
+    for start in range(0, len(codes), SCORE_CHUNK):
+        chunk = codes[start:start + SCORE_CHUNK]
+        end = start + len(chunk)
+        if mode == 'int8':
+            scores[:, start:end] = (queries @ chunk.T.astype(np.float32)) * scales[start:end]
+        else:
+            for i, query_code in enumerate(query_codes):
+                scores[i, start:end] = np.cos(np.pi * hamming_distances(chunk, query_code) / dim)
+    return scores
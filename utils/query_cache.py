@@ -0,0 +1,165 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils.model_cache import normalize_text
+
+QUERY_CACHE_EMBEDDINGS = int(os.environ.get("QUERY_CACHE_EMBEDDINGS", 4096))
+QUERY_CACHE_RESULTS = int(os.environ.get("QUERY_CACHE_RESULTS", 512))
+QUERY_CACHE_THRESHOLD = float(os.environ.get("QUERY_CACHE_THRESHOLD", 0.95))
+QUERY_CACHE_TTL = int(os.environ.get("QUERY_CACHE_TTL", 600))
+
+EWMA_ALPHA = 0.2
+
+class QueryCache:
+    """
+    In-memory caches in front of news search.
+
+    - an exact cache of normalized query text -> query embedding, so repeated
+      queries skip the embedding call altogether
+    - a semantic result cache: a new query whose embedding is within
+      `threshold` cosine similarity of a recently answered one gets that
+      query's results. Similarity scores in such a result are the ones computed
+      for the cached query.
+
+    Result entries are tied to the vector index version and dropped as soon as
+    articles are added or removed, and after `ttl_seconds` regardless.
+    """
+
+    def __init__(
+        self,
+        max_embeddings: int = QUERY_CACHE_EMBEDDINGS,
+        max_results: int = QUERY_CACHE_RESULTS,
+        threshold: float = QUERY_CACHE_THRESHOLD,
+        ttl_seconds: int = QUERY_CACHE_TTL
+    ):
+        self.max_embeddings = max_embeddings
+        self.max_results = max_results
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._embeddings = OrderedDict()  # normalized query -> unit float32 vector
+
+        # result entries, with their query vectors stacked for one matrix-vector lookup
+        self._vectors = None
+        self._entries: List[Dict[str, Any]] = []
+        self._version = None
+
+        self.stats = {
+            'embedding_hits': 0,
+            'embedding_misses': 0,
+            'result_hits': 0,
+            'result_misses': 0,
+            'invalidations': 0,
+            'saved_seconds': 0.0
+        }
+        # typical cost of what a hit avoids, learned from misses
+        self._embed_seconds = None
+        self._search_seconds = None
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _ewma(previous: Optional[float], value: float) -> float:
+        return value if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * value
+
+    def get_embedding(self, query: str) -> Optional[np.ndarray]:
+        """Cached embedding for exactly this query (after whitespace/case normalization)."""
+        key = normalize_text(query).lower()
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is None:
+                self.stats['embedding_misses'] += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self.stats['embedding_hits'] += 1
+            self.stats['saved_seconds'] += self._embed_seconds or 0.0
+            return vector
+
+    def set_embedding(self, query: str, embedding, seconds: float):
+        """Remember a query embedding and how long it took to compute."""
+        key = normalize_text(query).lower()
+        with self._lock:
+            self._embeddings[key] = self._unit(embedding)
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+            self._embed_seconds = self._ewma(self._embed_seconds, seconds)
+
+    def _check_version(self, version: int):
+        """Drop every result entry when the index has changed. Call with the lock held."""
+        if version != self._version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._vectors = None
+            self._entries = []
+            self._version = version
+
+    def get_results(self, embedding, top_k: int, version: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Results of a recent query close enough to this embedding.
+
+        Args:
+            embedding: Query embedding
+            top_k: Number of results wanted; only entries with at least as many qualify
+            version: Current vector index version
+
+        Returns:
+            The cached results (top_k of them), or None
+        """
+        query = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is not None:
+                similarities = self._vectors @ query
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.threshold:
+                        break
+                    entry = self._entries[i]
+                    if entry['top_k'] >= top_k and now - entry['created'] <= self.ttl_seconds:
+                        self.stats['result_hits'] += 1
+                        self.stats['saved_seconds'] += self._search_seconds or 0.0
+                        return list(entry['results'][:top_k])
+            self.stats['result_misses'] += 1
+            return None
+
+    def set_results(self, embedding, top_k: int, version: int, results: List[Dict[str, Any]], seconds: float):
+        """Remember the results of an index search and how long it took."""
+        query = self._unit(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            self._search_seconds = self._ewma(self._search_seconds, seconds)
+
+            # drop expired entries, then the oldest ones if still full
+            keep = [i for i, entry in enumerate(self._entries) if now - entry['created'] <= self.ttl_seconds]
+            keep = keep[-(self.max_results - 1):] if self.max_results > 1 else []
+            self._entries = [self._entries[i] for i in keep]
+            vectors = [self._vectors[keep]] if keep else []
+
+            self._entries.append({'top_k': top_k, 'results': list(results), 'created': now})
+            self._vectors = np.vstack(vectors + [query[None, :]])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['embeddings'] = len(self._embeddings)
+            stats['result_sets'] = len(self._entries)
+        embedding_lookups = stats['embedding_hits'] + stats['embedding_misses']
+        result_lookups = stats['result_hits'] + stats['result_misses']
+        stats['embedding_hit_rate'] = stats['embedding_hits'] / embedding_lookups if embedding_lookups else 0.0
+        stats['result_hit_rate'] = stats['result_hits'] / result_lookups if result_lookups else 0.0
+        stats['saved_seconds'] = round(stats['saved_seconds'], 3)
+        stats['threshold'] = self.threshold
+        return stats
+
+query_cache = QueryCache()
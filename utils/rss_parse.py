@@ -1,35 +1,59 @@
 from rss_parser import RSSParser
 from requests import get
+import asyncio
 import feedparser
 import xml.etree.ElementTree as ET
 
+def parse_rss(text: str, rss_url: str):
+    """Parse RSS text with fallback parsing methods"""
+    if not text.strip():
+        print(f"Empty response from {rss_url}")
+        return None
+    
+    try:
+        rss = RSSParser.parse(text)
+        return rss
+    except Exception as parser_error:
+        print(f"RSS parser failed for {rss_url}: {parser_error}")
+        
+        try:
+            feed = feedparser.parse(text)
+            if feed.entries:
+                return feed
+            else:
+                print(f"Feedparser found no entries in {rss_url}")
+                return None
+        except Exception as feedparser_error:
+            print(f"Feedparser also failed for {rss_url}: {feedparser_error}")
+            return None
+
 def get_rss(rss_url: str):
     """Get RSS feed with fallback parsing methods"""
     try:
         response = get(rss_url, timeout=10)
         response.raise_for_status()
-        
-        if not response.text.strip():
-            print(f"Empty response from {rss_url}")
-            return None
-        
-        try:
-            rss = RSSParser.parse(response.text)
-            return rss
-        except Exception as parser_error:
-            print(f"RSS parser failed for {rss_url}: {parser_error}")
-            
-            try:
-                feed = feedparser.parse(response.text)
-                if feed.entries:
-                    return feed
-                else:
-                    print(f"Feedparser found no entries in {rss_url}")
-                    return None
-            except Exception as feedparser_error:
-                print(f"Feedparser also failed for {rss_url}: {feedparser_error}")
-                return None
+        return parse_rss(response.text, rss_url)
                 
     except Exception as e:
         print(f"Network error for {rss_url}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+async def get_rss_async(session, rss_url: str):
+    """Get RSS feed over a shared aiohttp session, parsing off the event loop"""
+    try:
+        async with session.get(rss_url) as response:
+            response.raise_for_status()
+            text = await response.text()
+    except Exception as e:
+        print(f"Network error for {rss_url}: {e}")
+        return None
+    
+    return await asyncio.to_thread(parse_rss, text, rss_url)
+
+def entry_url(entry):
+    """Get the article URL of an RSS entry, or None if it has no link."""
+    try:
+        link = entry.links[0]
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return str(link.content if hasattr(link, "content") else link)
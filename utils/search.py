@@ -1,9 +1,138 @@
+import os
+import time
+import threading
 import numpy as np
-from typing import List, Dict, Any, Tuple
-import json
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Tuple, Optional
 
-from utils.db import get_connection, TABLE_NAME
-from utils.models import embed_text
+from utils.db import get_connection, TABLE_NAME, PASSAGES_TABLE
+from utils.models import embed_text, embed_texts
+from utils.vector_index import vector_index, passage_index
+from utils.query_cache import query_cache
+from utils.lexical import lexical_search, reciprocal_rank_fusion
+from utils.snippets import make_snippet, query_terms
+
+SEARCH_MODES = ('vector', 'lexical', 'hybrid')
+NEWS_SEARCH_MODE = os.environ.get("NEWS_SEARCH_MODE", "vector")
+# a query embedding slower than this is abandoned and the search falls back to lexical
+EMBED_TIMEOUT = float(os.environ.get("EMBED_TIMEOUT", 2.0))
+# after a failed or timed-out query embedding, skip the provider for this long
+EMBED_RETRY_AFTER = float(os.environ.get("EMBED_RETRY_AFTER", 30.0))
+# candidates taken from each ranking before fusing them
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 50))
+# rank passages rather than whole articles, returning the best passage as a snippet
+NEWS_SEARCH_PASSAGES = os.environ.get("NEWS_SEARCH_PASSAGES", "1") == "1"
+# passages fetched per wanted article; doubled while too few distinct articles come back
+PASSAGE_FANOUT = int(os.environ.get("PASSAGE_FANOUT", 4))
+# fields a news search result can carry; scores (similarity, bm25, score) always come along
+NEWS_FIELDS = ('id', 'title', 'url', 'content', 'snippet', 'source', 'bias')
+NEWS_SEARCH_FIELDS = os.environ.get("NEWS_SEARCH_FIELDS", "id,title,url,snippet,source,bias")
+# what search() has always returned (plus similarity)
+SEARCH_FIELDS = ('id', 'title', 'url', 'content', 'source', 'bias')
+SCORE_KEYS = ('similarity', 'bm25', 'score')
+# record columns _hydrate fetches unless told otherwise
+RECORD_COLUMNS = ('title', 'url', 'content', 'source', 'bias')
+
+# query embeddings run here so a hung provider only ties up these threads
+_embed_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embed")
+_embedding_down_until = 0.0
+
+# latency per stage of news search, how often lexical stood in for vector search
+# (and why there was no query embedding), and response sizes per requested field set
+search_stats = {
+    'paths': {}, 'fallbacks': 0, 'response_bytes': {},
+    'embed_fallbacks': {'timeout': 0, 'error': 0, 'provider_down': 0}
+}
+_search_stats_lock = threading.Lock()
+
+def _record_embed_fallback(reason: str):
+    with _search_stats_lock:
+        search_stats['embed_fallbacks'][reason] += 1
+
+def _record_latency(path: str, seconds: float):
+    with _search_stats_lock:
+        stats = search_stats['paths'].setdefault(path, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        stats['calls'] += 1
+        stats['total_ms'] += seconds * 1000
+        stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+
+def record_response_size(fields: Tuple[str, ...], size: int):
+    """Count the JSON bytes of a news search response, per requested field set."""
+    with _search_stats_lock:
+        stats = search_stats['response_bytes'].setdefault(','.join(fields), {'responses': 0, 'total_bytes': 0, 'max_bytes': 0})
+        stats['responses'] += 1
+        stats['total_bytes'] += size
+        stats['max_bytes'] = max(stats['max_bytes'], size)
+
+def get_search_stats() -> Dict[str, Any]:
+    """
+    Calls and average/max latency per search stage (embed, vector, lexical,
+    fusion, hydrate, total_<mode>), lexical fallbacks in total and by cause
+    (provider timeout, provider error, provider skipped while down), and
+    average/max response bytes per field set.
+    """
+    with _search_stats_lock:
+        paths = {
+            path: {
+                'calls': stats['calls'],
+                'avg_ms': round(stats['total_ms'] / stats['calls'], 2),
+                'max_ms': round(stats['max_ms'], 2)
+            }
+            for path, stats in search_stats['paths'].items()
+        }
+        response_bytes = {
+            fields: {
+                'responses': stats['responses'],
+                'avg_bytes': round(stats['total_bytes'] / stats['responses']),
+                'max_bytes': stats['max_bytes']
+            }
+            for fields, stats in search_stats['response_bytes'].items()
+        }
+        fallbacks = search_stats['fallbacks']
+        embed_fallbacks = dict(search_stats['embed_fallbacks'])
+    return {
+        'paths': paths,
+        'response_bytes': response_bytes,
+        'fallbacks': fallbacks,
+        'embed_fallbacks': embed_fallbacks,
+        'embedding_available': time.time() >= _embedding_down_until,
+        'default_mode': NEWS_SEARCH_MODE,
+        'default_fields': list(check_fields(None))
+    }
+
+def check_fields(fields: Optional[List[str]]) -> Tuple[str, ...]:
+    """
+    Validate requested result fields.
+
+    Args:
+        fields: Field names, or None for NEWS_SEARCH_FIELDS
+
+    Returns:
+        The fields, in NEWS_FIELDS order
+    """
+    if fields is None:
+        fields = NEWS_SEARCH_FIELDS.split(',')
+    fields = {field.strip() for field in fields if field.strip()}
+    unknown = fields.difference(NEWS_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} (expected some of {', '.join(NEWS_FIELDS)})")
+    return tuple(field for field in NEWS_FIELDS if field in fields)
+
+def _refresh_index():
+    """
+    Bring the vector index up to date with the database.
+
+    The first call also starts the index's background watcher, so new articles
+    become searchable without waiting for a query; after that this is a single
+    change log lookup unless something was written.
+    """
+    vector_index.start_watcher()
+    vector_index.refresh()
+
+def _refresh_passage_index():
+    """_refresh_index for the passage index."""
+    passage_index.start_watcher()
+    passage_index.refresh()
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float: # cosine = dot(a, b) / (||a|| * ||b||)
     """
@@ -34,6 +163,203 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float: # cosine = dot(a,
     similarity = dot_product / (norm_a * norm_b)
     return float(similarity)
 
+def _hydrate(
+    scored: List[Tuple[int, float]],
+    score_key: str = 'similarity',
+    columns: Tuple[str, ...] = RECORD_COLUMNS
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Fetch title/url/content for the winning rows of an index lookup.
+
+    Args:
+        scored: (record id, score) pairs, best first
+        score_key: Result field the score is returned in
+        columns: Record columns to fetch (none = just check the rows still exist)
+
+    Returns:
+        Tuple of the hydrated records (in score order) and ids that no longer exist
+    """
+    if not scored:
+        return [], []
+
+    ids = [record_id for record_id, _ in scored]
+    placeholders = ','.join('?' * len(ids))
+    with get_connection() as conn:
+        cursor = conn.execute(f'''
+            SELECT {', '.join(('id',) + tuple(columns))}
+            FROM {TABLE_NAME}
+            WHERE id IN ({placeholders})
+        ''', ids)
+        rows = {row[0]: row for row in cursor}
+
+    results = []
+    missing = []
+    for record_id, score in scored:
+        row = rows.get(record_id)
+        if row is None:
+            missing.append(record_id)
+            continue
+        result = {'id': record_id}
+        result.update(zip(columns, row[1:]))
+        result[score_key] = score
+        results.append(result)
+    return results, missing
+
+def _search_index(
+    query_embeddings: np.ndarray,
+    top_k: int,
+    exclude_ids: List[int] = None,
+    columns: Tuple[str, ...] = RECORD_COLUMNS,
+    **filters
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run one or more query vectors against the vector index and hydrate the hits.
+
+    Rows that were overwritten or deleted since they were indexed are dropped from
+    the index and the lookup is repeated, so callers still get top_k results.
+    Filters (sources, bias_range, min_similarity) are passed to the index.
+    """
+    _refresh_index()
+
+    results = []
+    for query_embedding in np.atleast_2d(query_embeddings):
+        for _ in range(3):
+            scored = vector_index.search(query_embedding, top_k, exclude_ids, **filters)
+            hits, missing = _hydrate(scored, columns=columns)
+            if not missing:
+                break
+            vector_index.remove(missing)
+        results.append(hits)
+    return results
+
+def _best_passages(scored: List[Tuple[int, float]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Group passage hits by article, keeping each article's best passage (max-sim).
+
+    Args:
+        scored: (passage id, similarity) pairs, best first
+
+    Returns:
+        Tuple of {'id', 'passage_id', 'similarity'} per article (in score order)
+        and passage ids that no longer exist
+    """
+    if not scored:
+        return [], []
+
+    ids = [passage_id for passage_id, _ in scored]
+    with get_connection() as conn:
+        cursor = conn.execute(
+            f'SELECT id, record_id FROM {PASSAGES_TABLE} WHERE id IN ({",".join("?" * len(ids))})', ids
+        )
+        records = dict(cursor)
+
+    results = {}
+    missing = []
+    for passage_id, similarity in scored:
+        record_id = records.get(passage_id)
+        if record_id is None:
+            missing.append(passage_id)
+            continue
+        # hits are best first, so an article's first passage is its best
+        if record_id not in results:
+            results[record_id] = {'id': record_id, 'passage_id': passage_id, 'similarity': similarity}
+    return list(results.values()), missing
+
+def _search_passages(query_embedding: np.ndarray, top_k: int, **filters) -> List[Dict[str, Any]]:
+    """
+    Vector search over passages, one result per article scored by its best passage.
+
+    Fetches PASSAGE_FANOUT passages per wanted article and doubles that while
+    the hits cover fewer than top_k articles. Filters are passed to the index.
+    Returns ranked hits only; _fill fetches their fields.
+    """
+    _refresh_passage_index()
+
+    fetch = top_k * PASSAGE_FANOUT
+    results = []
+    for _ in range(4):
+        scored = passage_index.search(query_embedding, fetch, **filters)
+        results, missing = _best_passages(scored)
+        if missing:
+            passage_index.remove(missing)
+        elif len(results) >= top_k or len(scored) < fetch:
+            break
+        else:
+            fetch *= 2
+    return results[:top_k]
+
+def _fill(hits: List[Dict[str, Any]], query: str, fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """
+    Fetch the requested fields for ranked hits, in one query selecting only
+    the columns they need.
+
+    The snippet is a query-focused excerpt (utils.snippets) of the hit's best
+    passage when the passage index found it, else of the whole article; the
+    article body is only read when 'content' or a snippet is wanted. Hits
+    whose record has since been deleted are dropped.
+
+    Args:
+        hits: {'id', scores..., optional 'passage_id'} best first
+        query: The query, to focus snippets on
+        fields: check_fields() output
+
+    Returns:
+        One dict per hit with the requested fields followed by its scores
+    """
+    if not hits:
+        return []
+
+    columns = [column for column in ('title', 'url', 'source', 'bias') if column in fields]
+    select = ['r.id'] + [f'r.{column}' for column in columns]
+    join = ''
+    params: list = []
+    if 'content' in fields:
+        select.append('r.content')
+    if 'snippet' in fields:
+        # the best passage's text, or the whole article for hits from the article or lexical index
+        passage_ids = [hit['passage_id'] for hit in hits if hit.get('passage_id') is not None]
+        select.append('COALESCE(SUBSTR(r.content, p.char_start + 1, p.char_end - p.char_start), r.content)')
+        # whether the passage starts or ends inside the article (NULL without a passage)
+        select.extend(['p.char_start > 0', 'p.char_end < LENGTH(r.content)'])
+        join = f'LEFT JOIN {PASSAGES_TABLE} p ON p.record_id = r.id AND p.id IN ({",".join("?" * len(passage_ids))})'
+        params.extend(passage_ids)
+    record_ids = [hit['id'] for hit in hits]
+    params.extend(record_ids)
+
+    with get_connection() as conn:
+        cursor = conn.execute(f'''
+            SELECT {', '.join(select)}
+            FROM {TABLE_NAME} r {join}
+            WHERE r.id IN ({','.join('?' * len(record_ids))})
+        ''', params)
+        rows = {row[0]: row for row in cursor}
+
+    terms = query_terms(query)
+    results = []
+    for hit in hits:
+        row = rows.get(hit['id'])
+        if row is None:
+            continue
+        values = dict(zip(columns, row[1:]), id=hit['id'])
+        if 'content' in fields:
+            values['content'] = row[len(columns) + 1]
+        if 'snippet' in fields:
+            text, cut_before, cut_after = row[-3:]
+            values['snippet'] = make_snippet(text, terms, cut_before=bool(cut_before), cut_after=bool(cut_after))
+        result = {field: values[field] for field in fields}
+        result.update((key, hit[key]) for key in SCORE_KEYS if key in hit)
+        results.append(result)
+    return results
+
+def _query_embedding(query: str) -> np.ndarray:
+    """Embed a query, through the exact query cache (agents repeat the same queries a lot)."""
+    query_embedding = query_cache.get_embedding(query)
+    if query_embedding is None:
+        started = time.perf_counter()
+        query_embedding = np.asarray(embed_text(query), dtype=np.float32)
+        query_cache.set_embedding(query, query_embedding, time.perf_counter() - started)
+    return query_embedding
+
 def search(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
     """
     Search for articles similar to the query using cosine similarity.
@@ -45,48 +371,32 @@ def search(query: str, top_k: int = 10) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: List of records with similarity scores, sorted by relevance
     """
-    # embed the query
-    query_embedding = embed_text(query)
-    query_embedding = np.array(query_embedding)
-    
-    # get all records with embeddings from database
-    with get_connection() as conn:
-        cursor = conn.execute(f'''
-            SELECT id, title, url, content, embedding, source, bias 
-            FROM {TABLE_NAME} 
-            WHERE embedding IS NOT NULL AND embedding != ''
-        ''')
-        
-        results = []
-        for row in cursor:
-            id, title, url, content, embedding_str, source, bias = row
-            
-            try:
-                # parse embedding from json
-                embedding = json.loads(embedding_str)
-                embedding = np.array(embedding)
-                
-                # calculate cosine similarity
-                similarity = cosine_similarity(query_embedding, embedding)
-                
-                # add to results
-                results.append({
-                    'id': id,
-                    'title': title,
-                    'url': url,
-                    'content': content,
-                    'source': source,
-                    'bias': bias,
-                    'similarity': similarity
-                })
-                
-            except (json.JSONDecodeError, ValueError, TypeError) as e:
-                # skip records with invalid embeddings
-                continue
-    
-    # sort by similarity (highest first) and return top_k
-    results.sort(key=lambda x: x['similarity'], reverse=True)
-    return results[:top_k]
+    return _fill(_search_embedding(_query_embedding(query), top_k), query, SEARCH_FIELDS)
+
+def _search_embedding(query_embedding: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    """
+    Unfiltered vector search for an already embedded query, through the
+    semantic result cache. Ranks passages when NEWS_SEARCH_PASSAGES is on.
+    Returns ranked hits only; _fill fetches their fields.
+    """
+    # near-identical phrasings share results until new articles come in
+    if NEWS_SEARCH_PASSAGES:
+        _refresh_passage_index()
+        version = passage_index.version
+    else:
+        _refresh_index()
+        version = vector_index.version
+    results = query_cache.get_results(query_embedding, top_k, version)
+    if results is not None:
+        return results
+
+    started = time.perf_counter()
+    if NEWS_SEARCH_PASSAGES:
+        results = _search_passages(query_embedding, top_k)
+    else:
+        results = _search_index(query_embedding, top_k, columns=())[0]
+    query_cache.set_results(query_embedding, top_k, version, results, time.perf_counter() - started)
+    return results
 
 def search_with_filters(
     query: str, 
@@ -108,31 +418,155 @@ def search_with_filters(
     Returns:
         List[Dict[str, Any]]: Filtered and sorted results
     """
-    results = search(query, top_k * 2)  # get more results to allow for filtering
+    query_embedding = _query_embedding(query)
 
-    # apply filters
-    filtered_results = []
-    for result in results:
-        # check similarity threshold
-        if result['similarity'] < min_similarity:
-            continue
+    # filters are masks over the index, applied before scoring
+    return _search_index(
+        query_embedding,
+        top_k,
+        sources=sources or None,
+        bias_range=tuple(bias_range) if bias_range else None,
+        min_similarity=min_similarity or None
+    )[0]
 
-        # check source filter
-        if sources and result['source'] not in sources:
-            continue
+def _query_embedding_within_deadline(query: str) -> Optional[np.ndarray]:
+    """
+    Embed a query, giving up after EMBED_TIMEOUT seconds.
 
-        # check bias filter
-        if bias_range:
-            try:
-                bias_value = int(result['bias'])
-                if not (bias_range[0] <= bias_value <= bias_range[1]):
-                    continue
-            except (ValueError, TypeError):
-                continue
-        
-        filtered_results.append(result)
-    
-    return filtered_results[:top_k]
+    After a failure or timeout the provider is skipped for EMBED_RETRY_AFTER
+    seconds (only the query cache is consulted), so a provider outage costs
+    one timeout rather than one per request. An abandoned call keeps running
+    and still fills the caches when it completes.
+
+    Returns:
+        The embedding, or None if it is not available in time
+    """
+    global _embedding_down_until
+    if time.time() < _embedding_down_until:
+        query_embedding = query_cache.get_embedding(query)
+        if query_embedding is None:
+            _record_embed_fallback('provider_down')
+        return query_embedding
+
+    started = time.perf_counter()
+    future = _embed_executor.submit(_query_embedding, query)
+    try:
+        query_embedding = future.result(timeout=EMBED_TIMEOUT)
+    except FutureTimeoutError:
+        print(f"Query embedding took over {EMBED_TIMEOUT}s, using lexical search for {EMBED_RETRY_AFTER}s")
+        _embedding_down_until = time.time() + EMBED_RETRY_AFTER
+        _record_embed_fallback('timeout')
+        return None
+    except Exception as e:
+        print(f"Query embedding failed, using lexical search for {EMBED_RETRY_AFTER}s: {e}")
+        _embedding_down_until = time.time() + EMBED_RETRY_AFTER
+        _record_embed_fallback('error')
+        return None
+    _record_latency('embed', time.perf_counter() - started)
+    return query_embedding
+
+def _lexical_results(query: str, top_k: int, sources: List[str] = None, bias_range: Tuple[int, int] = None) -> List[Dict[str, Any]]:
+    started = time.perf_counter()
+    scored = lexical_search(query, top_k, sources, bias_range)
+    _record_latency('lexical', time.perf_counter() - started)
+    return [{'id': record_id, 'bm25': score} for record_id, score in scored]
+
+def _vector_results(query_embedding: np.ndarray, top_k: int, sources: List[str] = None, bias_range: Tuple[int, int] = None, min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+    started = time.perf_counter()
+    if sources or bias_range or min_similarity:
+        filters = dict(
+            sources=sources or None,
+            bias_range=tuple(bias_range) if bias_range else None,
+            min_similarity=min_similarity or None
+        )
+        if NEWS_SEARCH_PASSAGES:
+            results = _search_passages(query_embedding, top_k, **filters)
+        else:
+            results = _search_index(query_embedding, top_k, columns=(), **filters)[0]
+    else:
+        results = _search_embedding(query_embedding, top_k)
+    _record_latency('vector', time.perf_counter() - started)
+    return results
+
+def hybrid_search(
+    query: str,
+    top_k: int = 10,
+    mode: str = None,
+    sources: List[str] = None,
+    bias_range: Tuple[int, int] = None,
+    min_similarity: float = 0.0,
+    fields: List[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    News search by embedding similarity, BM25 keyword match, or both.
+
+    - vector: cosine similarity (results carry 'similarity'). With
+      NEWS_SEARCH_PASSAGES articles are ranked by their best-matching passage,
+      which the snippet is then taken from
+    - lexical: BM25 over title and content via SQLite FTS5 (results carry
+      'bm25'); catches exact names and tickers and needs no embedding call
+    - hybrid: the top HYBRID_CANDIDATES of each, merged by reciprocal rank
+      fusion (results carry 'score', plus 'similarity' / 'bm25' where known)
+
+    If the query embedding fails or takes longer than EMBED_TIMEOUT, vector
+    and hybrid searches are answered lexically instead.
+
+    Args:
+        query (str): The search query string
+        top_k (int): Number of results
+        mode (str): 'vector', 'lexical' or 'hybrid' (default NEWS_SEARCH_MODE)
+        sources (List[str]): Filter by specific sources (optional)
+        bias_range (Tuple[int, int]): Filter by bias range (optional)
+        min_similarity (float): Minimum cosine similarity for vector matches
+        fields (List[str]): Result fields out of NEWS_FIELDS (default NEWS_SEARCH_FIELDS);
+            only their columns are read from the database
+
+    Returns:
+        Tuple of the results and {'mode': mode actually used, 'degraded': True if
+        it fell back to lexical, 'fields': the fields returned}
+    """
+    mode = mode or NEWS_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode} (expected one of {', '.join(SEARCH_MODES)})")
+    fields = check_fields(fields)
+
+    started = time.perf_counter()
+    degraded = False
+    query_embedding = None
+    if mode != 'lexical':
+        query_embedding = _query_embedding_within_deadline(query)
+        if query_embedding is None:
+            degraded = True
+            mode = 'lexical'
+            with _search_stats_lock:
+                search_stats['fallbacks'] += 1
+
+    if mode == 'vector':
+        results = _vector_results(query_embedding, top_k, sources, bias_range, min_similarity)
+    elif mode == 'lexical':
+        results = _lexical_results(query, top_k, sources, bias_range)
+    else:
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        vector_hits = _vector_results(query_embedding, candidates, sources, bias_range, min_similarity)
+        lexical_hits = _lexical_results(query, candidates, sources, bias_range)
+
+        fusion_started = time.perf_counter()
+        by_id = {}
+        for hit in lexical_hits + vector_hits:
+            merged = by_id.setdefault(hit['id'], dict(hit, similarity=None, bm25=None))
+            for key in ('similarity', 'bm25', 'passage_id'):
+                if hit.get(key) is not None:
+                    merged[key] = hit[key]
+        fused = reciprocal_rank_fusion([[hit['id'] for hit in vector_hits], [hit['id'] for hit in lexical_hits]])
+        results = [dict(by_id[record_id], score=score) for record_id, score in fused[:top_k]]
+        _record_latency('fusion', time.perf_counter() - fusion_started)
+
+    hydrate_started = time.perf_counter()
+    results = _fill(results, query, fields)
+    _record_latency('hydrate', time.perf_counter() - hydrate_started)
+
+    _record_latency(f'total_{mode}', time.perf_counter() - started)
+    return results, {'mode': mode, 'degraded': degraded, 'fields': fields}
 
 def batch_search(queries: List[str], top_k: int = 10) -> Dict[str, List[Dict[str, Any]]]:
     """
@@ -145,10 +579,12 @@ def batch_search(queries: List[str], top_k: int = 10) -> Dict[str, List[Dict[str
     Returns:
         Dict[str, List[Dict[str, Any]]]: Dictionary mapping each query to its results
     """
-    results = {}
-    for query in queries:
-        results[query] = search(query, top_k)
-    return results
+    if not queries:
+        return {}
+
+    # embed all queries in one request and score them in a single matrix product
+    query_embeddings = embed_texts(queries)
+    return dict(zip(queries, _search_index(query_embeddings, top_k)))
 
 def get_similar_articles(article_id: int, top_k: int = 10) -> List[Dict[str, Any]]:
     """
@@ -161,58 +597,13 @@ def get_similar_articles(article_id: int, top_k: int = 10) -> List[Dict[str, Any
     Returns:
         List[Dict[str, Any]]: List of similar articles
     """
-    # get the reference article's embedding
-    with get_connection() as conn:
-        cursor = conn.execute(f'''
-            SELECT embedding, content FROM {TABLE_NAME} WHERE id = ?
-        ''', (article_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            return []
-        
-        embedding_str, content = row
-        
-        try:
-            reference_embedding = json.loads(embedding_str)
-            reference_embedding = np.array(reference_embedding)
-        except (json.JSONDecodeError, ValueError):
-            return []
+    # get the reference article's embedding from the index
+    _refresh_index()
+    reference_embedding = vector_index.get_vector(article_id)
+    if reference_embedding is None:
+        return []
 
-    # get all other articles and calculate similarity
-    with get_connection() as conn:
-        cursor = conn.execute(f'''
-            SELECT id, title, url, content, embedding, source, bias 
-            FROM {TABLE_NAME} 
-            WHERE id != ? AND embedding IS NOT NULL AND embedding != ''
-        ''', (article_id,))
-        
-        results = []
-        for row in cursor:
-            id, title, url, content, embedding_str, source, bias = row
-            
-            try:
-                embedding = json.loads(embedding_str)
-                embedding = np.array(embedding)
-                
-                similarity = cosine_similarity(reference_embedding, embedding)
-                
-                results.append({
-                    'id': id,
-                    'title': title,
-                    'url': url,
-                    'content': content,
-                    'source': source,
-                    'bias': bias,
-                    'similarity': similarity
-                })
-                
-            except (json.JSONDecodeError, ValueError, TypeError):
-                continue
-
-    # sort by similarity and return top_k
-    results.sort(key=lambda x: x['similarity'], reverse=True)
-    return results[:top_k]
+    return _search_index(reference_embedding, top_k, exclude_ids=[article_id])[0]
 
 def search_by_content_length(min_length: int = 0, max_length: int = None, top_k: int = 10) -> List[Dict[str, Any]]:
     """
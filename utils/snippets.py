@@ -0,0 +1,97 @@
+import os
+import re
+from typing import List, Set, Tuple
+
+SNIPPET_CHARS = int(os.environ.get("SNIPPET_CHARS", 400))  # longest snippet returned
+
+ELLIPSIS = "…"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# a sentence runs to its terminal punctuation (and closing quotes) or a line break
+_SENTENCE = re.compile(r"[^.!?\n]*(?:[.!?]+[\"')\]]*|\n|$)")
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "when", "who", "with"
+))
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping, enough for "tariffs" to match "tariff"."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+def query_terms(query: str) -> Set[str]:
+    """Stemmed, lowercased query words without stopwords."""
+    return {_stem(token) for token in (token.lower() for token in _TOKEN.findall(query)) if token not in STOPWORDS}
+
+def _sentences(text: str) -> List[Tuple[int, int]]:
+    return [(match.start(), match.end()) for match in _SENTENCE.finditer(text) if match.group().strip()]
+
+def _matches(text: str, terms: Set[str]) -> Tuple[int, int]:
+    """(distinct query terms, total term hits) in a piece of text."""
+    hits = [stem for stem in (_stem(token.lower()) for token in _TOKEN.findall(text)) if stem in terms]
+    return len(set(hits)), len(hits)
+
+def make_snippet(text: str, terms: Set[str], max_chars: int = SNIPPET_CHARS, cut_before: bool = False, cut_after: bool = False) -> str:
+    """
+    Excerpt of at most max_chars (plus ellipses) around the best-matching sentence.
+
+    The sentence with the most distinct query terms is taken (the first one
+    if none match, i.e. the lead of the text), then neighbouring sentences
+    are added while they fit, those following it first. A single sentence
+    longer than the budget is cut at word boundaries around its first hit.
+
+    Args:
+        text: Article or passage text
+        terms: query_terms() of the query
+        max_chars: Snippet budget in characters
+        cut_before: The text is itself an excerpt (a passage) starting inside its article
+        cut_after: The text is an excerpt ending inside its article
+
+    Returns:
+        The snippet, with an ellipsis wherever text was cut off, at either end
+    """
+    text = text or ""
+    if len(text.strip()) <= max_chars:
+        return _ellipsize(text.strip(), cut_before, cut_after)
+
+    sentences = _sentences(text)
+    if not sentences:
+        return ""
+    scores = [_matches(text[start:end], terms) if terms else (0, 0) for start, end in sentences]
+    best = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+
+    start, end = sentences[best]
+    if end - start > max_chars:
+        # center the budget on the first query term in the sentence
+        focus = start
+        for match in _TOKEN.finditer(text, start, end):
+            if _stem(match.group().lower()) in terms:
+                focus = match.start()
+                break
+        start = max(start, min(focus - max_chars // 3, end - max_chars))
+        end = start + max_chars
+        if start > sentences[best][0]:
+            space = text.find(" ", start, end)
+            start = space + 1 if space != -1 else start
+        if end < sentences[best][1]:
+            space = text.rfind(" ", start, end)
+            end = space if space > start else end
+    else:
+        after, before = best + 1, best - 1
+        while True:
+            if after < len(sentences) and sentences[after][1] - start <= max_chars:
+                end = sentences[after][1]
+                after += 1
+            elif before >= 0 and end - sentences[before][0] <= max_chars:
+                start = sentences[before][0]
+                before -= 1
+            else:
+                break
+
+    return _ellipsize(text[start:end].strip(), cut_before or bool(text[:start].strip()), cut_after or bool(text[end:].strip()))
+
+def _ellipsize(snippet: str, cut_before: bool, cut_after: bool) -> str:
+    if not snippet:
+        return snippet
+    return (ELLIPSIS if cut_before else "") + snippet + (ELLIPSIS if cut_after else "")
@@ -0,0 +1,41 @@
+import hashlib
+from typing import Iterable
+
+import numpy as np
+
+def url_hash(url: str) -> int:
+    """64-bit hash of a URL (blake2b), stable across processes and machines."""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class UrlHashSet:
+    """
+    Compact set of known URLs, stored as a sorted array of 64-bit hashes.
+
+    At 8 bytes per URL it is cheap to ship to the scanners, and with 64-bit
+    hashes a false positive is vanishingly unlikely (about n / 2**64), so a hit
+    can be treated as "already in the database" without asking the server.
+    """
+
+    def __init__(self, hashes: np.ndarray = None):
+        if hashes is None:
+            hashes = np.zeros(0, dtype='<u8')
+        self.hashes = np.unique(np.asarray(hashes, dtype='<u8'))
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str]) -> 'UrlHashSet':
+        return cls(np.fromiter((url_hash(url) for url in urls), dtype='<u8'))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'UrlHashSet':
+        return cls(np.frombuffer(data, dtype='<u8'))
+
+    def to_bytes(self) -> bytes:
+        return self.hashes.tobytes()
+
+    def __contains__(self, url: str) -> bool:
+        value = np.uint64(url_hash(url))
+        position = np.searchsorted(self.hashes, value)
+        return bool(position < len(self.hashes) and self.hashes[position] == value)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
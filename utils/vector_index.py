@@ -0,0 +1,704 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Tuple, Optional, Iterable
+
+import numpy as np
+
+from utils.db import get_connection, latest_change_seq, TABLE_NAME, CHANGES_TABLE, PASSAGES_TABLE
+from utils.write_queue import add_commit_listener
+from utils.embedding_codec import load_embedding_dtype, row_embedding
+from utils.ann import IVFIndex, train_centroids, default_nlist, ANN_INDEX, ANN_NLIST, ANN_NPROBE, ANN_MIN_SIZE, ANN_INDEX_FILE
+from utils.quantization import (
+    INDEX_QUANTIZATION, QUANT_RERANK, check_mode, code_shape, quantize_int8, dequantize_int8,
+    quantize_binary, unpack_binary, score_codes
+)
+from utils.index_snapshot import INDEX_SNAPSHOT_DIR, INDEX_SNAPSHOT_EVERY, current_version, read_snapshot, write_snapshot
+
+ANN_SAVE_EVERY = 1000
+ANN_RETRAIN_FACTOR = 4
+# rows decoded at a time when (re)building the ann index, and loaded per add() on refresh
+BUILD_CHUNK = 65536
+REFRESH_BATCH = 10000
+# ids per IN (...) query when fetching full-precision vectors for re-scoring
+RESCORE_FETCH_CHUNK = 500
+# seconds between checks for a snapshot published by another process
+SNAPSHOT_CHECK_INTERVAL = 30.0
+# seconds between change log polls by the background watcher (writes in this process wake it at once)
+INDEX_POLL_INTERVAL = float(os.environ.get("INDEX_POLL_INTERVAL", 2.0))
+
+# bias code for rows whose bias is missing or not a number
+BIAS_UNKNOWN = -128
+# below this fraction of eligible rows a filtered query scores only those rows
+FILTER_GATHER_FRACTION = 0.5
+
+def parse_bias(value) -> int:
+    """Bias column (stored as TEXT) to a small int code."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return BIAS_UNKNOWN
+
+class VectorIndex:
+    """
+    In-process index of article embeddings.
+
+    All embeddings are kept L2-normalized in a single contiguous float32 matrix,
+    with a parallel array of record ids, so a query is one matrix-vector product
+    plus an argpartition top-k instead of a JSON decode per row. Source and bias
+    are kept alongside as integer-coded arrays so filters become boolean masks
+    applied before scoring.
+
+    With ANN_INDEX=ivf, once the index holds ANN_MIN_SIZE rows an IVF index
+    (utils.ann) is built over the matrix in the background, persisted to
+    ANN_INDEX_FILE and used for queries; new rows are added to it incrementally
+    and it is retrained after the index has grown ANN_RETRAIN_FACTOR-fold.
+
+    With INDEX_QUANTIZATION=int8 (4x smaller) or binary (32x smaller) the matrix
+    holds compact codes instead of float32 (utils.quantization). Queries then
+    shortlist `rerank` candidates on the codes and re-score them against the
+    full-precision embeddings read back from SQLite, so returned similarities
+    are exact.
+
+    The arrays are periodically written to a versioned snapshot under
+    INDEX_SNAPSHOT_DIR (utils.index_snapshot). A starting process maps the
+    newest snapshot instead of decoding every row from SQLite, then catches up
+    on rows newer than its manifest; several workers mapping the same version
+    share one copy of the matrix through the page cache.
+
+    refresh() follows the database's change log (utils.db): it returns at once
+    when nothing was written since the last seq it saw, and otherwise appends
+    only the new rows and drops rows that were deleted or overwritten.
+    start_watcher() keeps the index current in the background so new articles
+    are searchable within INDEX_POLL_INTERVAL seconds, or immediately when they
+    are written by this process's write queue.
+    """
+
+    # rows after a given id, as (id, embedding_blob, embedding, source, bias)
+    ROWS_SQL = f'''
+        SELECT id, embedding_blob, embedding, source, bias FROM {TABLE_NAME}
+        WHERE id > ?
+        AND (embedding_blob IS NOT NULL OR (embedding IS NOT NULL AND embedding != ''))
+        ORDER BY id
+    '''
+    # (id, embedding_blob, embedding) for the ids filling {placeholders}
+    VECTORS_SQL = f'SELECT id, embedding_blob, embedding FROM {TABLE_NAME} WHERE id IN ({{placeholders}})'
+    # change log op recording that one of this index's rows was deleted
+    TOMBSTONE_OP = 'delete'
+
+    def __init__(
+        self,
+        initial_capacity: int = 1024,
+        ann_mode: str = ANN_INDEX,
+        ann_file: str = ANN_INDEX_FILE,
+        quantization: str = INDEX_QUANTIZATION,
+        rerank: int = QUANT_RERANK,
+        snapshot_dir: Optional[str] = INDEX_SNAPSHOT_DIR
+    ):
+        self.dim = None
+        self.size = 0
+        self.last_id = 0
+        self.last_seq = 0  # change log position the index reflects
+        # bumped whenever rows are added or removed, so result caches know when to drop
+        self.version = 0
+        self._capacity = initial_capacity
+        self.quantization = check_mode(quantization)
+        self.rerank = rerank
+        self._matrix = None
+        self._scales = np.zeros(initial_capacity, dtype=np.float32)  # per-row int8 scales
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._alive = np.zeros(initial_capacity, dtype=bool)
+        self._source_codes = np.zeros(initial_capacity, dtype=np.int32)
+        self._bias = np.zeros(initial_capacity, dtype=np.int8)
+        self._source_vocab = {}  # source name -> code
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        self.ann_mode = ann_mode
+        self.ann_file = ann_file
+        self.ann: Optional[IVFIndex] = None
+        self._ann_trained_size = 0
+        self._ann_unsaved = 0
+        self._ann_loaded = False
+        self._ann_building = False
+
+        self.snapshot_dir = snapshot_dir
+        self._snapshot_version = None
+        self._snapshot_checked_at = 0.0
+        self._snapshot_unsaved = 0
+        self._snapshot_saving = False
+
+        self._watcher = None
+        self._changed = threading.Event()
+
+    def _grow(self, needed: int):
+        """Grow the backing arrays (amortized doubling) to hold `needed` rows."""
+        if needed <= self._capacity and self._matrix is not None:
+            return
+
+        capacity = max(self._capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        width, dtype = code_shape(self.quantization, self.dim)
+        matrix = np.zeros((capacity, width), dtype=dtype)
+        scales = np.zeros(capacity, dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        alive = np.zeros(capacity, dtype=bool)
+        source_codes = np.zeros(capacity, dtype=np.int32)
+        bias = np.zeros(capacity, dtype=np.int8)
+        if self._matrix is not None:
+            matrix[:self.size] = self._matrix[:self.size]
+        scales[:self.size] = self._scales[:self.size]
+        ids[:self.size] = self._ids[:self.size]
+        alive[:self.size] = self._alive[:self.size]
+        source_codes[:self.size] = self._source_codes[:self.size]
+        bias[:self.size] = self._bias[:self.size]
+
+        self._matrix, self._scales, self._ids, self._alive = matrix, scales, ids, alive
+        self._source_codes, self._bias = source_codes, bias
+        self._capacity = capacity
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray, sources: Optional[List[str]] = None, biases: Optional[List] = None):
+        """
+        Append vectors to the index.
+
+        Args:
+            ids: Record ids, ascending and greater than any id already indexed
+            vectors: 2D array of shape (len(ids), dim)
+            sources: Source name per row (optional)
+            biases: Bias value per row, as stored in the database (optional)
+        """
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if len(ids) == 0:
+            return
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            self._grow(self.size + len(ids))
+            end = self.size + len(ids)
+            if self.quantization == 'int8':
+                self._matrix[self.size:end], self._scales[self.size:end] = quantize_int8(vectors)
+            elif self.quantization == 'binary':
+                self._matrix[self.size:end] = quantize_binary(vectors)
+            else:
+                self._matrix[self.size:end] = vectors
+            self._ids[self.size:end] = ids
+            self._alive[self.size:end] = True
+            self._source_codes[self.size:end] = [self._source_code(source) for source in sources] if sources else -1
+            self._bias[self.size:end] = [parse_bias(value) for value in biases] if biases else BIAS_UNKNOWN
+            if self.ann is not None:
+                self.ann.add(np.arange(self.size, end), vectors)
+                self._ann_unsaved += len(ids)
+            self.size = end
+            self.last_id = max(self.last_id, int(ids[-1]))
+            self.version += 1
+            self._snapshot_unsaved += len(ids)
+
+    def _decode(self, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Stored rows back to (approximate) float32 vectors."""
+        if self.quantization == 'int8':
+            return dequantize_int8(codes, scales)
+        if self.quantization == 'binary':
+            return unpack_binary(codes, self.dim)
+        return codes
+
+    def _source_code(self, source: Optional[str]) -> int:
+        if source is None:
+            return -1
+        if source not in self._source_vocab:
+            self._source_vocab[source] = len(self._source_vocab)
+        return self._source_vocab[source]
+
+    def _filter_mask(self, size: int, sources: Optional[Iterable[str]], bias_range: Optional[Tuple[int, int]]) -> Optional[np.ndarray]:
+        """Boolean mask of rows matching the filters, or None when there are none. Call with the lock held."""
+        mask = None
+        if sources is not None:
+            codes = [self._source_vocab[source] for source in sources if source in self._source_vocab]
+            mask = np.isin(self._source_codes[:size], codes)
+        if bias_range is not None:
+            bias = self._bias[:size]
+            in_range = (bias != BIAS_UNKNOWN) & (bias >= bias_range[0]) & (bias <= bias_range[1])
+            mask = in_range if mask is None else mask & in_range
+        return mask
+
+    def remove(self, ids: Iterable[int]):
+        """Mark records as deleted so they are never returned again."""
+        with self._lock:
+            positions = self._positions_in(self._ids[:self.size], ids)
+            if len(positions):
+                self._alive[positions] = False
+                self.version += 1
+
+    def get_vector(self, record_id: int) -> Optional[np.ndarray]:
+        """Return the normalized vector for a record id, or None if it is not indexed."""
+        with self._lock:
+            positions = self._positions_in(self._ids[:self.size], [record_id])
+            if len(positions) == 0 or not self._alive[positions[0]]:
+                return None
+            if self.quantization == 'none':
+                return self._matrix[positions[0]].copy()
+        return self._exact_vectors([record_id]).get(record_id)
+
+    def _exact_vectors(self, record_ids: Iterable[int]) -> Dict[int, np.ndarray]:
+        """Full-precision normalized embeddings from the database, by record id."""
+        record_ids = [int(record_id) for record_id in record_ids]
+        vectors = {}
+        with get_connection() as conn:
+            dtype = load_embedding_dtype(conn)
+            for start in range(0, len(record_ids), RESCORE_FETCH_CHUNK):
+                chunk = record_ids[start:start + RESCORE_FETCH_CHUNK]
+                cursor = conn.execute(self.VECTORS_SQL.format(placeholders=",".join("?" * len(chunk))), chunk)
+                for row_id, embedding_blob, embedding_str in cursor:
+                    vector = row_embedding(embedding_blob, embedding_str, dtype)
+                    if vector is None or vector.ndim != 1 or len(vector) != self.dim:
+                        continue
+                    vector = vector.astype(np.float32)
+                    norm = np.linalg.norm(vector)
+                    vectors[row_id] = vector / norm if norm else vector
+        return vectors
+
+    def refresh(self) -> int:
+        """
+        Apply writes made since the last refresh: add new rows, drop deleted ones.
+
+        Returns:
+            int: Number of rows added to the index
+        """
+        with self._refresh_lock:
+            self._check_snapshot()
+            with get_connection() as conn:
+                seq = latest_change_seq(conn)
+                if seq == self.last_seq and self.size:
+                    return 0
+
+                # tombstones, including the old row of every INSERT OR REPLACE
+                deleted = [row[0] for row in conn.execute(
+                    f"SELECT record_id FROM {CHANGES_TABLE} WHERE seq > ? AND seq <= ? AND op = ?",
+                    (self.last_seq, seq, self.TOMBSTONE_OP)
+                )]
+                if deleted:
+                    self.remove(deleted)
+
+                dtype = load_embedding_dtype(conn)
+                cursor = conn.execute(self.ROWS_SQL, (self.last_id,))
+
+                new_ids = []
+                vectors = []
+                sources = []
+                biases = []
+                max_seen = self.last_id
+                added = 0
+                for row_id, embedding_blob, embedding_str, source, bias in cursor:
+                    max_seen = max(max_seen, row_id)
+                    vector = row_embedding(embedding_blob, embedding_str, dtype)
+                    if vector is None:
+                        continue
+
+                    # skip malformed rows rather than poisoning the matrix
+                    dim = self.dim or (len(vectors[0]) if vectors else len(vector))
+                    if vector.ndim != 1 or len(vector) != dim:
+                        continue
+
+                    new_ids.append(row_id)
+                    vectors.append(vector)
+                    sources.append(source)
+                    biases.append(bias)
+
+                    # add in batches so a cold start never holds the whole corpus as float32
+                    if len(vectors) >= REFRESH_BATCH:
+                        self.add(new_ids, np.vstack(vectors), sources, biases)
+                        added += len(new_ids)
+                        new_ids, vectors, sources, biases = [], [], [], []
+
+            if vectors:
+                self.add(new_ids, np.vstack(vectors), sources, biases)
+                added += len(new_ids)
+            self.last_id = max(self.last_id, max_seen)
+            self.last_seq = max(self.last_seq, seq)
+            self._maintain_ann()
+            self._maintain_snapshot()
+            return added
+
+    def start_watcher(self, interval: float = INDEX_POLL_INTERVAL, listen: bool = True):
+        """
+        Refresh on a background thread: every `interval` seconds (0 = never
+        poll), and right after each write batch this process commits.
+
+        Args:
+            interval: Change log poll interval, for writes made by other processes
+            listen: Also wake up on this process's write queue commits
+        """
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        if listen:
+            add_commit_listener(self.notify)
+        self._watcher.start()
+
+    def notify(self, rows: int = None):
+        """Wake the watcher: something was written."""
+        self._changed.set()
+
+    def _watch(self, interval: float):
+        while True:
+            self._changed.wait(interval if interval > 0 else None)
+            self._changed.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing vector index: {e}")
+
+    def _check_snapshot(self):
+        """Map a snapshot published since we last looked (always on the first refresh)."""
+        if not self.snapshot_dir or self._ann_building:
+            return
+        now = time.time()
+        if self.size and now - self._snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return
+        self._snapshot_checked_at = now
+        version = current_version(self.snapshot_dir)
+        if version is not None and version != self._snapshot_version:
+            self.load_snapshot()
+
+    def _maintain_snapshot(self):
+        """Write a new snapshot in the background once enough rows have been added."""
+        if not self.snapshot_dir or self._snapshot_saving or self._snapshot_unsaved < INDEX_SNAPSHOT_EVERY:
+            return
+        self._snapshot_saving = True
+        threading.Thread(target=self.save_snapshot, daemon=True).start()
+
+    def save_snapshot(self) -> Optional[int]:
+        """Write the current rows as a new snapshot version. Returns the version, or None if nothing was written."""
+        self._snapshot_saving = True
+        try:
+            # rows below size never change, so only the alive flags need copying under the lock
+            with self._lock:
+                size = self.size
+                if size == 0 or not self.snapshot_dir:
+                    return None
+                arrays = {
+                    'matrix': self._matrix[:size],
+                    'scales': self._scales[:size],
+                    'ids': self._ids[:size],
+                    'alive': self._alive[:size].copy(),
+                    'source_codes': self._source_codes[:size],
+                    'bias': self._bias[:size]
+                }
+                manifest = {
+                    'last_id': self.last_id,
+                    'last_seq': self.last_seq,
+                    'dim': self.dim,
+                    'quantization': self.quantization,
+                    'sources': sorted(self._source_vocab, key=self._source_vocab.get)
+                }
+                unsaved = self._snapshot_unsaved
+
+            started = time.perf_counter()
+            try:
+                version = write_snapshot(self.snapshot_dir, arrays, manifest)
+            except OSError as e:
+                print(f"Error writing index snapshot to {self.snapshot_dir}: {e}")
+                return None
+            with self._lock:
+                self._snapshot_unsaved -= unsaved
+            if version is not None:
+                print(f"Wrote index snapshot v{version} ({size} vectors) in {time.perf_counter() - started:.1f}s")
+            return version
+        finally:
+            self._snapshot_saving = False
+
+    def load_snapshot(self) -> bool:
+        """
+        Switch to the published snapshot, if it is compatible and not behind us.
+
+        Rows newer than the snapshot's last_id are picked up by the next refresh.
+        """
+        loaded = read_snapshot(self.snapshot_dir)
+        if loaded is None:
+            return False
+        arrays, manifest = loaded
+        if manifest['quantization'] != self.quantization or (self.dim is not None and manifest['dim'] != self.dim):
+            print(f"Not loading index snapshot v{manifest['version']}: built for {manifest['quantization']} / dim {manifest['dim']}")
+            self._snapshot_version = manifest['version']
+            return False
+        if manifest['last_id'] < self.last_id:
+            return False
+
+        size = manifest['size']
+        with self._lock:
+            # posting lists stay valid if the snapshot extends our rows in the same order
+            if self.ann is not None and size >= self.size and np.array_equal(arrays['ids'][:self.size], self._ids[:self.size]):
+                self.ann.add(np.arange(self.size, size), self._decode(arrays['matrix'][self.size:size], arrays['scales'][self.size:size]))
+            else:
+                self.ann = None
+                self._ann_loaded = False
+
+            self.dim = manifest['dim']
+            self._matrix, self._scales, self._ids = arrays['matrix'], arrays['scales'], arrays['ids']
+            self._alive, self._source_codes, self._bias = arrays['alive'], arrays['source_codes'], arrays['bias']
+            self._capacity = manifest['capacity']
+            self._source_vocab = {source: code for code, source in enumerate(manifest['sources'])}
+            self.size = size
+            self.last_id = manifest['last_id']
+            self.last_seq = manifest.get('last_seq', 0)
+            self.version += 1
+            self._snapshot_version = manifest['version']
+            self._snapshot_unsaved = 0
+        print(f"Mapped index snapshot v{manifest['version']} ({size} vectors, up to id {manifest['last_id']})")
+        return True
+
+    def _maintain_ann(self):
+        """Load, build, retrain or save the ANN index as the data grows."""
+        if self.ann_mode != 'ivf' or self._ann_building or self.size < ANN_MIN_SIZE:
+            return
+
+        if self.ann is None and not self._ann_loaded:
+            self._ann_loaded = True
+            if self.load_ann():
+                return
+
+        if self.ann is None or self.size >= ANN_RETRAIN_FACTOR * self._ann_trained_size:
+            self._ann_building = True
+            threading.Thread(target=self.build_ann, daemon=True).start()
+        elif self._ann_unsaved >= ANN_SAVE_EVERY:
+            self.save_ann()
+
+    def build_ann(self, nlist: int = None, nprobe: int = ANN_NPROBE):
+        """Train an IVF index on the current rows and start using it. Blocking; refresh runs it on a thread."""
+        self._ann_building = True
+        try:
+            started = time.perf_counter()
+            with self._lock:
+                size = self.size
+                codes, scales = self._matrix[:size], self._scales[:size]
+            nlist = min(nlist or ANN_NLIST or default_nlist(size), size)
+
+            # train on a decoded sample, then assign every row a chunk at a time
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(size, min(size, nlist * 64), replace=False))
+            ann = IVFIndex(train_centroids(self._decode(codes[sample], scales[sample]), nlist), nprobe)
+            for start in range(0, size, BUILD_CHUNK):
+                end = min(start + BUILD_CHUNK, size)
+                ann.add(np.arange(start, end), self._decode(codes[start:end], scales[start:end]))
+
+            # catch up on rows added while training, then swap it in
+            with self._lock:
+                if self.size > size:
+                    ann.add(np.arange(size, self.size), self._decode(self._matrix[size:self.size], self._scales[size:self.size]))
+                self.ann = ann
+                self._ann_trained_size = self.size
+            print(f"Built IVF index over {ann.size} vectors ({ann.nlist} lists) in {time.perf_counter() - started:.1f}s")
+            self.save_ann()
+        finally:
+            self._ann_building = False
+
+    def save_ann(self):
+        if self.ann is None or not self.ann_file:
+            return
+        with self._lock:
+            ids = self._ids[:self.size].copy()
+            self._ann_unsaved = 0
+        try:
+            self.ann.save(self.ann_file, ids)
+        except OSError as e:
+            print(f"Error saving ANN index to {self.ann_file}: {e}")
+
+    def load_ann(self) -> bool:
+        """Pick up a saved IVF index, indexing rows it does not know about yet."""
+        if not self.ann_file:
+            return False
+        with self._lock:
+            loaded = IVFIndex.load(self.ann_file, self._ids[:self.size], self.dim)
+            if loaded is None:
+                return False
+            ann, covered = loaded
+            missing = np.flatnonzero(~covered & self._alive[:self.size])
+            ann.add(missing, self._decode(self._matrix[missing], self._scales[missing]))
+            self.ann = ann
+            # treat it as freshly trained on what it held when saved
+            self._ann_trained_size = max(self.size - len(missing), 1)
+            self._ann_unsaved = len(missing)
+        print(f"Loaded IVF index from {self.ann_file} ({ann.size} vectors, {len(missing)} added since save)")
+        return True
+
+    def search_vectors(
+        self,
+        queries: np.ndarray,
+        top_k: int = 10,
+        exclude_ids: Optional[Iterable[int]] = None,
+        nprobe: Optional[int] = None,
+        sources: Optional[Iterable[str]] = None,
+        bias_range: Optional[Tuple[int, int]] = None,
+        min_similarity: Optional[float] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Find the nearest records for one or more query vectors.
+
+        Filters are applied as masks before scoring, so filtered results are
+        exact (the ANN index is bypassed) and selective filters only score the
+        eligible rows. With a quantized matrix, the best `rerank` candidates by
+        code similarity are re-scored at full precision before taking the top_k.
+
+        Args:
+            queries: 1D query vector or 2D array of query vectors
+            top_k: Number of results per query
+            exclude_ids: Record ids that must not be returned
+            nprobe: IVF lists to scan when the ANN index is active (None for its
+                default, 0 for an exact scan)
+            sources: Only return records from these sources
+            bias_range: Only return records with min <= bias <= max
+            min_similarity: Drop results scoring below this
+
+        Returns:
+            List[List[Tuple[int, float]]]: (record id, cosine similarity) per query, best first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        with self._lock:
+            size = self.size
+            if size == 0 or top_k <= 0:
+                return [[] for _ in range(len(queries))]
+            if queries.shape[1] != self.dim:
+                raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+            codes, scales = self._matrix[:size], self._scales[:size]
+            ids = self._ids[:size]
+            alive = self._alive[:size].copy()
+            mask = self._filter_mask(size, sources, bias_range)
+            ann = self.ann if nprobe != 0 and mask is None else None
+
+        if exclude_ids is not None:
+            alive[self._positions_in(ids, exclude_ids)] = False
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+
+        def score(positions, queries):
+            if positions is None:
+                return score_codes(self.quantization, codes, scales, queries, self.dim)
+            return score_codes(self.quantization, codes[positions], scales[positions], queries, self.dim)
+
+        rescore = self.quantization != 'none' and self.rerank > 0
+        shortlist = max(top_k, self.rerank) if rescore else top_k
+        if ann is not None:
+            hits = ann.search(score, alive, queries, shortlist, nprobe)
+        else:
+            if mask is not None:
+                alive &= mask
+            hits = self._exact_search(score, alive, queries, shortlist)
+        if rescore:
+            hits = self._rescore(ids, hits, queries, top_k)
+
+        return [
+            [
+                (int(ids[position]), float(score))
+                for position, score in zip(positions, scores)
+                if min_similarity is None or score >= min_similarity
+            ]
+            for positions, scores in hits
+        ]
+
+    @staticmethod
+    def _exact_search(score: Callable, alive: np.ndarray, queries: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Score every eligible row (score(positions or None for all, queries)); (positions, scores) per query, best first."""
+        eligible = np.flatnonzero(alive)
+        if len(eligible) == 0:
+            return [(eligible, np.empty(0, dtype=np.float32)) for _ in range(len(queries))]
+
+        if len(eligible) < FILTER_GATHER_FRACTION * len(alive):
+            # selective filter: only touch the rows that can be returned
+            scores = score(eligible, queries)
+            positions = eligible
+        else:
+            scores = score(None, queries)  # (num_queries, size)
+            scores[:, ~alive] = -np.inf
+            positions = np.arange(len(alive))
+
+        k = min(top_k, len(eligible))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row[candidates])]
+            results.append((positions[candidates], row[candidates]))
+        return results
+
+    def _rescore(self, ids: np.ndarray, hits: List[Tuple[np.ndarray, np.ndarray]], queries: np.ndarray, top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Re-rank shortlisted positions by exact cosine against the stored float embeddings."""
+        shortlisted = np.unique(np.concatenate([positions for positions, _ in hits]))
+        exact = self._exact_vectors(ids[shortlisted])
+
+        results = []
+        for query, (positions, _) in zip(queries, hits):
+            # rows missing from the database were deleted; the caller drops them from the index
+            positions = np.array([position for position in positions if int(ids[position]) in exact], dtype=np.int64)
+            if len(positions) == 0:
+                results.append((positions, np.empty(0, dtype=np.float32)))
+                continue
+            scores = np.vstack([exact[int(ids[position])] for position in positions]) @ query
+            best = np.argsort(-scores)[:top_k]
+            results.append((positions[best], scores[best]))
+        return results
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the matrix and per-row arrays for the rows in use."""
+        with self._lock:
+            if self._matrix is None:
+                return 0
+            per_row = self._matrix[0].nbytes + self._ids.itemsize + self._alive.itemsize + self._source_codes.itemsize + self._bias.itemsize
+            if self.quantization == 'int8':
+                per_row += self._scales.itemsize
+            return self.size * per_row
+
+    @staticmethod
+    def _positions_in(ids: np.ndarray, targets: Iterable[int]) -> np.ndarray:
+        """Map record ids to row positions (ids are stored in ascending order)."""
+        targets = np.asarray(list(targets), dtype=np.int64)
+        positions = np.searchsorted(ids, targets)
+        positions = positions[positions < len(ids)]
+        return positions[np.isin(ids[positions], targets)]
+
+    def search(self, query: np.ndarray, top_k: int = 10, exclude_ids: Optional[Iterable[int]] = None, nprobe: Optional[int] = None, **filters) -> List[Tuple[int, float]]:
+        """Find the nearest records for a single query vector (filters as in search_vectors)."""
+        return self.search_vectors(query, top_k, exclude_ids, nprobe, **filters)[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._alive[:self.size].sum())
+
+class PassageIndex(VectorIndex):
+    """
+    The same index over article passages (utils.passages) instead of whole
+    articles: ids are passage ids, and each passage carries its article's
+    source and bias so filters work unchanged. A passage without an embedding
+    of its own is a whole short article and uses the article's.
+    """
+
+    ROWS_SQL = f'''
+        SELECT p.id, COALESCE(p.embedding_blob, r.embedding_blob),
+               CASE WHEN p.embedding_blob IS NULL THEN r.embedding END, r.source, r.bias
+        FROM {PASSAGES_TABLE} p JOIN {TABLE_NAME} r ON r.id = p.record_id
+        WHERE p.id > ?
+        AND (p.embedding_blob IS NOT NULL OR r.embedding_blob IS NOT NULL OR (r.embedding IS NOT NULL AND r.embedding != ''))
+        ORDER BY p.id
+    '''
+    VECTORS_SQL = f'''
+        SELECT p.id, COALESCE(p.embedding_blob, r.embedding_blob), CASE WHEN p.embedding_blob IS NULL THEN r.embedding END
+        FROM {PASSAGES_TABLE} p JOIN {TABLE_NAME} r ON r.id = p.record_id
+        WHERE p.id IN ({{placeholders}})
+    '''
+    TOMBSTONE_OP = 'passage_delete'
+
+vector_index = VectorIndex()
+passage_index = PassageIndex(
+    ann_file=f"{os.path.splitext(ANN_INDEX_FILE)[0]}_passages.npz" if ANN_INDEX_FILE else ANN_INDEX_FILE,
+    snapshot_dir=os.path.join(INDEX_SNAPSHOT_DIR, 'passages') if INDEX_SNAPSHOT_DIR else INDEX_SNAPSHOT_DIR
+)
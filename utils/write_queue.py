@@ -1,16 +1,28 @@
+import os
 import queue
 import threading
 import time
 import sqlite3
-import json
-from typing import Dict, Any, Callable
+from typing import Dict, Any, Callable, List, Tuple
 import logging
 
+from .embedding_codec import encode_embedding, load_embedding_dtype
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-DB_FILE = 'data.db'
+DB_FILE = os.environ.get('DB_FILE', 'data.db')
 TABLE_NAME = 'records'
+PASSAGES_TABLE = 'record_passages'
+
+INSERT_RECORD_SQL = f'''
+    INSERT OR REPLACE INTO {TABLE_NAME} (title, url, content, embedding_blob, source, bias)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+INSERT_PASSAGE_SQL = f'''
+    INSERT INTO {PASSAGES_TABLE} (record_id, char_start, char_end, embedding_blob)
+    VALUES (?, ?, ?, ?)
+'''
 
 class WriteTask:
     """Represents a database write task."""
@@ -42,19 +54,47 @@ class WriteTask:
         return self.completed.wait(timeout)
 
 class DatabaseWriteQueue:
-    """Queue manager for database write operations."""
+    """
+    Queue manager for database write operations.
+
+    A single worker thread owns one long-lived WAL-mode connection and group
+    commits: it drains up to `batch_size` tasks (or whatever arrives within
+    `flush_interval_ms` of the first one) and writes them in one transaction.
+    """
     
-    def __init__(self):
+    def __init__(self, batch_size: int = None, flush_interval_ms: float = None):
         self.write_queue = queue.Queue()
         self.worker_thread = None
         self.running = False
+        self.batch_size = batch_size or int(os.environ.get('WRITE_BATCH_SIZE', 64))
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.environ.get('WRITE_FLUSH_INTERVAL_MS', 20))
+        self.flush_interval = flush_interval_ms / 1000
         self.stats = {
             'total_writes': 0,
             'successful_writes': 0,
             'failed_writes': 0,
-            'queue_size': 0
+            'queue_size': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_batch_rows': 0,
+            'total_commit_ms': 0.0
         }
         self._lock = threading.Lock()
+        self._commit_listeners: List[Callable[[int], None]] = []
+
+    def add_commit_listener(self, listener: Callable[[int], None]):
+        """
+        Call listener(rows) from the writer thread after every committed batch.
+
+        Listeners must return quickly (e.g. just set an event); readers use this
+        to pick up new rows without waiting for their next poll.
+        """
+        with self._lock:
+            self._commit_listeners.append(listener)
     
     def start(self):
         """Start the write worker thread."""
@@ -80,76 +120,214 @@ class DatabaseWriteQueue:
         
         logger.info("Database write queue stopped")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open the worker's long-lived connection."""
+        conn = sqlite3.connect(DB_FILE, timeout=30.0)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.OperationalError:
+            # the switch fails while init_db is migrating a new file; init_db sets it too
+            pass
+        # so rows removed by INSERT OR REPLACE fire the change log's delete trigger
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
+    
     def _worker(self):
-        """Worker thread that processes write operations."""
+        """Worker thread that processes write operations in batches."""
         logger.info("Database write worker started")
         
-        while self.running:
-            try:
-                task = self.write_queue.get(timeout=1.0)
+        conn = self._connect()
+        dtype = load_embedding_dtype(conn)
+        
+        try:
+            while self.running:
+                try:
+                    task = self.write_queue.get(timeout=1.0)
+                except queue.Empty:
+                    continue
                 
                 if task is None:
+                    self.write_queue.task_done()
                     break
                 
-                self._process_task(task)
-                self.write_queue.task_done()
+                batch = [task]
+                stop = self._drain(batch)
+                
+                try:
+                    self._process_batch(conn, dtype, batch)
+                except Exception as e:
+                    logger.error(f"Unexpected error in write worker: {e}")
+                finally:
+                    for _ in batch:
+                        self.write_queue.task_done()
                 
                 with self._lock:
                     self.stats['queue_size'] = self.write_queue.qsize()
                 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"Unexpected error in write worker: {e}")
+                if stop:
+                    break
+        finally:
+            conn.close()
         
         logger.info("Database write worker stopped")
     
-    def _process_task(self, task: WriteTask):
-        """Process a single write task."""
-        try:
-            with self._lock:
-                self.stats['total_writes'] += 1
-            
-            if task.operation == 'write_record':
-                self._write_record_direct(task.data)
-                task.set_result({"message": "Record written successfully"})
-                
-                with self._lock:
-                    self.stats['successful_writes'] += 1
+    def _drain(self, batch: List[WriteTask]) -> bool:
+        """
+        Pull more queued tasks into `batch`, up to batch_size or the flush interval.
+        
+        Returns:
+            bool: True if the stop sentinel was dequeued
+        """
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    task = self.write_queue.get(timeout=remaining)
+                else:
+                    task = self.write_queue.get_nowait()
+            except queue.Empty:
+                break
             
-            else:
-                raise ValueError(f"Unknown operation: {task.operation}")
+            if task is None:
+                self.write_queue.task_done()
+                return True
+            batch.append(task)
+        return False
+    
+    def _process_batch(self, conn: sqlite3.Connection, dtype: str, batch: List[WriteTask]):
+        """Write a batch of tasks in a single transaction and resolve each task."""
+        with self._lock:
+            self.stats['total_writes'] += len(batch)
         
+        pending = []
+        rows = []
+        passages = []
+        for task in batch:
+            try:
+                if task.operation != 'write_record':
+                    raise ValueError(f"Unknown operation: {task.operation}")
+                row = self._record_row(task.data, dtype)
+                passages.append(self._passage_rows(task.data, dtype))
+                rows.append(row)
+                pending.append(task)
+            except Exception as e:
+                self._fail(task, e)
+        
+        if not rows:
+            return
+        
+        start = time.perf_counter()
+        errors = {}
+        try:
+            try:
+                conn.executemany(INSERT_RECORD_SQL, rows)
+                self._insert_passages(conn, rows, passages)
+            except sqlite3.Error:
+                # isolate the bad row(s): redo the batch one row at a time, each
+                # record and its passages under a savepoint so a failed row is
+                # undone whole while the good rows still go out in this single
+                # transaction.
+                conn.rollback()
+                conn.execute('BEGIN')
+                for i, (row, row_passages) in enumerate(zip(rows, passages)):
+                    conn.execute('SAVEPOINT write_row')
+                    try:
+                        record_id = conn.execute(INSERT_RECORD_SQL, row).lastrowid
+                        conn.executemany(INSERT_PASSAGE_SQL, [(record_id,) + passage for passage in row_passages])
+                    except sqlite3.Error as e:
+                        conn.execute('ROLLBACK TO write_row')
+                        errors[i] = e
+                    conn.execute('RELEASE write_row')
+            conn.commit()
         except Exception as e:
-            logger.error(f"Error processing write task: {e}")
-            task.set_error(e)
-            
+            conn.rollback()
+            for task in pending:
+                self._fail(task, e)
+            return
+        commit_ms = (time.perf_counter() - start) * 1000
+        
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(rows)
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(rows))
+            self.stats['total_batch_rows'] += len(rows)
+            self.stats['last_commit_ms'] = commit_ms
+            self.stats['max_commit_ms'] = max(self.stats['max_commit_ms'], commit_ms)
+            self.stats['total_commit_ms'] += commit_ms
+            listeners = list(self._commit_listeners)
+        
+        for listener in listeners:
+            try:
+                listener(len(rows) - len(errors))
+            except Exception as e:
+                logger.error(f"Error in commit listener: {e}")
+        
+        for i, task in enumerate(pending):
+            if i in errors:
+                self._fail(task, errors[i])
+                continue
             with self._lock:
-                self.stats['failed_writes'] += 1
-    
-    def _write_record_direct(self, data: Dict[str, Any]):
-        """Directly write a record to the database."""
-        title = data['title']
-        url = data['url']
-        content = data['content']
-        embedding = data['embedding']
-        source = data['source']
-        bias = data['bias']
-        
-        # Store embedding as JSON string
-        if hasattr(embedding, 'tolist'):
-            embedding = embedding.tolist()
-        embedding_str = json.dumps(embedding)
-        
-        conn = sqlite3.connect(DB_FILE)
+                self.stats['successful_writes'] += 1
+            self._resolve(task.set_result, {"message": "Record written successfully"})
+    
+    def _fail(self, task: WriteTask, error: Exception):
+        logger.error(f"Error processing write task: {error}")
+        with self._lock:
+            self.stats['failed_writes'] += 1
+        self._resolve(task.set_error, error)
+    
+    @staticmethod
+    def _resolve(setter: Callable, value):
+        """Complete a task, keeping a failing callback from affecting the rest of the batch."""
         try:
-            conn.execute(f'''
-                INSERT OR REPLACE INTO {TABLE_NAME} (title, url, content, embedding, source, bias)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (title, url, content, embedding_str, source, str(bias)))
-            conn.commit()
-        finally:
-            conn.close()
+            setter(value)
+        except Exception as e:
+            logger.error(f"Error in write task callback: {e}")
+    
+    @staticmethod
+    def _record_row(data: Dict[str, Any], dtype: str) -> Tuple:
+        """Build the INSERT parameters for a write_record task."""
+        # store embedding as a packed blob in the database's recorded dtype
+        embedding_blob = encode_embedding(data['embedding'], dtype)
+        return (
+            data['title'],
+            data['url'],
+            data['content'],
+            embedding_blob,
+            data['source'],
+            str(data['bias'])
+        )
+    
+    @staticmethod
+    def _passage_rows(data: Dict[str, Any], dtype: str) -> List[Tuple]:
+        """
+        (start, end, embedding_blob) for each passage of a write_record task.
+        Records written without passages get one whole-article passage that
+        shares the record's embedding (NULL blob).
+        """
+        passages = data.get('passages')
+        if not passages:
+            return [(0, len(data['content'] or ''), None)]
+        return [
+            (int(passage['start']), int(passage['end']), encode_embedding(passage['embedding'], dtype))
+            for passage in passages
+        ]
+    
+    @staticmethod
+    def _insert_passages(conn: sqlite3.Connection, rows: List[Tuple], passages: List[List[Tuple]]):
+        """Insert the passages of rows just written by executemany, looking their ids up by url."""
+        # a url repeated in the batch was replaced by its last row, so its last passages win
+        by_url = {row[1]: row_passages for row, row_passages in zip(rows, passages)}
+        ids = dict(conn.execute(
+            f'SELECT url, id FROM {TABLE_NAME} WHERE url IN ({",".join("?" * len(by_url))})',
+            list(by_url)
+        ))
+        conn.executemany(INSERT_PASSAGE_SQL, [
+            (ids[url],) + passage
+            for url, row_passages in by_url.items() if url in ids
+            for passage in row_passages
+        ])
     
     def queue_write(self, operation: str, data: Dict[str, Any], callback: Callable = None, wait: bool = False, timeout: float = 30.0) -> WriteTask:
         """Queue a write operation."""
@@ -169,17 +347,36 @@ class DatabaseWriteQueue:
         
         return task
     
+    def queue_write_many(self, operation: str, datas: List[Dict[str, Any]], callback: Callable = None) -> List[WriteTask]:
+        """Queue several write operations back to back so the worker commits them together."""
+        if not self.running:
+            self.start()
+        
+        tasks = [WriteTask(operation, data, callback) for data in datas]
+        for task in tasks:
+            self.write_queue.put(task)
+        
+        with self._lock:
+            self.stats['queue_size'] = self.write_queue.qsize()
+        
+        return tasks
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get queue statistics."""
         with self._lock:
             stats = self.stats.copy()
             stats['queue_size'] = self.write_queue.qsize()
             stats['running'] = self.running
+        stats['batch_size_limit'] = self.batch_size
+        stats['flush_interval_ms'] = self.flush_interval * 1000
+        batches = stats['batches']
+        stats['avg_batch_size'] = stats.pop('total_batch_rows') / batches if batches else 0.0
+        stats['avg_commit_ms'] = stats.pop('total_commit_ms') / batches if batches else 0.0
         return stats
 
 write_queue = DatabaseWriteQueue()
 
-def write_record_queued(title, url, content, embedding, source, bias, wait=True, timeout=30.0):
+def write_record_queued(title, url, content, embedding, source, bias, wait=True, timeout=30.0, callback=None):
     """
     Queue a write operation for the database.
     
@@ -192,6 +389,7 @@ def write_record_queued(title, url, content, embedding, source, bias, wait=True,
         bias: Article bias
         wait: Whether to wait for completion
         timeout: Maximum time to wait for completion
+        callback: Called as callback(result, error) from the writer thread
     
     Returns:
         WriteTask object
@@ -205,7 +403,36 @@ def write_record_queued(title, url, content, embedding, source, bias, wait=True,
         'bias': bias
     }
     
-    return write_queue.queue_write('write_record', data, wait=wait, timeout=timeout)
+    return write_queue.queue_write('write_record', data, callback=callback, wait=wait, timeout=timeout)
+
+def write_records_queued(records: List[Dict[str, Any]]) -> List[WriteTask]:
+    """
+    Queue a batch of records for writing without waiting.
+    
+    Args:
+        records: Dicts with title, url, content, embedding, source and bias, and
+            optionally passages: [{'start', 'end', 'embedding'}] (see utils.passages)
+    
+    Returns:
+        List of WriteTask objects, in the same order as records
+    """
+    datas = [
+        {
+            'title': record['title'],
+            'url': record['url'],
+            'content': record['content'],
+            'embedding': record['embedding'],
+            'source': record['source'],
+            'bias': record['bias'],
+            'passages': record.get('passages')
+        }
+        for record in records
+    ]
+    return write_queue.queue_write_many('write_record', datas)
+
+def add_commit_listener(listener: Callable[[int], None]):
+    """Get notified after each committed write batch (see DatabaseWriteQueue.add_commit_listener)."""
+    write_queue.add_commit_listener(listener)
 
 def get_queue_stats():
     """Get write queue statistics."""